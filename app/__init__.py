@@ -1,6 +1,9 @@
-from flask import Flask
+from flask import Flask, jsonify
 from app.config import config_by_name
-from app.extensions import db, migrate, jwt, ma
+from app.extensions import (db, migrate, jwt, ma, catalog_cache, order_workers, reservation_reaper, folder,
+                            password_hasher, login_latency)
+from app.json_provider import JSONProvider
+from app.password_hasher import PasswordHasherBusy
 from app.models.staff import Staff
 from app.logging_config import log_config
 
@@ -8,16 +11,23 @@ from app.logging_config import log_config
 def create_app(config_name):
     app = Flask(__name__)
     app.config.from_object(config_by_name[config_name])
+    app.json = JSONProvider(app)
 
     # Initialize extensions (SQLAlchemy, JWT, etc.)
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     ma.init_app(app)
+    catalog_cache.init_app(app, db)
+    order_workers.init_app(app)
+    reservation_reaper.init_app(app)
+    folder.init_app(app)
+    password_hasher.init_app(app)
+    login_latency.init_app(app, 'login_latency')
     log_config()
 
     # Register Blueprints
-    from .api import auth_bp, staff_bp, customer_bp, category_bp, product_bp, discounts_bp, orders_bp
+    from .api import auth_bp, staff_bp, customer_bp, category_bp, product_bp, discounts_bp, orders_bp, reports_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
     app.register_blueprint(staff_bp, url_prefix='/api/v1/staff')
@@ -26,6 +36,26 @@ def create_app(config_name):
     app.register_blueprint(product_bp, url_prefix='/api/v1/product')
     app.register_blueprint(discounts_bp, url_prefix='/api/v1/discounts')
     app.register_blueprint(orders_bp, url_prefix='/api/v1/order')
+    app.register_blueprint(reports_bp, url_prefix='/api/v1/reports')
+
+    # Register CLI commands
+    from .commands import (import_products_command, rebuild_category_closure_command, purge_idempotency_keys_command,
+                           run_order_workers_command, backfill_sales_rollups_command, fold_sales_rollups_command,
+                           fold_customer_balances_command, reap_reservations_command)
+
+    app.cli.add_command(import_products_command)
+    app.cli.add_command(rebuild_category_closure_command)
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(run_order_workers_command)
+    app.cli.add_command(backfill_sales_rollups_command)
+    app.cli.add_command(fold_sales_rollups_command)
+    app.cli.add_command(fold_customer_balances_command)
+    app.cli.add_command(reap_reservations_command)
+
+    # Password hashing is saturated, clients should retry rather than wait
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        return jsonify({"error": str(error)}), 503, {"Retry-After": "1"}
 
     # Error Handler Example
 
@@ -4,4 +4,5 @@ from .customers import customer_bp
 from .categories import category_bp
 from .products import product_bp
 from .discounts import discounts_bp
-from .orders import orders_bp
\ No newline at end of file
+from .orders import orders_bp
+from .reports import reports_bp
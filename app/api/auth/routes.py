@@ -1,6 +1,8 @@
+import time
 from flask import jsonify, request
 from flask_jwt_extended import jwt_required
 from app.utils import roles_required
+from app.extensions import login_latency, password_hasher
 from app.services.auth_service import AuthService
 from . import auth_bp
 
@@ -12,7 +14,10 @@ def login():
     data = request.json
     username = data.get('username')
     password = data.get('password')
-    return auth_service.login_user(username, password)
+    start_time = time.perf_counter()
+    response = auth_service.login_user(username, password)
+    login_latency.observe(time.perf_counter() - start_time, response[1])
+    return response
 
 
 @auth_bp.route('/logout', methods=['POST'])
@@ -29,3 +34,12 @@ def reset_user(loggin_id):
     if error:
         return jsonify({"error": error}), 400
     return jsonify({"message": message}), 200
+
+
+@auth_bp.route('/metrics', methods=['GET'])
+@roles_required('admin')
+def get_login_metrics():
+    return jsonify({"data": {
+        "login_latency": login_latency.stats(),
+        "password_hasher": password_hasher.stats()
+    }}), 200
@@ -1,7 +1,10 @@
+from datetime import date
 from flask import request, jsonify
 from . import category_bp
-from app.utils import roles_required
-from app.services import CategoryService
+from app.utils import roles_required, parse_bool, stream_json
+from app.extensions import catalog_cache
+from app.services import CategoryService, ProductService
+from app.schemas import category_serializer
 
 
 @category_bp.route('/', methods=['POST'])
@@ -37,10 +40,13 @@ def update_category(category_id):
 @category_bp.route('/', methods=['GET'])
 @roles_required('admin')
 def get_all_categories():
+    if request.args.get('stream', type=parse_bool):
+        return stream_json(CategoryService.iter_categories(), category_serializer)
+
     categories, error = CategoryService.get_all_categories()
     if error:
         return jsonify({"error": error}), 400
-    return jsonify([category.to_dict() for category in categories]), 200
+    return jsonify([category_serializer(category) for category in categories]), 200
 
 
 @category_bp.route('/<int:category_id>', methods=['GET'])
@@ -49,3 +55,28 @@ def get_category_by_id(category_id):
     if error:
         return jsonify({"error": error}), 400
     return jsonify(category.to_dict()), 200
+
+
+@category_bp.route('/tree', methods=['GET'])
+def get_category_tree():
+    return catalog_cache.response(('category_tree', None), lambda: CategoryService.get_category_tree(),
+                                  (catalog_cache.CATEGORIES,))
+
+
+@category_bp.route('/<int:category_id>/tree', methods=['GET'])
+def get_category_subtree(category_id):
+    return catalog_cache.response(('category_tree', category_id),
+                                  lambda: CategoryService.get_category_tree(category_id), (catalog_cache.CATEGORIES,))
+
+
+@category_bp.route('/<int:category_id>/products', methods=['GET'])
+def get_category_products(category_id):
+    cache_key = ('category_products', date.today(), category_id, tuple(sorted(request.args.items(multi=True))))
+    return catalog_cache.response(cache_key, lambda: ProductService.get_products(
+        limit=request.args.get('limit', type=int),
+        cursor=request.args.get('cursor'),
+        sort=request.args.get('sort', 'product_id'),
+        category_id=category_id,
+        include_subcategories=True,
+        is_active=request.args.get('is_active', type=parse_bool)
+    ))
@@ -1,7 +1,9 @@
 from flask import request, jsonify
+from flask_jwt_extended import get_jwt_identity, get_jwt
 from . import customer_bp
-from app.utils import roles_required
-from app.services import CustomerService
+from app.utils import roles_required, parse_bool, stream_json
+from app.services import CustomerService, OrderService, CustomerLedgerService
+from app.schemas import customer_serializer
 
 
 @customer_bp.route('/', methods=['POST'])
@@ -59,7 +61,46 @@ def get_customer(customer_id):
 @customer_bp.route('/', methods=['GET'])
 @roles_required('staff', 'admin')
 def get_customers():
+    if request.args.get('stream', type=parse_bool):
+        return stream_json(CustomerService.iter_customers(), customer_serializer, 'data')
+
     customers = CustomerService.get_all_customers()
     return jsonify({
-        "data": [customer.to_dict() for customer in customers]
+        "data": [customer_serializer(customer) for customer in customers]
     }), 200
+
+
+@customer_bp.route('/<int:customer_id>/orders', methods=['GET'])
+@roles_required('customer', 'staff', 'admin')
+def get_customer_orders(customer_id):
+    if get_jwt().get('role') == 'customer' and get_jwt_identity() != customer_id:
+        return jsonify({"error": "Access forbidden: Insufficient privileges"}), 403
+
+    orders, error = OrderService.get_orders(
+        limit=request.args.get('limit', type=int),
+        cursor=request.args.get('cursor'),
+        customer_id=customer_id,
+        status=request.args.get('status'),
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to')
+    )
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify(orders), 200
+
+
+@customer_bp.route('/<int:customer_id>/payments', methods=['POST'])
+@roles_required('staff', 'admin')
+def record_payment(customer_id):
+    data = request.get_json() or {}
+    balance, error = CustomerLedgerService.record_payment(customer_id, data.get('amount'), get_jwt_identity())
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({
+        "message": "Payment recorded successfully.",
+        "data": {"customer_id": customer_id, "outstanding_balance": balance}
+    }), 201
@@ -1,8 +1,10 @@
+from datetime import date
 from flask import request, jsonify
 from flask_jwt_extended import get_jwt_identity
 from . import discounts_bp
-from app.utils import roles_required
+from app.utils import roles_required, parse_bool, stream_json
 from app.services import DiscountService
+from app.schemas import discount_serializer
 
 
 @discounts_bp.route('/', methods=['POST'])
@@ -52,11 +54,37 @@ def fetch_discount(discount_id):
 
 @discounts_bp.route('/', methods=['GET'])
 def fetch_discount_list():
+    if request.args.get('stream', type=parse_bool):
+        return stream_json(DiscountService.iter_discounts(), discount_serializer, 'data')
+
     discounts, error = DiscountService.get_discounts()
 
     if error:
         return jsonify({"error": error}), 400
 
     return jsonify({
-        "data": [discount.to_dict() for discount in discounts]
+        "data": [discount_serializer(discount) for discount in discounts]
+    }), 200
+
+
+@discounts_bp.route('/resolve', methods=['POST'])
+def resolve_discounts():
+    data = request.get_json() or {}
+    variant_ids = data.get('variant_ids')
+    if not isinstance(variant_ids, list) or not all(isinstance(variant_id, int) for variant_id in variant_ids):
+        return jsonify({"error": "variant_ids must be a list of variant IDs."}), 400
+    try:
+        on = date.fromisoformat(data['date']) if data.get('date') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "date must be in YYYY-MM-DD format."}), 400
+
+    resolved, error = DiscountService.resolve_discounts(variant_ids, on)
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({
+        "data": [{
+            "variant_id": variant_id,
+            "discount": discount._asdict() if discount else None
+        } for variant_id, discount in resolved.items()]
     }), 200
@@ -1,8 +1,9 @@
 from . import orders_bp
-from app.utils import roles_required
+from app.utils import roles_required, parse_bool
+from app.extensions import order_workers
 from flask_jwt_extended import get_jwt_identity, get_jwt
-from flask import request, jsonify
-from app.services import OrderService
+from flask import current_app, request, jsonify, url_for
+from app.services import OrderService, PricingService, IdempotencyService, OrderIntakeService, ReservationService
 
 
 @orders_bp.route('/', methods=['POST'])
@@ -17,8 +18,183 @@ def place_order():
     if is_customer == 'customer':
         order_data['customer_id'] = user
 
-    new_order, error = OrderService.create_order(order_data)
+    # Queue the order for the order workers and hand back a ticket instead of placing it now
+    queue_order = request.args.get('async', type=parse_bool)
+    if queue_order is None:
+        queue_order = current_app.config['ORDER_INTAKE_ASYNC']
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if queue_order:
+        if idempotency_key:
+            return jsonify({"error": "Idempotency-Key is only supported when placing orders directly."}), 400
+        order_request, error = OrderIntakeService.submit(order_data)
+        if error:
+            return jsonify({"error": error}), 400
+        order_workers.notify()
+        return jsonify({
+            "message": "Order queued.",
+            "data": order_request.to_dict()
+        }), 202, {"Location": url_for('order.get_order_request', request_id=order_request.request_id)}
 
+    # Retries with the same key get the response of the order placed first
+    owner = IdempotencyService.owner(is_customer, user)
+    if idempotency_key:
+        placed_order, error = IdempotencyService.claim(idempotency_key, order_data, owner)
+        if error:
+            return jsonify({"error": error}), 422
+        if placed_order is not None:
+            return jsonify({
+                "message": "Order placed successfully.",
+                "data": placed_order
+            }), 201
+
+    new_order, error = OrderService.create_order(order_data, idempotency_key, owner)
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({
+        "message": "Order placed successfully.",
+        "data": new_order.to_dict()
+    }), 201
+
+
+@orders_bp.route('/batch', methods=['POST'])
+@roles_required('admin', 'staff')
+def place_orders():
+    data = request.get_json() or {}
+    results, error = OrderService.create_orders(data.get('orders'), get_jwt_identity())
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    summary = {status: 0 for status in (OrderService.PLACED, OrderService.DUPLICATE, OrderService.FAILED)}
+    for result in results:
+        summary[result['status']] += 1
+    return jsonify({
+        "message": f"Placed {summary[OrderService.PLACED]} of {len(results)} orders.",
+        "summary": summary,
+        "data": results
+    }), 200
+
+
+@orders_bp.route('/', methods=['GET'])
+@roles_required('customer', 'admin', 'staff')
+def get_orders():
+    customer_id = request.args.get('customer_id', type=int)
+    # Customers only see their own orders
+    if get_jwt().get('role') == 'customer':
+        customer_id = get_jwt_identity()
+
+    orders, error = OrderService.get_orders(
+        limit=request.args.get('limit', type=int),
+        cursor=request.args.get('cursor'),
+        customer_id=customer_id,
+        status=request.args.get('status'),
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to')
+    )
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify(orders), 200
+
+
+@orders_bp.route('/requests/<int:request_id>', methods=['GET'])
+@roles_required('customer', 'admin', 'staff')
+def get_order_request(request_id):
+    order_request, error = OrderIntakeService.get_request(request_id)
+    if error:
+        return jsonify({"error": error}), 404
+
+    if get_jwt().get('role') == 'customer' and order_request.customer_id != get_jwt_identity():
+        return jsonify({"error": "Access forbidden: Insufficient privileges"}), 403
+
+    return jsonify({"data": order_request.to_dict()}), 200
+
+
+@orders_bp.route('/quote', methods=['POST'])
+def quote_order():
+    data = request.get_json() or {}
+    quote, error = PricingService.quote(data.get('items'))
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({"data": quote}), 200
+
+
+@orders_bp.route('/reservations', methods=['POST'])
+@roles_required('customer', 'admin', 'staff')
+def reserve_stock():
+    user = get_jwt_identity()
+    reservation_data = request.get_json() or {}
+    reservation_data['created_by'] = user
+    # Customers can only reserve for themselves
+    if get_jwt().get('role') == 'customer':
+        reservation_data['customer_id'] = user
+
+    reservation, error = ReservationService.reserve(reservation_data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({
+        "message": "Stock reserved.",
+        "data": reservation.to_dict()
+    }), 201, {"Location": url_for('order.get_reservation', reservation_id=reservation.reservation_id)}
+
+
+def _own_reservation(reservation_id):
+    """
+    Look up a reservation the caller may act on
+    :param reservation_id: ID of the reservation
+    :return: Reservation and an optional error response
+    """
+    reservation, error = ReservationService.get_reservation(reservation_id)
+    if error:
+        return None, (jsonify({"error": error}), 404)
+    if get_jwt().get('role') == 'customer' and reservation.customer_id != get_jwt_identity():
+        return None, (jsonify({"error": "Access forbidden: Insufficient privileges"}), 403)
+    return reservation, None
+
+
+@orders_bp.route('/reservations/<int:reservation_id>', methods=['GET'])
+@roles_required('customer', 'admin', 'staff')
+def get_reservation(reservation_id):
+    reservation, error = _own_reservation(reservation_id)
+    if error:
+        return error
+
+    return jsonify({"data": reservation.to_dict()}), 200
+
+
+@orders_bp.route('/reservations/<int:reservation_id>', methods=['DELETE'])
+@roles_required('customer', 'admin', 'staff')
+def release_reservation(reservation_id):
+    _, error = _own_reservation(reservation_id)
+    if error:
+        return error
+
+    reservation, error = ReservationService.release(reservation_id)
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({
+        "message": "Reservation released.",
+        "data": reservation.to_dict()
+    }), 200
+
+
+@orders_bp.route('/reservations/<int:reservation_id>/checkout', methods=['POST'])
+@roles_required('customer', 'admin', 'staff')
+def checkout_reservation(reservation_id):
+    _, error = _own_reservation(reservation_id)
+    if error:
+        return error
+
+    order_data = request.get_json() or {}
+    order_data['created_by'] = get_jwt_identity()
+    new_order, error = ReservationService.checkout(reservation_id, order_data)
     if error:
         return jsonify({"error": error}), 400
 
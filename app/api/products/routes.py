@@ -1,8 +1,12 @@
+import io
+from datetime import date
 from flask import request, jsonify
 from flask_jwt_extended import get_jwt_identity
 from . import product_bp
-from app.utils import roles_required
-from app.services import ProductService
+from app.utils import roles_required, parse_bool, stream_json
+from app.extensions import catalog_cache
+from app.services import (ProductService, SearchService, ImportService, InventoryHistoryService, StockAlertService,
+                          LocationService)
 
 
 @product_bp.route('/', methods=['POST'])
@@ -20,24 +24,193 @@ def create_product():
     }), 201
 
 
-@product_bp.route('/', methods=['GET'])
-def get_products():
-    products, error = ProductService.get_products()
+@product_bp.route('/import', methods=['POST'])
+@roles_required('admin')
+def import_products():
+    # Format from the query string, or from the content type of the upload
+    import_format = request.args.get('format')
+    if not import_format:
+        import_format = 'csv' if request.mimetype == 'text/csv' else 'ndjson' if 'ndjson' in request.mimetype else None
+    if import_format not in ImportService.FORMATS:
+        return jsonify({"error": "Upload a CSV or NDJSON file."}), 400
+
+    # Parse the request body as it is read instead of loading it into memory
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    records = ImportService.parse_csv(stream) if import_format == 'csv' else ImportService.parse_ndjson(stream)
+    summary = ImportService.import_products(records, created_by=get_jwt_identity())
+
+    return jsonify({
+        "message": f"Imported {summary['products']} products.",
+        "data": summary
+    }), 200
+
+
+@product_bp.route('/variants', methods=['PUT'])
+@roles_required('admin')
+def bulk_update_variants():
+    items = (request.get_json() or {}).get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Provide a list of items to update."}), 400
 
+    results, error = ProductService.bulk_update_variants(items, updated_by=get_jwt_identity())
     if error:
         return jsonify({"error": error}), 400
 
+    updated = sum(1 for result in results if result['status'] == 'updated')
     return jsonify({
-        "data": products
+        "message": f"Updated {updated} of {len(results)} variants.",
+        "data": results
     }), 200
 
 
-@product_bp.route('/<int:product_id>', methods=['GET'])
-def get_product(product_id):
-    product, error = ProductService.get_product(product_id)
+@product_bp.route('/variants/<int:variant_id>/inventory-history', methods=['GET'])
+@roles_required('staff', 'admin')
+def get_inventory_history(variant_id):
+    history, error = InventoryHistoryService.get_history(
+        variant_id, date_from=request.args.get('date_from'), date_to=request.args.get('date_to')
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({"data": history}), 200
+
+
+@product_bp.route('/inventory', methods=['GET'])
+@roles_required('staff', 'admin')
+def get_stock_at():
+    stock, error = InventoryHistoryService.get_stock_at(
+        at=request.args.get('at'), variant_ids=request.args.getlist('variant_id', type=int)
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({"data": stock}), 200
+
+
+@product_bp.route('/low-stock', methods=['GET'])
+@roles_required('staff', 'admin')
+def get_low_stock():
+    variants, error = StockAlertService.get_low_stock()
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({"data": variants}), 200
+
+
+@product_bp.route('/stock-alerts', methods=['GET'])
+@roles_required('staff', 'admin')
+def get_stock_alerts():
+    alerts, error = StockAlertService.get_feed(
+        cursor=request.args.get('cursor'), limit=request.args.get('limit', type=int)
+    )
     if error:
         return jsonify({"error": error}), 400
-    return jsonify({"data": product.to_dict()}), 200
+
+    return jsonify(alerts), 200
+
+
+@product_bp.route('/locations', methods=['POST'])
+@roles_required('admin')
+def create_location():
+    location_data = request.get_json() or {}
+    location_data['created_by'] = get_jwt_identity()
+    location, error = LocationService.add_location(location_data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({
+        "message": "Location created successfully",
+        "data": location.to_dict()
+    }), 201
+
+
+@product_bp.route('/locations', methods=['GET'])
+@roles_required('staff', 'admin')
+def get_locations():
+    locations, error = LocationService.get_locations()
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({"data": locations}), 200
+
+
+@product_bp.route('/stock-transfers', methods=['POST'])
+@roles_required('staff', 'admin')
+def transfer_stock():
+    transfers = (request.get_json() or {}).get('transfers')
+    stock, error = LocationService.transfer(transfers, updated_by=get_jwt_identity())
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({
+        "message": f"Applied {len(transfers)} transfers.",
+        "data": stock
+    }), 200
+
+
+@product_bp.route('/availability', methods=['GET'])
+@roles_required('staff', 'admin')
+def get_availability():
+    availability, error = LocationService.get_availability(request.args.getlist('variant_id', type=int))
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({"data": availability}), 200
+
+
+@product_bp.route('/', methods=['GET'])
+def get_products():
+    filters = dict(
+        category_id=request.args.get('category_id', type=int),
+        is_active=request.args.get('is_active', type=parse_bool),
+        min_price=request.args.get('min_price', type=float),
+        max_price=request.args.get('max_price', type=float),
+        include_subcategories=request.args.get('subcategories', default=False, type=parse_bool)
+    )
+
+    # Stream the whole filtered catalog instead of returning a single page
+    if request.args.get('stream', type=parse_bool):
+        return stream_json(ProductService.iter_products(**filters), lambda product: product, 'data')
+
+    # Keyed by date as well, since discounts start and expire without a write
+    cache_key = ('products', date.today(), tuple(sorted(request.args.items(multi=True))))
+    return catalog_cache.response(cache_key, lambda: ProductService.get_products(
+        limit=request.args.get('limit', type=int),
+        cursor=request.args.get('cursor'),
+        sort=request.args.get('sort', 'product_id'),
+        **filters
+    ))
+
+
+@product_bp.route('/search', methods=['GET'])
+def search_products():
+    attributes, error = SearchService.parse_attributes(request.args.getlist('attribute'))
+    if error:
+        return jsonify({"error": error}), 400
+
+    cache_key = ('search', tuple(sorted(request.args.items(multi=True))))
+    return catalog_cache.response(cache_key, lambda: SearchService.search_products(
+        query=request.args.get('q'),
+        attributes=attributes,
+        limit=request.args.get('limit', type=int)
+    ), (catalog_cache.CATALOG,))
+
+
+@product_bp.route('/<int:product_id>', methods=['GET'])
+def get_product(product_id):
+    def build():
+        product, error = ProductService.get_product(product_id)
+        if error:
+            return None, error
+        return {"data": product.to_dict()}, None
+
+    return catalog_cache.response(('product', date.today(), product_id), build)
+
+
+@product_bp.route('/cache', methods=['GET'])
+@roles_required('admin')
+def get_cache_stats():
+    return jsonify({"data": catalog_cache.stats()}), 200
 
 
 @product_bp.route('/<int:product_id>', methods=['PUT'])
@@ -0,0 +1,20 @@
+from . import reports_bp
+from app.utils import roles_required, parse_bool
+from flask import request, jsonify
+from app.services import SalesReportService
+
+
+@reports_bp.route('/sales', methods=['GET'])
+@roles_required('admin', 'staff')
+def get_sales():
+    report, error = SalesReportService.get_sales(
+        group_by=request.args.get('group_by', 'variant'),
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to'),
+        daily=request.args.get('daily', default=False, type=parse_bool)
+    )
+
+    if error:
+        return jsonify({"error": error}), 400
+
+    return jsonify({"data": report}), 200
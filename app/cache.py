@@ -0,0 +1,162 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from flask import current_app, jsonify, request, Response
+from sqlalchemy import select, text
+
+CacheEntry = namedtuple('CacheEntry', ['body', 'etag'])
+
+
+class CatalogCache:
+    """
+    Bounded LRU cache of serialized catalog responses, keyed by catalog version counters.
+
+    The catalog has one version per part written separately: products with their variants, prices and attributes,
+    categories, discounts and stock. Writers bump the versions of the parts they changed after committing, and a
+    response or in-process index only depends on the versions of the parts it reads, so orders moving stock leave the
+    category tree, the search index and the discount index alone. On Postgres the versions are sequences, so all
+    workers see the bumps without contending on a row lock; other databases fall back to in-process counters.
+    """
+    CATALOG = 'catalog'
+    CATEGORIES = 'categories'
+    DISCOUNTS = 'discounts'
+    STOCK = 'stock'
+    PARTS = (CATALOG, CATEGORIES, DISCOUNTS, STOCK)
+    SEQUENCE_NAMES = {
+        CATALOG: 'catalog_version_seq',
+        CATEGORIES: 'category_version_seq',
+        DISCOUNTS: 'discount_version_seq',
+        STOCK: 'stock_version_seq'
+    }
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.db = None
+        self.sequences = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local_versions = dict.fromkeys(self.PARTS, 0)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped on every init_app, as a fresh database restarts the version sequences
+        self.generation = 0
+
+    def init_app(self, app, db):
+        self.db = db
+        self.max_entries = app.config.get('CATALOG_CACHE_SIZE', self.max_entries)
+        if self.sequences is None:
+            self.sequences = {part: db.Sequence(name, schema='dev', metadata=db.metadata)
+                              for part, name in self.SEQUENCE_NAMES.items()}
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+            self.generation += 1
+        app.extensions['catalog_cache'] = self
+
+    def _uses_sequence(self):
+        return self.db.engine.dialect.supports_sequences
+
+    def version(self, parts=PARTS):
+        """
+        Read the current versions of parts of the catalog
+        :param parts: Parts of the catalog, all of them when omitted
+        :return: Tuple of version numbers, one changes whenever its part is written
+        """
+        if self._uses_sequence():
+            # last_value only counts once nextval has been called on the fresh sequence
+            statement = text('SELECT ' + ', '.join(
+                f'(SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM dev.{self.SEQUENCE_NAMES[part]})'
+                for part in parts
+            ))
+            return tuple(self.db.session.execute(statement).one())
+        with self._lock:
+            return tuple(self._local_versions[part] for part in parts)
+
+    def version_key(self, *parts):
+        """
+        Key for in-process structures derived from parts of the catalog, which are rebuilt whenever they change
+        :param parts: Parts of the catalog the structure is built from, all of them when omitted
+        :return: Tuple of the cache generation and the versions of the parts
+        """
+        return (self.generation,) + self.version(parts or self.PARTS)
+
+    def bump_version(self, *parts):
+        """
+        Invalidate the cached responses and structures depending on parts of the catalog. Call after the write has been
+        committed.
+        :param parts: Parts of the catalog written
+        """
+        if self._uses_sequence():
+            # nextval is not transactional, so a dedicated connection bumps it without touching the session
+            with self.db.engine.connect() as connection:
+                connection.execute(select(*(self.sequences[part].next_value() for part in parts)))
+        else:
+            with self._lock:
+                for part in parts:
+                    self._local_versions[part] += 1
+
+    def get(self, key, version):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] != version:
+                # Entries of older versions can never be served again
+                del self._entries[key]
+                cached = None
+            if cached is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+    def set(self, key, version, entry):
+        with self._lock:
+            self._entries[key] = (version, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else None
+            }
+
+    def response(self, key, build, parts=PARTS):
+        """
+        Serve a JSON response from the cache, building and storing it on a miss.
+
+        Responses carry a strong ETag and a request with a matching If-None-Match is answered with 304.
+        :param key: Hashable key identifying the response within a catalog version
+        :param build: Callable returning the payload and an optional error message
+        :param parts: Parts of the catalog the response is built from, all of them when omitted
+        :return: Flask response
+        """
+        version = self.version(parts)
+        entry = self.get(key, version)
+        if entry is None:
+            payload, error = build()
+            if error:
+                return jsonify({"error": error}), 400
+            body = current_app.json.dumps(payload).encode()
+            entry = CacheEntry(body, hashlib.sha1(body).hexdigest())
+            self.set(key, version, entry)
+
+        if request.if_none_match.contains(entry.etag):
+            response = Response(status=304)
+        else:
+            response = Response(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        return response
@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+CategoryNode = namedtuple('CategoryNode', ['category_id', 'category_name', 'parent_category_id', 'children'])
+
+
+class CategoryTree:
+    """
+    In-process category hierarchy, built from the adjacency list in one query.
+
+    Every node keeps its children, so the nested tree below a category and its descendant ids are read in time
+    proportional to the size of that subtree, without touching the database.
+    """
+
+    def __init__(self, rows):
+        """
+        Build the tree from flat rows
+        :param rows: Iterable of (category_id, category_name, parent_category_id) tuples, ordered by category_id
+        """
+        self.nodes = {}
+        for category_id, category_name, parent_category_id in rows:
+            self.nodes[category_id] = CategoryNode(category_id, category_name, parent_category_id, [])
+
+        self.roots = []
+        for node in self.nodes.values():
+            parent = self.nodes.get(node.parent_category_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                parent.children.append(node)
+
+    def __contains__(self, category_id):
+        return category_id in self.nodes
+
+    def _walk(self, node):
+        # Iterative depth first walk, guarded against cycles left by an invalid re-parenting
+        seen = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.category_id in seen:
+                continue
+            seen.add(node.category_id)
+            yield node
+            stack.extend(reversed(node.children))
+
+    def descendant_ids(self, category_id):
+        """
+        List a category and all the categories below it
+        :param category_id: ID of the top category
+        :return: List of category ids, empty if the category does not exist
+        """
+        node = self.nodes.get(category_id)
+        return [descendant.category_id for descendant in self._walk(node)] if node else []
+
+    def subtree(self, category_id=None):
+        """
+        Nest a category and its descendants
+        :param category_id: ID of the top category, None for the whole tree
+        :return: Nested dict of the category with its children, or a list of root categories for the whole tree
+        """
+        if category_id is None:
+            return [self.subtree(root.category_id) for root in self.roots]
+
+        serialized = {}
+        top = None
+        for node in self._walk(self.nodes[category_id]):
+            item = {
+                "category_id": node.category_id,
+                "category_name": node.category_name,
+                "parent_category_id": node.parent_category_id,
+                "children": []
+            }
+            parent = serialized.get(node.parent_category_id)
+            if top is None:
+                top = item
+            elif parent is not None:
+                parent["children"].append(item)
+            serialized[node.category_id] = item
+        return top
@@ -0,0 +1,111 @@
+import os
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.services import (ImportService, CategoryService, IdempotencyService, SalesReportService,
+                          CustomerLedgerService, ReservationService)
+
+
+@click.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'import_format', type=click.Choice(ImportService.FORMATS),
+              help='File format, guessed from the file extension when omitted.')
+@click.option('--created-by', type=int, required=True, help='Staff ID recorded as the creator of the products.')
+@click.option('--batch-size', type=int, help='Products written per batch.')
+@with_appcontext
+def import_products_command(path, import_format, created_by, batch_size):
+    """Bulk import products from a CSV or NDJSON file."""
+    import_format = import_format or ('csv' if os.path.splitext(path)[1].lower() == '.csv' else 'ndjson')
+    with open(path, encoding='utf-8', newline='') as stream:
+        records = ImportService.parse_csv(stream) if import_format == 'csv' else ImportService.parse_ndjson(stream)
+        summary = ImportService.import_products(records, created_by, batch_size)
+
+    for error in summary['errors']:
+        click.echo(f"Line {', '.join(map(str, error['lines']))}: {error['error']}", err=True)
+    click.echo(f"Imported {summary['products']} products and {summary['variants']} variants from {summary['rows']} rows "
+               f"in {summary['seconds']}s ({summary['rows_per_second']} rows/sec).")
+
+
+@click.command('rebuild-category-closure')
+@with_appcontext
+def rebuild_category_closure_command():
+    """Recompute the category closure table from the parent category links."""
+    rows, error = CategoryService.rebuild_closure()
+    if error:
+        raise click.ClickException(error)
+    click.echo(f"Wrote {rows} category closure rows.")
+
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command():
+    """Delete idempotency keys past their expiry."""
+    deleted, error = IdempotencyService.purge_expired()
+    if error:
+        raise click.ClickException(error)
+    click.echo(f"Deleted {deleted} expired idempotency keys.")
+
+
+@click.command('run-order-workers')
+@click.option('--workers', type=int, default=4, show_default=True, help='Worker threads draining the order outbox.')
+@click.option('--batch-size', type=int, help='Queued orders placed per drain.')
+@with_appcontext
+def run_order_workers_command(workers, batch_size):
+    """Place queued orders until interrupted."""
+    pool = current_app.extensions['order_workers']
+    if batch_size:
+        pool.batch_size = batch_size
+    pool.start(workers)
+    click.echo(f"Started {workers} order workers, press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        click.echo("Stopping order workers...")
+        pool.stop()
+
+
+@click.command('backfill-sales-rollups')
+@click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='First day to rebuild, defaults to the first order.')
+@click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Last day to rebuild, defaults to the last order.')
+@with_appcontext
+def backfill_sales_rollups_command(date_from, date_to):
+    """Recompute the daily sales rollups from the orders."""
+    days, error = SalesReportService.rebuild_rollups(date_from.date() if date_from else None,
+                                                     date_to.date() if date_to else None)
+    if error:
+        raise click.ClickException(error)
+    click.echo(f"Rebuilt the sales rollups of {days} days.")
+
+
+@click.command('fold-sales-rollups')
+@with_appcontext
+def fold_sales_rollups_command():
+    """Fold the sales of newly placed orders into the daily sales rollups, as the app does every FOLD_INTERVAL."""
+    rows, error = SalesReportService.fold_rollups()
+    if error:
+        raise click.ClickException(error)
+    click.echo(f"Updated {rows} daily sales rollup rows.")
+
+
+@click.command('fold-customer-balances')
+@with_appcontext
+def fold_customer_balances_command():
+    """Fold new customer ledger entries into the customers' balances, as the app does every FOLD_INTERVAL."""
+    customers, error = CustomerLedgerService.fold_balances()
+    if error:
+        raise click.ClickException(error)
+    click.echo(f"Updated the balances of {customers} customers.")
+
+
+@click.command('reap-reservations')
+@with_appcontext
+def reap_reservations_command():
+    """Expire the basket reservations past their expiry and give their stock back."""
+    expired, error = ReservationService.reap_expired()
+    if error:
+        raise click.ClickException(error)
+    click.echo(f"Expired {expired} reservations.")
@@ -18,6 +18,28 @@ class Config:
     # Database Configuration
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    STREAM_BATCH_SIZE = 500  # Rows fetched per round trip when streaming list endpoints
+    CATALOG_CACHE_SIZE = 1024  # Serialized catalog responses kept per worker
+    IMPORT_BATCH_SIZE = 500  # Products written per multi-row INSERT batch by the bulk import
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND')  # 'database' or 'memory', defaults to database on Postgres
+    QUOTE_MAX_LINES = 5000  # Basket lines accepted by a single price quote
+    IDEMPOTENCY_KEY_TTL = timedelta(hours=24)  # How long a placed order can be replayed by its Idempotency-Key
+    ORDER_INTAKE_ASYNC = os.getenv('ORDER_INTAKE_ASYNC', 'false').lower() in ('true', '1')  # Queue orders by default
+    ORDER_WORKERS = int(os.getenv('ORDER_WORKERS', 0))  # Threads per process draining queued orders, 0 to disable
+    ORDER_BATCH_SIZE = 50  # Queued orders placed per drain, each committed on its own
+    ORDER_POLL_INTERVAL = 1.0  # Seconds an idle worker waits before checking for queued orders again
+    BULK_ORDER_MAX_ORDERS = 2000  # Orders accepted by a single bulk submission
+    BULK_ORDER_CHUNK_SIZE = 200  # Orders of a bulk submission committed per transaction
+    STOCK_TRANSFER_MAX_LINES = 5000  # Transfers accepted by a single stock transfer request
+    RESERVATION_TTL = timedelta(minutes=15)  # How long a basket reservation holds its stock
+    RESERVATION_REAP_INTERVAL = int(os.getenv('RESERVATION_REAP_INTERVAL', 30))  # Seconds between reaps, 0 to disable
+    FOLD_INTERVAL = int(os.getenv('FOLD_INTERVAL', 60))  # Seconds between folds of rollups and balances, 0 to disable
+
+    # Password hashing, off the request workers
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')  # Werkzeug method, old hashes rehashed on login
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))  # Hash processes per web process, 0 for inline
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))  # Hashes queued or running before 503s
+    PASSWORD_HASH_TIMEOUT = 10  # Seconds a request waits for its hash before giving up with a 503
 
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
@@ -37,6 +59,12 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_TEST_URL')
     WTF_CSRF_ENABLED = False  # Disable CSRF for testing
     SQLALCHEMY_ECHO = False
+    SEARCH_BACKEND = 'memory'
+    ORDER_WORKERS = 0  # Tests drain the outbox themselves
+    RESERVATION_REAP_INTERVAL = 0  # Tests reap expired reservations themselves
+    FOLD_INTERVAL = 0  # Tests fold the rollups and balances themselves
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'  # Cheap hashes for tests
+    PASSWORD_HASH_WORKERS = 0
     JWT_SECRET_KEY = 'test_jwt_secret_key'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=1)  # Use a shorter expiration for tests
     SERVER_NAME = 'localhost.localdomain'  # This is necessary for url_for to work in tests
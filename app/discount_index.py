@@ -0,0 +1,123 @@
+import heapq
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+
+IndexedDiscount = namedtuple('IndexedDiscount', ['discount_id', 'product_id', 'variant_id', 'discount_rate',
+                                                 'discount_amount', 'start_date', 'expiry_date'])
+
+
+class DiscountTimeline:
+    """
+    Effective discount of one variant or product over time.
+
+    The start and end dates of its discounts split the calendar into segments, and the winning discount of every
+    segment is worked out once, so the discount in effect on a date is a single binary search.
+    When discounts overlap, the one that started last wins, then the one created last.
+    """
+
+    def __init__(self, discounts):
+        self.boundaries = []
+        self.winners = []
+        boundaries = set()
+        for discount in discounts:
+            boundaries.add(discount.start_date)
+            if discount.expiry_date is not None:
+                boundaries.add(discount.expiry_date + timedelta(days=1))
+
+        by_start = sorted(discounts, key=lambda discount: discount.start_date)
+        position = 0
+        active = []
+        for boundary in sorted(boundaries):
+            while position < len(by_start) and by_start[position].start_date <= boundary:
+                discount = by_start[position]
+                heapq.heappush(active, (-discount.start_date.toordinal(), -discount.discount_id, discount))
+                position += 1
+            # Expired discounts are dropped once they reach the top, the boundaries only move forward
+            while active and active[0][2].expiry_date is not None and active[0][2].expiry_date < boundary:
+                heapq.heappop(active)
+            self.boundaries.append(boundary)
+            self.winners.append(active[0][2] if active else None)
+
+    def at(self, on):
+        position = bisect_right(self.boundaries, on) - 1
+        return self.winners[position] if position >= 0 else None
+
+
+class DiscountIndex:
+    """
+    In-process index of discounts for resolving the discount in effect for many variants at once.
+
+    Discounts are keyed by variant, or by product for product-wide promotions that have no variant. A variant's own
+    discount takes precedence over a product-wide one. Timelines are rebuilt per key, so a created or updated
+    discount only recomputes the variants and products it touches.
+    """
+
+    def __init__(self, discounts=()):
+        """
+        :param discounts: Iterable of IndexedDiscount tuples, or rows with the same columns
+        """
+        self.discounts = {}
+        self.keys = defaultdict(dict)
+        self.timelines = {}
+        for discount in discounts:
+            discount = IndexedDiscount(*discount)
+            self.discounts[discount.discount_id] = discount
+            self.keys[self._key(discount)][discount.discount_id] = discount
+        for key in self.keys:
+            self._rebuild(key)
+
+    @staticmethod
+    def _key(discount):
+        return ('variant', discount.variant_id) if discount.variant_id is not None else ('product', discount.product_id)
+
+    def _rebuild(self, key):
+        discounts = list(self.keys[key].values())
+        if discounts:
+            self.timelines[key] = DiscountTimeline(discounts)
+        else:
+            self.keys.pop(key, None)
+            self.timelines.pop(key, None)
+
+    def remove(self, discount_id):
+        """
+        Take a discount out of the index
+        :param discount_id: ID of the discount
+        """
+        discount = self.discounts.pop(discount_id, None)
+        if discount is not None:
+            key = self._key(discount)
+            self.keys[key].pop(discount_id, None)
+            self._rebuild(key)
+
+    def upsert(self, discount):
+        """
+        Add a new discount or replace the indexed version of an updated one
+        :param discount: IndexedDiscount tuple
+        """
+        self.remove(discount.discount_id)
+        self.discounts[discount.discount_id] = discount
+        key = self._key(discount)
+        self.keys[key][discount.discount_id] = discount
+        self._rebuild(key)
+
+    def resolve(self, variants, on=None):
+        """
+        Find the discount in effect for each variant
+        :param variants: Iterable of (variant_id, product_id) pairs
+        :param on: Date to resolve the discounts at, today when omitted
+        :return: Dict of variant id to the IndexedDiscount in effect, or None
+        """
+        on = on or date.today()
+        resolved = {}
+        for variant_id, product_id in variants:
+            discount = None
+            timeline = self.timelines.get(('variant', variant_id))
+            if timeline is not None:
+                discount = timeline.at(on)
+            if discount is None:
+                timeline = self.timelines.get(('product', product_id))
+                if timeline is not None:
+                    discount = timeline.at(on)
+            resolved[variant_id] = discount
+        return resolved
@@ -2,9 +2,21 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_marshmallow import Marshmallow
+from app.cache import CatalogCache
+from app.order_workers import OrderWorkerPool
+from app.reservation_reaper import ReservationReaper
+from app.folder import Folder
+from app.password_hasher import PasswordHasher
+from app.metrics import LatencyHistogram
 
 # Initialize extensions
 db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
-ma = Marshmallow()
\ No newline at end of file
+ma = Marshmallow()
+catalog_cache = CatalogCache()
+order_workers = OrderWorkerPool()
+reservation_reaper = ReservationReaper()
+folder = Folder()
+password_hasher = PasswordHasher()
+login_latency = LatencyHistogram()
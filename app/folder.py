@@ -0,0 +1,68 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Folder:
+    """
+    Thread folding the rows hot paths append into the totals they add up to, for the application it is bound to.
+
+    Every FOLD_INTERVAL seconds the sales of newly placed orders are folded into the daily sales rollups and new
+    customer ledger entries into the customers' outstanding balances, so reports and balances keep reading few
+    unfolded rows. Folders in several processes can run side by side, each fold only takes the rows no other one has.
+    The fold-sales-rollups and fold-customer-balances commands do the same once, for deployments running them from a
+    scheduler instead.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 60
+        self.thread = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.stop()
+        self.app = app
+        self.interval = app.config.get('FOLD_INTERVAL', self.interval)
+        app.extensions['folder'] = self
+        if self.interval:
+            self.start()
+
+    def start(self):
+        """Start the folder thread"""
+        self._stopping.clear()
+        self.thread = threading.Thread(target=self._run, name='folder', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Ask the folder to finish its current pass and wait for it
+        :param timeout: Seconds to wait for the thread
+        """
+        self._stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.thread = None
+
+    @staticmethod
+    def _folds():
+        from app.services import CustomerLedgerService, SalesReportService
+
+        return [('daily sales rollup rows', SalesReportService.fold_rollups),
+                ('customer balances', CustomerLedgerService.fold_balances)]
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            for name, fold in self._folds():
+                try:
+                    with self.app.app_context():
+                        folded, error = fold()
+                    if error:
+                        logger.error(f'Folding the {name} failed: {error}')
+                    elif folded:
+                        logger.info(f'Folded {folded} {name}')
+                except Exception:
+                    logger.exception(f'Folding the {name} failed')
@@ -0,0 +1,29 @@
+from decimal import Decimal
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson.
+
+    Dates and datetimes are written natively in ISO 8601 format and Decimal values as numbers, matching the models'
+    to_dict output, so serializers can hand over column values without converting them first.
+    """
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, Decimal):
+            return float(value)
+        return DefaultJSONProvider.default(value)
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
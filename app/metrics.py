@@ -0,0 +1,71 @@
+import bisect
+import threading
+
+
+class LatencyHistogram:
+    """
+    Histogram of request latencies in fixed buckets, per web process.
+
+    Recording is a bisect and a few increments under a lock, so it can sit on hot paths. Percentiles are estimated
+    from the bucket bounds.
+    """
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def init_app(self, app, name):
+        self.reset()
+        app.extensions[name] = self
+
+    def reset(self):
+        with self._lock:
+            # One count per bucket, the last one for latencies above every bound
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._statuses = {}
+            self.count = 0
+            self.total = 0.0
+
+    def observe(self, seconds, status=None):
+        """
+        Record a request
+        :param seconds: Time taken
+        :param status: HTTP status of the response
+        """
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            if status is not None:
+                self._statuses[status] = self._statuses.get(status, 0) + 1
+
+    def _percentile(self, counts, fraction):
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (None,), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def stats(self):
+        with self._lock:
+            counts = list(self._counts)
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                buckets.append({"le": bound, "count": cumulative})
+            return {
+                "count": self.count,
+                "sum_seconds": self.total,
+                "mean_seconds": self.total / self.count if self.count else None,
+                # Upper bound of the bucket holding the percentile, None when above every bound
+                "p50_seconds": self._percentile(counts, 0.5) if self.count else None,
+                "p95_seconds": self._percentile(counts, 0.95) if self.count else None,
+                "p99_seconds": self._percentile(counts, 0.99) if self.count else None,
+                "buckets": buckets,
+                "statuses": {str(status): count for status, count in sorted(self._statuses.items())}
+            }
@@ -2,24 +2,47 @@ from .product import Product
 from .product_variants import ProductVariants
 from .product_attributes import ProductAttributes
 from .inventory import Inventory
+from .inventory_history import InventoryHistory
+from .stock_alerts import StockAlert
+from .locations import Location, LocationStock
 from .staff import Staff
 from .login_details import LoginDetails
 from .customer import Customer
+from .customer_ledger import CustomerLedger
 from .categories import Category
+from .category_closure import CategoryClosure
 from .discounts import Discount
 from .orders import Order
 from .order_items import OrderItem
+from .idempotency_keys import IdempotencyKey
+from .order_requests import OrderRequest
+from .reservations import Reservation, ReservationItem
+from .sales_rollups import DailyVariantSales, DailyCategorySales, DailyStaffSales, SalesRollupDelta
 
 all_models = [
     Staff,
     Customer,
+    CustomerLedger,
     LoginDetails,
     Category,
+    CategoryClosure,
     Product,
     ProductVariants,
     ProductAttributes,
     Inventory,
+    InventoryHistory,
+    StockAlert,
+    Location,
+    LocationStock,
     Discount,
     Order,
-    OrderItem
+    OrderItem,
+    IdempotencyKey,
+    OrderRequest,
+    Reservation,
+    ReservationItem,
+    DailyVariantSales,
+    DailyCategorySales,
+    DailyStaffSales,
+    SalesRollupDelta
 ]
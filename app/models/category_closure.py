@@ -0,0 +1,17 @@
+from app.extensions import db
+
+
+class CategoryClosure(db.Model):
+    """
+    Closure table of the category hierarchy, with one row for every ancestor and descendant pair, including each
+    category paired with itself at depth 0. Maintained by CategoryService.
+    """
+    __tablename__ = 'category_closure'
+    __table_args__ = {'schema': 'dev'}
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('dev.categories.category_id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('dev.categories.category_id'), primary_key=True, index=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<CategoryClosure {self.ancestor_id} > {self.descendant_id}>'
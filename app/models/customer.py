@@ -1,12 +1,13 @@
 from app.extensions import db
-from sqlalchemy.orm import validates
-from sqlalchemy import CheckConstraint
+from sqlalchemy.orm import validates, column_property
+from sqlalchemy import CheckConstraint, func, select
+from .customer_ledger import CustomerLedger
 
 
 class Customer(db.Model):
     __tablename__ = 'customers'
     __table_args__ = (
-        CheckConstraint('credit_balance >= 0', name='check_credit_balance_non_negative'),
+        CheckConstraint('outstanding_balance >= 0', name='check_credit_balance_non_negative'),
         {'schema': 'dev'}
     )
 
@@ -14,12 +15,20 @@ class Customer(db.Model):
     name = db.Column(db.String(255), nullable=False)
     mobile_number = db.Column(db.String(15), nullable=True)
     email = db.Column(db.String(255), nullable=True, unique=True)
-    outstanding_balance = db.Column(db.Numeric, nullable=False, default=0)
+    outstanding_balance = db.Column(db.Numeric, nullable=False, default=0)  # Balance up to the last ledger fold
     created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
     created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     updated_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=True)
     updated_date = db.Column(db.DateTime, nullable=True, onupdate=db.func.current_timestamp())
 
+    # Current balance: the folded balance plus the ledger entries not folded into it yet
+    balance = column_property(outstanding_balance + func.coalesce(
+        select(func.sum(CustomerLedger.amount))
+        .where(CustomerLedger.customer_id == customer_id, CustomerLedger.folded.is_(False))
+        .correlate_except(CustomerLedger)
+        .scalar_subquery(), 0
+    ))
+
     # Relationships
     creator = db.relationship('Staff', foreign_keys=[created_by], post_update=True, overlaps="updator")
     updator = db.relationship('Staff', foreign_keys=[updated_by], post_update=True, overlaps="creator")
@@ -40,7 +49,8 @@ class Customer(db.Model):
             "name": self.name,
             "mobile_number": self.mobile_number,
             "email": self.email,
-            "outstanding_balance": float(self.outstanding_balance),
+            # Objects not loaded from the database have no ledger entries yet
+            "outstanding_balance": float(self.outstanding_balance if self.balance is None else self.balance),
             "created_by": self.created_by,
             "created_date": self.created_date.isoformat(),
             "updated_by": self.updated_by,
@@ -0,0 +1,38 @@
+from app.extensions import db
+
+
+class CustomerLedger(db.Model):
+    """
+    Append-only entries of a customer's balance: orders add to it and payments subtract from it. Entries are folded
+    into Customer.outstanding_balance periodically, until then Customer.balance adds them on read.
+    Maintained by CustomerLedgerService.
+    """
+    __tablename__ = 'customer_ledger'
+    __table_args__ = (
+        # Entries not folded yet, read with every customer balance
+        db.Index('ix_dev_customer_ledger_unfolded', 'customer_id', postgresql_where=db.text('NOT folded')),
+        {'schema': 'dev'}
+    )
+
+    entry_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('dev.customers.customer_id'), nullable=False)
+    entry_type = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Numeric, nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('dev.orders.order_id'), nullable=True)
+    folded = db.Column(db.Boolean, nullable=False, default=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<CustomerLedger {self.entry_id} customer: {self.customer_id}, {self.entry_type}: {self.amount}>'
+
+    def to_dict(self):
+        return {
+            "entry_id": self.entry_id,
+            "customer_id": self.customer_id,
+            "entry_type": self.entry_type,
+            "amount": float(self.amount),
+            "order_id": self.order_id,
+            "created_by": self.created_by,
+            "created_date": self.created_date.isoformat()
+        }
@@ -1,3 +1,4 @@
+from datetime import date
 from app.extensions import db
 
 
@@ -8,7 +9,8 @@ class Discount(db.Model):
     discount_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     discount_name = db.Column(db.String(255), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('dev.products.product_id'), nullable=False)
-    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=False)
+    # A discount without a variant applies to every variant of the product
+    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=True)
     discount_rate = db.Column(db.Numeric, nullable=False, default=0)
     discount_amount = db.Column(db.Numeric, nullable=False, default=0)
     start_date = db.Column(db.Date, nullable=False)
@@ -28,6 +30,15 @@ class Discount(db.Model):
     def __repr__(self):
         return f'Discount {self.discount_name}: {self.discount_rate or self.discount_amount}>'
 
+    def is_active(self, on=None):
+        """
+        Check whether the discount is in effect
+        :param on: Date to check, today when omitted
+        :return: True if the date falls within the campaign period
+        """
+        on = on or date.today()
+        return self.start_date <= on and (self.expiry_date is None or on <= self.expiry_date)
+
     def to_dict(self):
         return {
             'discount_id': self.discount_id,
@@ -0,0 +1,20 @@
+from app.extensions import db
+
+
+class IdempotencyKey(db.Model):
+    """
+    Client supplied key of a request that must not be applied twice, scoped to the caller that sent it, with a digest
+    of the request it was first used for and the response that request produced. Maintained by IdempotencyService.
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = {'schema': 'dev'}
+
+    owner = db.Column(db.String(64), primary_key=True)
+    idempotency_key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.LargeBinary(32), nullable=False)
+    response = db.Column(db.JSON, nullable=True)
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.owner} {self.idempotency_key}>'
@@ -1,21 +1,41 @@
 from app import db
+from sqlalchemy import func, select
+from .locations import Location, LocationStock
 
 
 class Inventory(db.Model):
     __tablename__ = "inventory"
-    __table_args__ = {"schema": "dev"}
+    __table_args__ = (
+        # Only the variants below their reorder level, so listing them does not scan the catalog
+        db.Index('ix_dev_inventory_below_reorder_level', 'variant_id',
+                 postgresql_where=db.text('quantity < reorder_level')),
+        db.CheckConstraint('quantity >= 0', name='check_inventory_quantity_non_negative'),
+        {"schema": "dev"}
+    )
 
     inventory_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False, default=0)
     warehouse_stock = db.Column(db.Integer, nullable=False, default=0)
     shop_stock = db.Column(db.Integer, nullable=False, default=0)
+    reserved_quantity = db.Column(db.Integer, nullable=False, default=0,
+                                  server_default=db.text('0'))  # Held by active reservations
     reorder_level = db.Column(db.Integer, nullable=False, default=0)
     created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
     created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     updated_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=True)
     updated_date = db.Column(db.DateTime, nullable=True, onupdate=db.func.current_timestamp())
 
+    # Warehouse stock: the stock held at the warehouse locations, kept off this row so receiving never waits on sales,
+    # plus any counted here before the first warehouse location took it over
+    warehouse_total = db.column_property(warehouse_stock + func.coalesce(
+        select(func.sum(LocationStock.quantity))
+        .join(Location, Location.location_id == LocationStock.location_id)
+        .where(LocationStock.variant_id == variant_id, Location.location_type == 'warehouse')
+        .correlate_except(LocationStock, Location)
+        .scalar_subquery(), 0
+    ))
+
     # Relationships
     variant = db.relationship('ProductVariants', backref='inventory_variant', foreign_keys=[variant_id], lazy='joined')
     creator = db.relationship('Staff', foreign_keys=[created_by], post_update=True, overlaps="updater")
@@ -29,7 +49,16 @@ class Inventory(db.Model):
             "inventory_id": self.inventory_id,
             # "variant_id": self.variant_id,
             "quantity": self.quantity,
-            "warehouse_stock": self.warehouse_stock,
+            "warehouse_stock": self.warehouse_total,
+            "shop_stock": self.shop_stock,
+            "reorder_level": self.reorder_level
+        }
+
+    def stock_levels(self):
+        """Levels of the row as passed to the stock journal"""
+        return {
+            "quantity": self.quantity,
+            "warehouse_stock": self.warehouse_total,
             "shop_stock": self.shop_stock,
             "reorder_level": self.reorder_level
         }
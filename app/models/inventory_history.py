@@ -0,0 +1,48 @@
+from app.extensions import db
+
+
+class InventoryHistory(db.Model):
+    """
+    Journal of stock movements: one row per change to a variant's inventory, with its levels before and after and
+    the reason for the change. Written by InventoryHistoryService in the transaction that changes the stock.
+    """
+    __tablename__ = 'inventory_history'
+    __table_args__ = (
+        # Stock of a variant at a point in time is its last change up to then
+        db.Index('ix_dev_inventory_history_variant_id_change_date', 'variant_id', 'change_date', 'history_id'),
+        {'schema': 'dev'}
+    )
+
+    history_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=False)
+    quantity_before = db.Column(db.Integer, nullable=False)
+    quantity_after = db.Column(db.Integer, nullable=False)
+    warehouse_stock_before = db.Column(db.Integer, nullable=False)
+    warehouse_stock_after = db.Column(db.Integer, nullable=False)
+    shop_stock_before = db.Column(db.Integer, nullable=False)
+    shop_stock_after = db.Column(db.Integer, nullable=False)
+    change_reason = db.Column(db.Text, nullable=True)
+    change_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    staff_id = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=True)
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    updated_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=True)
+    updated_date = db.Column(db.DateTime, nullable=True, onupdate=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<InventoryHistory {self.history_id} variant_id: {self.variant_id}, {self.change_reason}>'
+
+    def to_dict(self):
+        return {
+            "history_id": self.history_id,
+            "variant_id": self.variant_id,
+            "quantity_before": self.quantity_before,
+            "quantity_after": self.quantity_after,
+            "warehouse_stock_before": self.warehouse_stock_before,
+            "warehouse_stock_after": self.warehouse_stock_after,
+            "shop_stock_before": self.shop_stock_before,
+            "shop_stock_after": self.shop_stock_after,
+            "change_reason": self.change_reason,
+            "change_date": self.change_date.isoformat(),
+            "staff_id": self.staff_id
+        }
@@ -0,0 +1,46 @@
+from app.extensions import db
+
+
+class Location(db.Model):
+    """A place stock is kept: the warehouse or one of the shops"""
+    __tablename__ = 'locations'
+    __table_args__ = {'schema': 'dev'}
+
+    location_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    location_name = db.Column(db.String(100), nullable=False, unique=True)
+    location_type = db.Column(db.String(20), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<Location {self.location_id}, {self.location_name}>'
+
+    def to_dict(self):
+        return {
+            "location_id": self.location_id,
+            "location_name": self.location_name,
+            "location_type": self.location_type,
+            "created_by": self.created_by,
+            "created_date": self.created_date.isoformat()
+        }
+
+
+class LocationStock(db.Model):
+    """
+    Stock of a variant at one location, one row per variant and location so moves at different locations never
+    update the same row. Maintained by LocationService.
+    """
+    __tablename__ = 'location_stock'
+    __table_args__ = (
+        db.CheckConstraint('quantity >= 0', name='check_location_stock_non_negative'),
+        {'schema': 'dev'}
+    )
+
+    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('dev.locations.location_id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    updated_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=True)
+    updated_date = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<LocationStock variant_id: {self.variant_id}, location_id: {self.location_id}>'
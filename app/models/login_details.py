@@ -1,5 +1,4 @@
-from app.extensions import db
-from werkzeug.security import check_password_hash, generate_password_hash
+from app.extensions import db, password_hasher
 from app.models.customer import Customer
 
 
@@ -26,10 +25,10 @@ class LoginDetails(db.Model):
     updator = db.relationship('Staff', foreign_keys=[updated_by], post_update=True, overlaps="creator")
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = password_hasher.hash(password)
 
     def check_password(self,password):
-        return check_password_hash(self.password, password)
+        return password_hasher.check(self.password, password)
 
     def to_dict(self):
         return{
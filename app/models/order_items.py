@@ -6,7 +6,7 @@ class OrderItem(db.Model):
     __table_args__ = {'schema': 'dev'}
 
     order_item_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('dev.orders.order_id'), nullable=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('dev.orders.order_id'), nullable=True, index=True)
     variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=True)
     quantity = db.Column(db.Integer, nullable=False)
     discount_rate = db.Column(db.Numeric, default=0)
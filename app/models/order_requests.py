@@ -0,0 +1,38 @@
+from app.extensions import db
+
+
+class OrderRequest(db.Model):
+    """
+    Outbox of orders accepted for asynchronous placement. The request_id is the ticket handed to the client, and the
+    row records the outcome once a worker has placed the order. Maintained by OrderIntakeService.
+    """
+    __tablename__ = 'order_requests'
+    __table_args__ = (
+        # Workers drain queued requests in ticket order
+        db.Index('ix_dev_order_requests_status', 'status', 'request_id'),
+        {'schema': 'dev'}
+    )
+
+    request_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('dev.customers.customer_id'), nullable=True)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='Queued')
+    order_id = db.Column(db.Integer, db.ForeignKey('dev.orders.order_id'), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    processed_date = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OrderRequest {self.request_id}, status: {self.status}>'
+
+    def to_dict(self):
+        return {
+            'ticket': self.request_id,
+            'customer_id': self.customer_id,
+            'status': self.status,
+            'order_id': self.order_id,
+            'error': self.error,
+            'created_date': self.created_date.isoformat(),
+            'processed_date': self.processed_date.isoformat() if self.processed_date else None
+        }
@@ -3,7 +3,13 @@ from app.extensions import db
 
 class Order(db.Model):
     __tablename__ = 'orders'
-    __table_args__ = {'schema': 'dev'}
+    __table_args__ = (
+        # Keyset pagination of the order history, newest first, overall and per customer or status
+        db.Index('ix_dev_orders_order_date', 'order_date', 'order_id'),
+        db.Index('ix_dev_orders_customer_id_order_date', 'customer_id', 'order_date', 'order_id'),
+        db.Index('ix_dev_orders_order_status_order_date', 'order_status', 'order_date', 'order_id'),
+        {'schema': 'dev'}
+    )
 
     order_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('dev.customers.customer_id'), nullable=True)
@@ -11,6 +17,7 @@ class Order(db.Model):
     total_order_amount = db.Column(db.Numeric, nullable=False)
     order_status = db.Column(db.String(50), nullable=False)
     order_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    client_order_id = db.Column(db.String(64), nullable=True, unique=True)  # Set by tills submitting offline sales
     created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
     created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     updated_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=True)
@@ -33,6 +40,7 @@ class Order(db.Model):
             'total_order_amount': float(self.total_order_amount),
             'order_status': self.order_status,
             'order_date': self.order_date.isoformat(),
+            'client_order_id': self.client_order_id,
             'created_by': self.created_by,
             'created_date': self.created_date.isoformat(),
             'updated_by': self.updated_by,
@@ -7,18 +7,21 @@ class Product(db.Model):
 
     product_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     product_name = db.Column(db.String(255), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('dev.categories.category_id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('dev.categories.category_id'), nullable=False, index=True)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=True)
     created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
     updated_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=True)
     updated_date = db.Column(db.DateTime, nullable=True, onupdate=db.func.current_timestamp())
 
+    # Last change to the product, used as the keyset for incremental catalog sync
+    last_modified = db.column_property(db.func.coalesce(updated_date, created_date))
+
     # Relationships
     category = db.relationship('Category', backref='product', foreign_keys=[category_id])
     creator = db.relationship('Staff', foreign_keys=[created_by], post_update=True, overlaps="updater")
     updater = db.relationship('Staff', foreign_keys=[updated_by], post_update=True, overlaps="creator")
-    variants = db.relationship('ProductVariants', back_populates='product', lazy='dynamic')
+    variants = db.relationship('ProductVariants', back_populates='product', lazy='select')
 
     def __repr__(self):
         return f'<Product {self.product_name}>'
@@ -38,3 +41,7 @@ class Product(db.Model):
             "updated_date": self.updated_date.isoformat() if self.updated_date else None,
             "variants": [variant.to_dict() for variant in self.variants]
         }
+
+
+# Supports keyset pagination ordered by last modification
+db.Index('ix_products_last_modified', db.func.coalesce(Product.updated_date, Product.created_date), Product.product_id)
@@ -6,7 +6,7 @@ class ProductAttributes(db.Model):
     __table_args__ = {"schema": "dev"}
 
     attribute_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=False, index=True)
     name = db.Column(db.String(255), nullable=False)
     value = db.Column(db.String(255), nullable=False)
     created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
@@ -28,3 +28,8 @@ class ProductAttributes(db.Model):
             "name": self.name,
             "value": self.value,
         }
+
+
+# Supports attribute filters and facet counts in product search
+db.Index('ix_product_attributes_name_value', db.func.lower(ProductAttributes.name),
+         db.func.lower(ProductAttributes.value))
@@ -6,7 +6,7 @@ class ProductVariants(db.Model):
     __table_args__ = {"schema": "dev"}
 
     variant_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('dev.products.product_id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('dev.products.product_id'), nullable=False, index=True)
     sku = db.Column(db.String(255), nullable=False, unique=True)
     price = db.Column(db.Numeric, nullable=False)
     created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
@@ -16,7 +16,7 @@ class ProductVariants(db.Model):
 
     # Relationships
     product = db.relationship('Product', back_populates='variants')
-    attributes = db.relationship('ProductAttributes', backref='product_variant', lazy='dynamic')
+    attributes = db.relationship('ProductAttributes', backref='product_variant', lazy='select')
     inventory = db.relationship('Inventory', uselist=False, backref='inventory_variant')
     discounts = db.relationship('Discount', backref='variant_discounts', lazy=True)
     creator = db.relationship('Staff', foreign_keys=[created_by], post_update=True, overlaps="updater")
@@ -25,6 +25,14 @@ class ProductVariants(db.Model):
     def __repr__(self):
         return f'<ProductVariant SKU: {self.sku}, Price: {self.price}>'
 
+    def active_discounts(self, on=None):
+        """
+        List the discounts in effect for the variant, its own and those of its product that apply to every variant
+        :param on: Date to check, today when omitted
+        """
+        product_wide = [discount for discount in self.product.discounts if discount.variant_id is None]
+        return [discount for discount in self.discounts + product_wide if discount.is_active(on)]
+
     def to_dict(self):
         """
         Converts product variant and its related data (attributes, inventory) to a dictionary
@@ -36,7 +44,7 @@ class ProductVariants(db.Model):
             "price": float(self.price),
             'attributes': [attribute.to_dict() for attribute in self.attributes],
             'inventory': self.inventory.to_dict() if self.inventory else None,
-            'discounts': [discount.to_dict() for discount in self.discounts]
+            'discounts': [discount.to_dict() for discount in self.active_discounts()]
             # "created_by": self.created_by,
             # "created_date": self.created_date.isoformat(),
             # "updated_by": self.updated_by,
@@ -0,0 +1,57 @@
+from app.extensions import db
+
+
+class Reservation(db.Model):
+    """
+    Stock held for a customer's basket until it expires, is released or is converted into an order.
+    The quantities of active reservations are counted in Inventory.reserved_quantity. Maintained by
+    ReservationService.
+    """
+    __tablename__ = 'reservations'
+    __table_args__ = (
+        # Active reservations by expiry, read by the reaper
+        db.Index('ix_dev_reservations_active_expires_at', 'expires_at', postgresql_where=db.text("status = 'Active'")),
+        {'schema': 'dev'}
+    )
+
+    reservation_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('dev.customers.customer_id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('dev.orders.order_id'), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    updated_date = db.Column(db.DateTime, nullable=True, onupdate=db.func.current_timestamp())
+
+    # Relationships
+    items = db.relationship('ReservationItem', backref='reservation', lazy='selectin',
+                            order_by='ReservationItem.variant_id')
+
+    def __repr__(self):
+        return f'<Reservation {self.reservation_id}, status: {self.status}>'
+
+    def to_dict(self):
+        return {
+            "reservation_id": self.reservation_id,
+            "customer_id": self.customer_id,
+            "status": self.status,
+            "expires_at": self.expires_at.isoformat(),
+            "order_id": self.order_id,
+            "items": [{"variant_id": item.variant_id, "quantity": item.quantity} for item in self.items],
+            "created_by": self.created_by,
+            "created_date": self.created_date.isoformat()
+        }
+
+
+class ReservationItem(db.Model):
+    __tablename__ = 'reservation_items'
+    __table_args__ = {'schema': 'dev'}
+
+    reservation_item_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    reservation_id = db.Column(db.Integer, db.ForeignKey('dev.reservations.reservation_id'), nullable=False,
+                               index=True)
+    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<Reservation Item {self.reservation_item_id}, Variant: {self.variant_id}, Quantity: {self.quantity}>'
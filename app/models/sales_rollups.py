@@ -0,0 +1,71 @@
+from app.extensions import db
+
+
+class DailyVariantSales(db.Model):
+    """Units and net sales of each variant per day, folded from the SalesRollupDelta rows of placed orders"""
+    __tablename__ = 'daily_variant_sales'
+    __table_args__ = {'schema': 'dev'}
+
+    sales_date = db.Column(db.Date, primary_key=True)
+    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), primary_key=True)
+    order_lines = db.Column(db.Integer, nullable=False, default=0)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    gross_sales = db.Column(db.Numeric, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyVariantSales {self.sales_date} variant: {self.variant_id}>'
+
+
+class DailyCategorySales(db.Model):
+    """Units and net sales of each category per day, folded from the SalesRollupDelta rows of placed orders"""
+    __tablename__ = 'daily_category_sales'
+    __table_args__ = {'schema': 'dev'}
+
+    sales_date = db.Column(db.Date, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('dev.categories.category_id'), primary_key=True)
+    order_lines = db.Column(db.Integer, nullable=False, default=0)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    gross_sales = db.Column(db.Numeric, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyCategorySales {self.sales_date} category: {self.category_id}>'
+
+
+class DailyStaffSales(db.Model):
+    """Orders and order totals taken by each staff member per day, folded from SalesRollupDelta rows"""
+    __tablename__ = 'daily_staff_sales'
+    __table_args__ = {'schema': 'dev'}
+
+    sales_date = db.Column(db.Date, primary_key=True)
+    staff_id = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), primary_key=True)
+    orders_count = db.Column(db.Integer, nullable=False, default=0)
+    items_count = db.Column(db.Integer, nullable=False, default=0)
+    order_total = db.Column(db.Numeric, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyStaffSales {self.sales_date} staff: {self.staff_id}>'
+
+
+class SalesRollupDelta(db.Model):
+    """
+    Append-only sales of placed orders not folded into the daily rollups yet, one row per order, grouping and key.
+    Orders only ever insert here, so they never queue on the hot rollup rows of the day. Folded into the rollups
+    periodically by SalesReportService, until then reports add them on read.
+    """
+    __tablename__ = 'sales_rollup_deltas'
+    __table_args__ = (
+        # Deltas read with every report and folded per grouping
+        db.Index('ix_dev_sales_rollup_deltas_grouping_sales_date', 'grouping', 'sales_date'),
+        {'schema': 'dev'}
+    )
+
+    delta_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    grouping = db.Column(db.String(10), nullable=False)  # 'variant', 'category' or 'staff'
+    sales_date = db.Column(db.Date, nullable=False)
+    key_id = db.Column(db.Integer, nullable=False)  # variant_id, category_id or staff_id of the grouping
+    lines = db.Column(db.Integer, nullable=False)  # Order lines, or orders for staff
+    units = db.Column(db.Integer, nullable=False)
+    amount = db.Column(db.Numeric, nullable=False)
+
+    def __repr__(self):
+        return f'<SalesRollupDelta {self.sales_date} {self.grouping}: {self.key_id}>'
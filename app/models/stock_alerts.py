@@ -0,0 +1,38 @@
+from app.extensions import db
+
+
+class StockAlert(db.Model):
+    """
+    Feed of low-stock alerts: a row each time a variant's quantity falls below its reorder level or recovers.
+    Written by StockAlertService in the transaction that changes the stock.
+    """
+    __tablename__ = 'stock_alerts'
+    __table_args__ = (
+        # Feed order, see StockAlertService.get_feed
+        db.Index('ix_dev_stock_alerts_txid', 'txid', 'alert_id'),
+        {'schema': 'dev'}
+    )
+
+    alert_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    variant_id = db.Column(db.Integer, db.ForeignKey('dev.product_variants.variant_id'), nullable=False)
+    alert_type = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    reorder_level = db.Column(db.Integer, nullable=False)
+    # ID of the writing transaction
+    txid = db.Column(db.BigInteger, nullable=False, server_default=db.text('pg_current_xact_id()::text::bigint'))
+    created_by = db.Column(db.Integer, db.ForeignKey('dev.staff.staff_id'), nullable=False)
+    created_date = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<StockAlert {self.alert_id} variant_id: {self.variant_id}, {self.alert_type}>'
+
+    def to_dict(self):
+        return {
+            "alert_id": self.alert_id,
+            "variant_id": self.variant_id,
+            "alert_type": self.alert_type,
+            "quantity": self.quantity,
+            "reorder_level": self.reorder_level,
+            "created_by": self.created_by,
+            "created_date": self.created_date.isoformat()
+        }
@@ -0,0 +1,76 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class OrderWorkerPool:
+    """
+    Pool of threads draining the order outbox of the application it is bound to.
+
+    The outbox is a database table, so no broker is needed and any number of pools, in web processes or in the
+    run-order-workers command, can drain it side by side. Idle workers poll every ORDER_POLL_INTERVAL seconds and
+    are woken early by notify() when an order is queued in the same process.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.batch_size = 50
+        self.poll_interval = 1.0
+        self.threads = []
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.stop()
+        self.app = app
+        self.batch_size = app.config.get('ORDER_BATCH_SIZE', self.batch_size)
+        self.poll_interval = app.config.get('ORDER_POLL_INTERVAL', self.poll_interval)
+        app.extensions['order_workers'] = self
+        if app.config.get('ORDER_WORKERS'):
+            self.start(app.config['ORDER_WORKERS'])
+
+    def start(self, workers):
+        """
+        Start the worker threads
+        :param workers: Number of threads
+        """
+        self._stopping.clear()
+        for number in range(workers):
+            thread = threading.Thread(target=self._run, name=f'order-worker-{number}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=None):
+        """
+        Ask the workers to finish their current batch and wait for them
+        :param timeout: Seconds to wait for each thread
+        """
+        self._stopping.set()
+        self._wake.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def notify(self):
+        """Wake idle workers, called after an order is queued"""
+        self._wake.set()
+
+    def _run(self):
+        from app.services import OrderIntakeService
+
+        while not self._stopping.is_set():
+            processed = 0
+            try:
+                with self.app.app_context():
+                    processed, error = OrderIntakeService.drain(self.batch_size)
+                if error:
+                    logger.error(f'Order worker failed to drain the outbox: {error}')
+            except Exception:
+                logger.exception('Order worker failed to drain the outbox')
+            # Keep going while batches come back full, otherwise wait for new orders
+            if not processed or processed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
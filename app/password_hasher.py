@@ -0,0 +1,137 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when a password cannot be hashed without queuing past PASSWORD_HASH_MAX_PENDING"""
+
+
+class PasswordHasher:
+    """
+    Password hashing off the request workers, in a pool of PASSWORD_HASH_WORKERS processes.
+
+    Hashing is deliberately slow, so a burst of logins run on the request workers would stall every other request.
+    At most PASSWORD_HASH_MAX_PENDING hashes wait for or run in the pool of a web process; past that hash() and check()
+    raise PasswordHasherBusy, answered with a 503, instead of queuing without bound. Hashes are made with
+    PASSWORD_HASH_METHOD and needs_rehash() spots those made with other parameters. Without workers, hashing runs
+    inline and is still bounded.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self.workers = 0
+        self.max_pending = 16
+        self.timeout = 10
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._prefix = None
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        # Method and parameters as written at the start of the hashes, e.g. 'scrypt:32768:8:1'
+        self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        with self._lock:
+            self.pending = self.completed = self.rejected = 0
+        app.extensions['password_hasher'] = self
+
+    def shutdown(self):
+        """Stop the worker processes, they are started again on the next hash"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked, the web process holds threads and database connections
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+
+    def _run(self, function, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy("Too many logins in progress, please try again shortly.")
+            self.pending += 1
+        if not self.workers:
+            try:
+                result = function(*args)
+            finally:
+                self._release()
+        else:
+            try:
+                future = self._pool().submit(function, *args)
+            except BaseException as e:
+                self._release()
+                if isinstance(e, BrokenProcessPool):
+                    self.shutdown()
+                    raise PasswordHasherBusy("Password hashing is unavailable, please try again shortly.")
+                raise
+            # The slot is held until the pool is done with the hash, not only until this request stops waiting for it
+            future.add_done_callback(self._release)
+            try:
+                result = future.result(self.timeout)
+            except TimeoutError:
+                # Dropped from the queue if it has not started, a running hash keeps its slot until it finishes
+                future.cancel()
+                raise PasswordHasherBusy("Too many logins in progress, please try again shortly.")
+            except BrokenProcessPool:
+                # A worker died, the next hash starts a fresh pool
+                self.shutdown()
+                raise PasswordHasherBusy("Password hashing is unavailable, please try again shortly.")
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def hash(self, password):
+        """
+        Hash a password with PASSWORD_HASH_METHOD
+        :param password: Plain text password
+        :return: Salted hash to store
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, pwhash, password):
+        """
+        Check a password against a stored hash
+        :param pwhash: Stored hash
+        :param password: Plain text password
+        :return: True when the password matches
+        """
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """
+        Tell whether a stored hash was made with other parameters than PASSWORD_HASH_METHOD
+        :param pwhash: Stored hash
+        :return: True when the hash should be replaced
+        """
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    def stats(self):
+        with self._lock:
+            return {
+                "method": self._prefix,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
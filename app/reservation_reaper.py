@@ -0,0 +1,60 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationReaper:
+    """
+    Thread expiring the basket reservations of the application it is bound to.
+
+    Every RESERVATION_REAP_INTERVAL seconds the reservations past their expiry are ended and their stock is given
+    back. Reapers in several processes can run side by side, each skips the reservations another one has locked.
+    The reap-reservations command does the same once, for deployments running it from a scheduler instead.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 30
+        self.thread = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.stop()
+        self.app = app
+        self.interval = app.config.get('RESERVATION_REAP_INTERVAL', self.interval)
+        app.extensions['reservation_reaper'] = self
+        if self.interval:
+            self.start()
+
+    def start(self):
+        """Start the reaper thread"""
+        self._stopping.clear()
+        self.thread = threading.Thread(target=self._run, name='reservation-reaper', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Ask the reaper to finish its current pass and wait for it
+        :param timeout: Seconds to wait for the thread
+        """
+        self._stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.thread = None
+
+    def _run(self):
+        from app.services import ReservationService
+
+        while not self._stopping.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    expired, error = ReservationService.reap_expired()
+                if error:
+                    logger.error(f'Reservation reaper failed: {error}')
+                elif expired:
+                    logger.info(f'Expired {expired} reservations')
+            except Exception:
+                logger.exception('Reservation reaper failed')
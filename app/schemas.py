@@ -0,0 +1,208 @@
+from marshmallow import fields
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app.extensions import ma
+from app.models import (Category, Customer, Discount, Inventory, Order, OrderItem, Product, ProductAttributes,
+                        ProductVariants)
+
+# Parent of a category, joined to serialize the parent category name
+ParentCategory = aliased(Category, name='parent_category')
+
+
+def _none_if_zero(value):
+    """Report unused discount rates and amounts as None, as Discount.to_dict does"""
+    return value or None
+
+
+class RowSerializer:
+    """
+    Serializer built once from a marshmallow schema into a plain function over row tuples.
+
+    The schema declares the keys and the column each one is read from. Rows are selected with exactly those columns,
+    so serializing a row zips the keys with a slice of the row, with no attribute lookups, relationship loads or
+    per-field dispatch.
+    Decimal, date and datetime values are left as they are and converted by the application's JSON provider.
+    A field can carry a 'serialize' callable in its metadata for any other conversion.
+    """
+
+    def __init__(self, schema, **columns):
+        """
+        :param schema: Marshmallow schema instance declaring the serialized fields, in output order
+        :param columns: Column expressions for fields that are not a column of the schema's model
+        """
+        model = schema.opts.model
+        self.keys = []
+        self.columns = []
+        self.converters = []
+        for name, field in schema.dump_fields.items():
+            self.keys.append(field.data_key or name)
+            self.columns.append(columns[name] if name in columns else getattr(model, field.attribute or name))
+            self.converters.append(field.metadata.get('serialize'))
+        self._compiled = {}
+        self.serialize = self.compile()
+
+    def __call__(self, row):
+        return self.serialize(row)
+
+    def select(self, *extra_columns):
+        """
+        Build a SELECT of the serialized columns
+        :param extra_columns: Further columns to select after the serialized ones, such as a grouping key
+        :return: Select statement
+        """
+        return select(*self.columns, *extra_columns)
+
+    def compile(self, offset=0):
+        """
+        Build the function serializing a row, once per offset
+        :param offset: Position of the first serialized column in the row, when other columns come before it
+        :return: Function converting a row tuple into a dict
+        """
+        if offset not in self._compiled:
+            keys = self.keys
+            end = offset + len(keys)
+            converters = [(key, converter) for key, converter in zip(keys, self.converters) if converter is not None]
+
+            def serialize(row):
+                values = dict(zip(keys, row[offset:end]))
+                for key, convert in converters:
+                    values[key] = convert(values[key])
+                return values
+
+            self._compiled[offset] = serialize
+        return self._compiled[offset]
+
+
+class CategorySchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = Category
+
+    category_id = ma.auto_field()
+    category_name = ma.auto_field()
+    parent_category = fields.String()
+
+
+class CustomerSchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = Customer
+
+    customer_id = ma.auto_field()
+    name = ma.auto_field()
+    mobile_number = ma.auto_field()
+    email = ma.auto_field()
+    outstanding_balance = ma.auto_field()
+    created_by = ma.auto_field()
+    created_date = ma.auto_field()
+    updated_by = ma.auto_field()
+    updated_date = ma.auto_field()
+
+
+class DiscountSchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = Discount
+
+    discount_id = ma.auto_field()
+    discount_name = ma.auto_field()
+    product_id = ma.auto_field()
+    variant_id = ma.auto_field()
+    discount_rate = ma.auto_field(metadata={'serialize': _none_if_zero})
+    discount_amount = ma.auto_field(metadata={'serialize': _none_if_zero})
+    start_date = ma.auto_field()
+    expiry_date = ma.auto_field()
+    description = ma.auto_field()
+    created_by = ma.auto_field()
+    created_date = ma.auto_field()
+    updated_by = ma.auto_field()
+    updated_date = ma.auto_field()
+
+
+class ProductSchema(ma.SQLAlchemySchema):
+    """Product columns of the catalog, the category and variants are nested in by ProductService"""
+    class Meta:
+        model = Product
+
+    product_id = ma.auto_field()
+    product_name = ma.auto_field()
+    is_active = ma.auto_field()
+    created_by = ma.auto_field()
+    created_date = ma.auto_field()
+    updated_by = ma.auto_field()
+    updated_date = ma.auto_field()
+
+
+class ProductVariantSchema(ma.SQLAlchemySchema):
+    """Variant columns of the catalog, the attributes, inventory and discounts are nested in by ProductService"""
+    class Meta:
+        model = ProductVariants
+
+    variant_id = ma.auto_field()
+    sku = ma.auto_field()
+    price = ma.auto_field()
+
+
+class ProductAttributeSchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = ProductAttributes
+
+    attribute_id = ma.auto_field()
+    name = ma.auto_field()
+    value = ma.auto_field()
+
+
+class InventorySchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = Inventory
+
+    inventory_id = ma.auto_field()
+    quantity = ma.auto_field()
+    # Counted with the stock at the warehouse locations
+    warehouse_stock = fields.Integer(attribute='warehouse_total')
+    shop_stock = ma.auto_field()
+    reorder_level = ma.auto_field()
+
+
+class OrderSchema(ma.SQLAlchemySchema):
+    """Order columns of the order history, the order items are nested in by OrderService"""
+    class Meta:
+        model = Order
+
+    order_id = ma.auto_field()
+    customer_id = ma.auto_field()
+    total_items_count = ma.auto_field()
+    total_order_amount = ma.auto_field()
+    order_status = ma.auto_field()
+    order_date = ma.auto_field()
+    client_order_id = ma.auto_field()
+    created_by = ma.auto_field()
+    created_date = ma.auto_field()
+    updated_by = ma.auto_field()
+    updated_date = ma.auto_field()
+
+
+class OrderItemSchema(ma.SQLAlchemySchema):
+    class Meta:
+        model = OrderItem
+
+    order_item_id = ma.auto_field()
+    order_id = ma.auto_field()
+    variant_id = ma.auto_field()
+    quantity = ma.auto_field()
+    discount_rate = ma.auto_field()
+    discount_amount = ma.auto_field()
+    price_at_purchase = ma.auto_field()
+    created_by = ma.auto_field()
+    created_date = ma.auto_field()
+    updated_by = ma.auto_field()
+    updated_date = ma.auto_field()
+
+
+# Compiled once at import, the output matches the models' to_dict methods
+category_serializer = RowSerializer(CategorySchema(), parent_category=ParentCategory.category_name)
+customer_serializer = RowSerializer(CustomerSchema(), outstanding_balance=Customer.balance)
+discount_serializer = RowSerializer(DiscountSchema())
+product_serializer = RowSerializer(ProductSchema())
+variant_serializer = RowSerializer(ProductVariantSchema())
+attribute_serializer = RowSerializer(ProductAttributeSchema())
+inventory_serializer = RowSerializer(InventorySchema())
+order_serializer = RowSerializer(OrderSchema())
+order_item_serializer = RowSerializer(OrderItemSchema())
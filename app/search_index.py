@@ -0,0 +1,106 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict, namedtuple
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+IndexedVariant = namedtuple('IndexedVariant', ['variant_id', 'product_id', 'product_name', 'sku', 'price', 'attributes'])
+
+
+def tokenize(text):
+    """
+    Split text into lower case search tokens
+    :param text: Text to be tokenized
+    :return: List of tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """
+    In-process inverted index of active product variants, used when the database has no full-text search.
+
+    Product name tokens and (attribute name, attribute value) pairs each map to the set of variant ids carrying them,
+    so a search is a handful of set intersections instead of a scan of the catalog.
+    """
+
+    def __init__(self, rows):
+        """
+        Build the index from flat rows, without loading ORM objects
+        :param rows: Iterable of (variant_id, product_id, product_name, sku, price, attribute name, attribute value)
+                     tuples, one per attribute, with None attribute columns for variants without attributes
+        """
+        attributes = defaultdict(list)
+        details = {}
+        for variant_id, product_id, product_name, sku, price, name, value in rows:
+            if variant_id not in details:
+                details[variant_id] = (product_id, product_name, sku, float(price))
+            if name is not None:
+                attributes[variant_id].append((name, value))
+
+        self.variants = {}
+        self.variant_facets = {}
+        self.token_postings = defaultdict(set)
+        self.attribute_postings = defaultdict(set)
+        for variant_id, (product_id, product_name, sku, price) in details.items():
+            variant_attributes = tuple(attributes.get(variant_id, ()))
+            self.variants[variant_id] = IndexedVariant(variant_id, product_id, product_name, sku, price,
+                                                       variant_attributes)
+            self.variant_facets[variant_id] = {(name.lower(), value.lower()) for name, value in variant_attributes}
+            for token in tokenize(product_name):
+                self.token_postings[token].add(variant_id)
+            for key in self.variant_facets[variant_id]:
+                self.attribute_postings[key].add(variant_id)
+
+        # Sorted vocabulary for prefix lookups
+        self.vocabulary = sorted(self.token_postings)
+        self.all_facets = {key: len(variant_ids) for key, variant_ids in self.attribute_postings.items()}
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        position = bisect_left(self.vocabulary, prefix)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(prefix):
+            matches |= self.token_postings[self.vocabulary[position]]
+            position += 1
+        return matches
+
+    def _count_facets(self, matched):
+        if len(matched) < len(self.attribute_postings):
+            facets = Counter()
+            for variant_id in matched:
+                facets.update(self.variant_facets[variant_id])
+            return facets
+        # Broad matches: sizing one set intersection per facet value is much cheaper than walking every variant
+        facets = {}
+        for key, variant_ids in self.attribute_postings.items():
+            count = len(variant_ids & matched)
+            if count:
+                facets[key] = count
+        return facets
+
+    def search(self, query=None, attributes=(), limit=50):
+        """
+        Find variants whose product name matches every query token as a prefix and that carry every attribute
+        :param query: Free text matched against product names
+        :param attributes: Iterable of (name, value) pairs the variant must have
+        :param limit: Maximum number of variants returned
+        :return: Matching variants ordered by variant id, total number of matches and facet counts
+        """
+        candidate_sets = [self._prefix_matches(token) for token in tokenize(query)]
+        candidate_sets.extend(self.attribute_postings.get((name.lower(), value.lower()), set())
+                              for name, value in attributes)
+
+        if not candidate_sets:
+            matched = self.variants.keys()
+            facets = self.all_facets
+        else:
+            # Intersect starting from the smallest set
+            candidate_sets.sort(key=len)
+            matched = set(candidate_sets[0])
+            for candidates in candidate_sets[1:]:
+                matched &= candidates
+            facets = self._count_facets(matched)
+
+        results = [self.variants[variant_id] for variant_id in heapq.nsmallest(limit, matched)]
+        return results, len(matched), facets
@@ -4,3 +4,14 @@ from .category_service import CategoryService
 from .product_service import ProductService
 from .discount_service import DiscountService
 from .order_service import OrderService
+from .search_service import SearchService
+from .import_service import ImportService
+from .pricing_service import PricingService
+from .idempotency_service import IdempotencyService
+from .order_intake_service import OrderIntakeService
+from .sales_report_service import SalesReportService
+from .customer_ledger_service import CustomerLedgerService
+from .stock_alert_service import StockAlertService
+from .inventory_history_service import InventoryHistoryService
+from .reservation_service import ReservationService
+from .location_service import LocationService
@@ -1,8 +1,9 @@
 from app.models import LoginDetails, Staff
-from app.extensions import db
+from app.extensions import db, password_hasher
+from app.password_hasher import PasswordHasherBusy
+from sqlalchemy import update
 from sqlalchemy.exc import SQLAlchemyError
 from flask import jsonify
-from werkzeug.security import check_password_hash
 from flask_jwt_extended import create_access_token
 
 
@@ -27,23 +28,49 @@ class AuthService:
         if isinstance(user, tuple):
             return user
 
-        if not check_password_hash(user.password, password):
-            user.failed_attempts += 1
-            if user.failed_attempts >= self.MAX_FAILED_ATTEMPTS:
-                user.is_locked = True
+        loggin_id, pwhash, staff_id, customer_id = user.loggin_id, user.password, user.staff_id, user.customer_id
+        # Give the connection back while the password is hashed, rather than holding it idle in a transaction
+        db.session.commit()
+
+        # Hashed in the password hasher's processes, a 503 when too many logins are already waiting
+        try:
+            password_matches = password_hasher.check(pwhash, password)
+        except PasswordHasherBusy as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+
+        # The row is no longer held, so the attempts are counted in the UPDATE itself
+        login = LoginDetails.__table__
+        if not password_matches:
+            db.session.execute(update(login).where(login.c.loggin_id == loggin_id).values(
+                failed_attempts=login.c.failed_attempts + 1,
+                is_locked=login.c.is_locked | (login.c.failed_attempts + 1 >= self.MAX_FAILED_ATTEMPTS)
+            ))
             db.session.commit()
             return jsonify({"error": "Invalid username or password"}), 401
 
         # Reset Failed attempts on successful login
-        user.failed_attempts = 0
+        values = {"failed_attempts": 0}
+        # Move hashes made with older parameters onto the current ones while the password is at hand
+        if password_hasher.needs_rehash(pwhash):
+            try:
+                values["password"] = password_hasher.hash(password)
+            except PasswordHasherBusy:
+                pass  # Rehashed on a later login
+        # Unless the account was locked while the password was checked
+        unlocked = db.session.execute(
+            update(login).where((login.c.loggin_id == loggin_id) & login.c.is_locked.is_(False))
+            .values(**values).returning(login.c.loggin_id)
+        ).first()
         db.session.commit()
+        if unlocked is None:
+            return jsonify({"error": "Account is locked!"}), 403
 
-        if user.staff_id:
-            user_id = user.staff_id
-            staff = Staff.query.filter_by(staff_id=user.staff_id).first()
+        if staff_id:
+            user_id = staff_id
+            staff = Staff.query.filter_by(staff_id=staff_id).first()
             role = staff.role.lower()
         else:
-            user_id = user.customer_id
+            user_id = customer_id
             role = "customer"
         access_token = create_access_token(identity=user_id, additional_claims={"role": role})
         return jsonify({"access_token": access_token}), 200
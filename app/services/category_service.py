@@ -1,9 +1,19 @@
+import threading
+from flask import current_app
+from sqlalchemy import select, insert, delete, literal, true, func
 from sqlalchemy.exc import SQLAlchemyError
-from app.models import Category
-from app.extensions import db
+from app.models import Category, CategoryClosure
+from app.extensions import db, catalog_cache
+from app.schemas import category_serializer, ParentCategory
+from app.category_tree import CategoryTree
 
 
 class CategoryService:
+    # In-process category tree, rebuilt whenever the catalog version changes
+    _tree = None
+    _tree_version = None
+    _tree_lock = threading.Lock()
+
     @staticmethod
     def create_category(category_name, created_by, parent_category_id=None):
         try:
@@ -12,6 +22,9 @@ class CategoryService:
             if category_exists:
                 return None, "Category already exists."
 
+            if parent_category_id is not None and not db.session.get(Category, parent_category_id):
+                return None, "Parent category not found."
+
             # Create new category
             new_category = Category(
                 category_name=category_name.lower(),
@@ -19,7 +32,13 @@ class CategoryService:
                 created_by=created_by
             )
             db.session.add(new_category)
+            db.session.flush()
+            db.session.execute(insert(CategoryClosure.__table__).values(
+                ancestor_id=new_category.category_id, descendant_id=new_category.category_id, depth=0
+            ))
+            CategoryService._attach_subtree(new_category.category_id, parent_category_id)
             db.session.commit()
+            catalog_cache.bump_version(catalog_cache.CATEGORIES)
             return new_category, None
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -48,25 +67,146 @@ class CategoryService:
                     return None, "Category name already exists."
                 category.category_name = category_name
 
-            if parent_category_id is not None:
+            if parent_category_id is not None and parent_category_id != category.parent_category_id:
                 if parent_category_id == category_id:
                     return None, "A category cannot be its own parent."
+                if not db.session.get(Category, parent_category_id):
+                    return None, "Parent category not found."
+                if parent_category_id in CategoryService.get_subtree_ids(category_id):
+                    return None, "A category cannot be moved below one of its subcategories."
                 category.parent_category_id = parent_category_id
+                CategoryService._detach_subtree(category_id)
+                CategoryService._attach_subtree(category_id, parent_category_id)
 
             if updated_by:
                 category.updated_by = updated_by
 
             db.session.commit()
+            catalog_cache.bump_version(catalog_cache.CATEGORIES)
             return category, None
         
         except SQLAlchemyError as e:
             db.session.rollback()
             return None, f'An error has occurred: {str(e)}'
 
+    @staticmethod
+    def _attach_subtree(category_id, parent_category_id):
+        """Add the closure rows linking a category and its subtree to a parent and the parent's ancestors"""
+        if parent_category_id is None:
+            return
+        closure = CategoryClosure.__table__
+        supertree = closure.alias('supertree')
+        subtree = closure.alias('subtree')
+        db.session.execute(insert(closure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(supertree.c.ancestor_id, subtree.c.descendant_id, supertree.c.depth + subtree.c.depth + 1)
+            .select_from(supertree.join(subtree, true()))
+            .where(supertree.c.descendant_id == parent_category_id, subtree.c.ancestor_id == category_id)
+        ))
+
+    @staticmethod
+    def _detach_subtree(category_id):
+        """Remove the closure rows linking a category and its subtree to the category's ancestors"""
+        closure = CategoryClosure.__table__
+        db.session.execute(delete(closure).where(
+            closure.c.descendant_id.in_(select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)),
+            closure.c.ancestor_id.in_(
+                select(closure.c.ancestor_id).where(closure.c.descendant_id == category_id, closure.c.depth > 0)
+            )
+        ))
+
+    @staticmethod
+    def rebuild_closure():
+        """
+        Recompute the whole closure table from the parent links, for data written before it was maintained
+        :return: Number of closure rows written and an optional error message.
+        """
+        categories = Category.__table__
+        closure = CategoryClosure.__table__
+        paths = select(
+            categories.c.category_id.label('ancestor_id'),
+            categories.c.category_id.label('descendant_id'),
+            literal(0).label('depth')
+        ).cte('paths', recursive=True)
+        # Paths longer than the number of categories can only come from a cycle, which ends the recursion
+        paths = paths.union_all(
+            select(paths.c.ancestor_id, categories.c.category_id, paths.c.depth + 1).where(
+                categories.c.parent_category_id == paths.c.descendant_id,
+                paths.c.depth < select(func.count()).select_from(categories).scalar_subquery()
+            )
+        )
+        try:
+            db.session.execute(delete(closure))
+            result = db.session.execute(insert(closure).from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(paths.c.ancestor_id, paths.c.descendant_id, paths.c.depth)
+            ))
+            db.session.commit()
+            catalog_cache.bump_version(catalog_cache.CATEGORIES)
+            return result.rowcount, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def get_subtree_ids(category_id):
+        """
+        List a category and all its descendants from the closure table
+        :param category_id: ID of the top category
+        :return: List of category ids, empty if the category does not exist
+        """
+        closure = CategoryClosure.__table__
+        return db.session.execute(
+            select(closure.c.descendant_id).where(closure.c.ancestor_id == category_id)
+        ).scalars().all()
+
+    @staticmethod
+    def categories_statement():
+        """Select the categories for category_serializer, with the parent category joined"""
+        return category_serializer.select().outerjoin(
+            ParentCategory, Category.parent_category_id == ParentCategory.category_id
+        ).order_by(Category.category_id)
+
     @staticmethod
     def get_all_categories():
+        """Retrieve all categories as rows for category_serializer"""
         try:
-            categories = Category.query.all()
+            categories = db.session.execute(CategoryService.categories_statement()).all()
             return categories, None
         except SQLAlchemyError as e:
             return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def iter_categories():
+        """Iterate over all categories as rows for category_serializer, in batches through a server-side cursor"""
+        statement = CategoryService.categories_statement()
+        return db.session.execute(statement.execution_options(yield_per=current_app.config['STREAM_BATCH_SIZE']))
+
+    @staticmethod
+    def get_tree():
+        """Return the in-process category tree, rebuilding it if the categories have changed since it was built"""
+        version = catalog_cache.version_key(catalog_cache.CATEGORIES)
+        with CategoryService._tree_lock:
+            if CategoryService._tree is None or CategoryService._tree_version != version:
+                rows = db.session.execute(
+                    select(Category.category_id, Category.category_name, Category.parent_category_id)
+                    .order_by(Category.category_id)
+                )
+                CategoryService._tree = CategoryTree(rows)
+                CategoryService._tree_version = version
+            return CategoryService._tree
+
+    @staticmethod
+    def get_category_tree(category_id=None):
+        """
+        Nest the categories below a category, or the whole hierarchy
+        :param category_id: ID of the top category, None for every root category
+        :return: Nested categories and an optional error message.
+        """
+        try:
+            tree = CategoryService.get_tree()
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
+        if category_id is not None and category_id not in tree:
+            return None, "Category not found."
+        return {"data": tree.subtree(category_id)}, None
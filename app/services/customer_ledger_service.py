@@ -0,0 +1,99 @@
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Customer, CustomerLedger
+from app.extensions import db
+
+
+class CustomerLedgerService:
+    """
+    Customer balances kept as an append-only ledger.
+
+    Orders and payments only insert ledger entries, so concurrent writers for one customer never wait on the same
+    row. Customer.balance reads the folded balance plus the entries not folded yet, and fold_balances periodically
+    moves entries into customers.outstanding_balance to keep that sum short.
+    """
+    ORDER = 'order'
+    PAYMENT = 'payment'
+
+    @staticmethod
+    def record_orders(entries):
+        """
+        Charge placed orders to their customers in the current transaction, without committing it
+        :param entries: List of dicts with customer_id, order_id, amount and created_by
+        """
+        if entries:
+            db.session.execute(insert(CustomerLedger.__table__), [
+                dict(entry, entry_type=CustomerLedgerService.ORDER) for entry in entries
+            ])
+
+    @staticmethod
+    def record_payment(customer_id, amount, created_by):
+        """
+        Record a payment made by a customer
+        :param customer_id: ID of the customer
+        :param amount: Amount paid
+        :param created_by: ID of the staff member recording the payment
+        :return: The customer's balance after the payment and an optional error message
+        """
+        try:
+            amount = Decimal(str(amount))
+        except InvalidOperation:
+            return None, "Amount must be a number."
+        if not amount.is_finite() or amount <= 0:
+            return None, "Amount must be a positive number."
+        try:
+            # Payments of one customer queue on the customer row, so two cannot both pass the balance check. FOR NO KEY
+            # UPDATE leaves the orders' ledger inserts, which only share-lock the key, free to go on
+            locked = db.session.execute(
+                select(Customer.customer_id).where(Customer.customer_id == customer_id).with_for_update(key_share=True)
+            ).scalar()
+            if locked is None:
+                return None, "Customer not found."
+            # Read after the lock, in a statement that sees the payments committed while waiting for it
+            balance = db.session.execute(
+                select(Customer.balance).where(Customer.customer_id == customer_id)
+            ).scalar()
+            if amount > balance:
+                return None, f"Payment exceeds the outstanding balance of {balance:.2f}."
+            db.session.execute(insert(CustomerLedger.__table__).values(
+                customer_id=customer_id, entry_type=CustomerLedgerService.PAYMENT, amount=-amount,
+                created_by=created_by
+            ))
+            db.session.commit()
+            return balance - amount, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def fold_balances():
+        """
+        Fold the ledger entries not folded yet into the customers' outstanding balances.
+        Entries are marked and summed in the same statement that updates the customers, so a fold running alongside
+        another one, or alongside new entries, never counts an entry twice or misses it.
+        :return: Number of customers updated and an optional error message
+        """
+        ledger = CustomerLedger.__table__
+        customers = Customer.__table__
+        try:
+            folded = (
+                update(ledger).where(ledger.c.folded.is_(False)).values(folded=True)
+                .returning(ledger.c.customer_id, ledger.c.amount)
+                .cte('folded')
+            )
+            totals = (
+                select(folded.c.customer_id, func.sum(folded.c.amount).label('amount'))
+                .group_by(folded.c.customer_id)
+                .cte('totals')
+            )
+            result = db.session.execute(
+                update(customers)
+                .where(customers.c.customer_id == totals.c.customer_id)
+                .values(outstanding_balance=customers.c.outstanding_balance + totals.c.amount)
+            )
+            db.session.commit()
+            return result.rowcount, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
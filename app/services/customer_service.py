@@ -1,7 +1,8 @@
+from flask import current_app
 from app.models import LoginDetails, Customer
-from werkzeug.security import generate_password_hash
 from sqlalchemy.exc import SQLAlchemyError
-from app.extensions import db
+from app.extensions import db, password_hasher
+from app.schemas import customer_serializer
 
 
 class CustomerService:
@@ -17,6 +18,8 @@ class CustomerService:
         :param password: provided password by customer
         :return: Newly created customer and an optional error message.
         """
+        # Hashed before any database work, so no connection is held while waiting for the password hasher
+        hashed_password = password_hasher.hash(password) if username and password else None
         try:
             # Check if email or username exists
             if email and Customer.query.filter_by(email=email).first():
@@ -38,7 +41,6 @@ class CustomerService:
 
             # Saving login details
             if username and password:
-                hashed_password = generate_password_hash(password)
                 login_details = LoginDetails(
                     customer_id=new_customer.customer_id,
                     username=username,
@@ -66,8 +68,14 @@ class CustomerService:
 
     @staticmethod
     def get_all_customers():
-        """Retrieve all customers"""
-        return Customer.query.all()
+        """Retrieve all customers as rows for customer_serializer"""
+        return db.session.execute(customer_serializer.select().order_by(Customer.customer_id)).all()
+
+    @staticmethod
+    def iter_customers():
+        """Iterate over all customers as rows for customer_serializer, in batches through a server-side cursor"""
+        statement = customer_serializer.select().order_by(Customer.customer_id)
+        return db.session.execute(statement.execution_options(yield_per=current_app.config['STREAM_BATCH_SIZE']))
 
     @staticmethod
     def get_customer_by_email(email):
@@ -1,9 +1,20 @@
+import threading
+from datetime import date
+from flask import current_app
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
-from app.models import Discount
-from app.extensions import db
+from app.models import Discount, ProductVariants
+from app.extensions import db, catalog_cache
+from app.schemas import discount_serializer
+from app.discount_index import DiscountIndex, IndexedDiscount
 
 
 class DiscountService:
+    # In-process discount index, rebuilt whenever the catalog version changes and patched by local writes
+    _index = None
+    _index_version = None
+    _index_lock = threading.Lock()
+
     @staticmethod
     def create_discount(discount_data):
         """
@@ -12,6 +23,9 @@ class DiscountService:
         :return: Newly created discount parameters and an optional error message
         """
         try:
+            error = DiscountService.validate_discount(discount_data)
+            if error:
+                return None, error
             new_discount = Discount(
                 discount_name=discount_data.get('discount_name'),
                 product_id=discount_data.get('product_id'),
@@ -25,6 +39,7 @@ class DiscountService:
             )
             db.session.add(new_discount)
             db.session.commit()
+            DiscountService._apply_to_index(new_discount)
             return new_discount, None
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -42,12 +57,19 @@ class DiscountService:
 
     @staticmethod
     def get_discounts():
+        """Retrieve all discounts as rows for discount_serializer"""
         try:
-            discounts = Discount.query.all()
+            discounts = db.session.execute(discount_serializer.select().order_by(Discount.discount_id)).all()
             return discounts, None
         except SQLAlchemyError as e:
             return None, f'An error has occurred while getting discounts: {str(e)}'
 
+    @staticmethod
+    def iter_discounts():
+        """Iterate over all discounts as rows for discount_serializer, in batches through a server-side cursor"""
+        statement = discount_serializer.select().order_by(Discount.discount_id)
+        return db.session.execute(statement.execution_options(yield_per=current_app.config['STREAM_BATCH_SIZE']))
+
     @staticmethod
     def update_discount(discount_id, update_data):
         """
@@ -73,9 +95,105 @@ class DiscountService:
             discount.updated_by = update_data.get('updated_by', discount.updated_by)
             discount.updated_date = db.func.current_timestamp()
 
+            error = DiscountService.validate_discount({
+                "product_id": discount.product_id,
+                "variant_id": discount.variant_id,
+                "start_date": discount.start_date,
+                "expiry_date": discount.expiry_date
+            })
+            if error:
+                db.session.rollback()
+                return None, error
+
             db.session.commit()
+            DiscountService._apply_to_index(discount)
             return discount, None
         except SQLAlchemyError as e:
             db.session.rollback()
             return None, f'An error has occurred while updating discount: {str(e)}'
 
+    @staticmethod
+    def validate_discount(discount_data):
+        """
+        Check the product, variant and campaign period of a discount. A discount without a variant applies to
+        every variant of its product.
+        :param discount_data: Dictionary of the discount details
+        :return: Error message, or None if the discount is valid
+        """
+        try:
+            start_date = DiscountService._to_date(discount_data.get('start_date'))
+            expiry_date = DiscountService._to_date(discount_data.get('expiry_date'))
+        except ValueError:
+            return "Dates must be in YYYY-MM-DD format."
+        if start_date is None:
+            return "A start date is required."
+        if expiry_date is not None and expiry_date < start_date:
+            return "The expiry date cannot be before the start date."
+
+        variant_id = discount_data.get('variant_id')
+        if variant_id is not None:
+            variant = db.session.get(ProductVariants, variant_id)
+            if not variant:
+                return "Variant not found."
+            if variant.product_id != discount_data.get('product_id'):
+                return "The variant does not belong to the product."
+        return None
+
+    @staticmethod
+    def _to_date(value):
+        if value is None or isinstance(value, date):
+            return value
+        return date.fromisoformat(value)
+
+    @staticmethod
+    def get_index():
+        """Return the in-process discount index, rebuilding it if the discounts have changed since it was built"""
+        version = catalog_cache.version_key(catalog_cache.DISCOUNTS)
+        with DiscountService._index_lock:
+            if DiscountService._index is None or DiscountService._index_version != version:
+                rows = db.session.execute(select(
+                    Discount.discount_id, Discount.product_id, Discount.variant_id, Discount.discount_rate,
+                    Discount.discount_amount, Discount.start_date, Discount.expiry_date
+                ))
+                DiscountService._index = DiscountIndex(rows)
+                DiscountService._index_version = version
+            return DiscountService._index
+
+    @staticmethod
+    def _apply_to_index(discount):
+        """
+        Bump the discount version after a discount is committed, and patch this process' index in place instead of
+        rebuilding it when no other discount was written since it was last current
+        :param discount: Committed discount
+        """
+        with DiscountService._index_lock:
+            index_version = DiscountService._index_version
+            catalog_cache.bump_version(catalog_cache.DISCOUNTS)
+            if DiscountService._index is None:
+                return
+            DiscountService._index.upsert(IndexedDiscount(
+                discount.discount_id, discount.product_id, discount.variant_id, discount.discount_rate,
+                discount.discount_amount, discount.start_date, discount.expiry_date
+            ))
+            generation, version = catalog_cache.version_key(catalog_cache.DISCOUNTS)
+            if index_version == (generation, version - 1):
+                DiscountService._index_version = (generation, version)
+
+    @staticmethod
+    def resolve_discounts(variant_ids, on=None):
+        """
+        Resolve the discount in effect for each of a list of variants
+        :param variant_ids: List of variant ids
+        :param on: Date to resolve the discounts at, today when omitted
+        :return: Dict of variant id to the discount in effect or None for known variants, and an optional error
+                 message.
+        """
+        try:
+            index = DiscountService.get_index()
+            variants = db.session.execute(
+                select(ProductVariants.variant_id, ProductVariants.product_id)
+                .where(ProductVariants.variant_id.in_(variant_ids))
+            ).all()
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred while resolving discounts: {str(e)}'
+        return index.resolve(variants, on), None
@@ -0,0 +1,115 @@
+import hashlib
+import orjson
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import IdempotencyKey
+from app.extensions import db
+
+
+class IdempotencyService:
+    """
+    Replays the response of a request retried with the same Idempotency-Key.
+
+    A key is claimed with INSERT ... ON CONFLICT inside the transaction doing the work, so a concurrent duplicate
+    blocks on the claim until the first request commits or rolls back. Only committed work keeps its key; a failed
+    request releases it and can be retried. Keys expire after IDEMPOTENCY_KEY_TTL, after which they can be reused.
+    Keys are stored per caller, so two clients picking the same key never see each other's responses.
+    """
+    MAX_KEY_LENGTH = 255
+
+    @staticmethod
+    def request_hash(data):
+        """
+        Digest of a request body, independent of key order
+        :param data: Parsed JSON body
+        :return: 32 byte SHA-256 digest
+        """
+        return hashlib.sha256(orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)).digest()
+
+    @staticmethod
+    def owner(role, identity):
+        """
+        Caller a key belongs to, customers and staff are numbered apart so their ids can match
+        :param role: Role claim of the access token
+        :param identity: Identity of the access token
+        :return: Owner to claim keys for, e.g. 'customer:12'
+        """
+        return f"{'customer' if role == 'customer' else 'staff'}:{identity}"
+
+    @staticmethod
+    def claim(key, data, owner):
+        """
+        Claim a key for the current transaction, or fetch the response stored by an earlier request with it.
+        The claim is released when the transaction rolls back, and kept with save() when it commits.
+        :param key: Idempotency-Key header value
+        :param data: Parsed JSON body of the request
+        :param owner: Caller claiming the key, from owner()
+        :return: Stored response, None when the key was claimed, and an optional error message
+        """
+        if len(key) > IdempotencyService.MAX_KEY_LENGTH:
+            return None, f"Idempotency-Key must be at most {IdempotencyService.MAX_KEY_LENGTH} characters."
+        request_hash = IdempotencyService.request_hash(data)
+        table = IdempotencyKey.__table__
+        now = func.current_timestamp()
+        expires_at = now + current_app.config['IDEMPOTENCY_KEY_TTL']
+        statement = insert(table).values(owner=owner, idempotency_key=key, request_hash=request_hash, created_date=now,
+                                         expires_at=expires_at)
+        try:
+            # Waits here while another transaction holds an uncommitted claim on the key; expired keys are taken over
+            claimed = db.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[table.c.owner, table.c.idempotency_key],
+                    set_={"request_hash": statement.excluded.request_hash, "response": None,
+                          "created_date": now, "expires_at": expires_at},
+                    where=table.c.expires_at <= now
+                ).returning(table.c.idempotency_key)
+            ).first()
+            if claimed:
+                return None, None
+
+            stored = db.session.execute(
+                select(table.c.request_hash, table.c.response)
+                .where(table.c.owner == owner, table.c.idempotency_key == key)
+            ).first()
+            db.session.rollback()
+            if stored is None or stored.response is None:
+                return None, "A request with this Idempotency-Key is still being processed."
+            if stored.request_hash != request_hash:
+                return None, "This Idempotency-Key was already used with a different request."
+            return stored.response, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def save(key, response, owner):
+        """
+        Store the response of a claimed key, to be committed with the work it describes
+        :param key: Idempotency-Key claimed in the current transaction
+        :param response: JSON serializable response
+        :param owner: Caller the key was claimed for
+        """
+        table = IdempotencyKey.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.owner == owner, table.c.idempotency_key == key)
+            .values(response=response)
+        )
+
+    @staticmethod
+    def purge_expired():
+        """
+        Delete expired keys
+        :return: Number of keys deleted and an optional error message
+        """
+        try:
+            result = db.session.execute(
+                delete(IdempotencyKey.__table__).where(IdempotencyKey.__table__.c.expires_at <= func.current_timestamp())
+            )
+            db.session.commit()
+            return result.rowcount, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
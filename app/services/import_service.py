@@ -0,0 +1,271 @@
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+from flask import current_app
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Category, Inventory, Product, ProductAttributes, ProductVariants
+from app.extensions import db, catalog_cache
+from .inventory_history_service import InventoryHistoryService
+from .location_service import LocationService
+
+
+class ImportService:
+    """
+    Bulk import of products with their variants, attributes and inventory from CSV or NDJSON.
+
+    Input is parsed as a stream and written in batches of multi-row INSERT statements, using RETURNING to map the
+    generated product and variant ids. Invalid rows are reported and skipped without aborting the import.
+    """
+    FORMATS = ('csv', 'ndjson')
+    ATTRIBUTE_PREFIX = 'attr_'
+    INVENTORY_FIELDS = ('quantity', 'warehouse_stock', 'shop_stock', 'reorder_level')
+
+    @staticmethod
+    def parse_csv(stream):
+        """
+        Parse a CSV file with one variant per row. Consecutive rows with the same product_name and category_id
+        make up one product, and attr_<name> columns hold the variant attributes.
+        :param stream: Text stream of the CSV file
+        :return: Generator of (line numbers, product data, error message) tuples
+        """
+        reader = csv.DictReader(stream)
+        rows = enumerate(reader, start=2)
+        for _, group in groupby(rows, key=lambda item: (item[1].get('product_name'), item[1].get('category_id'))):
+            group = list(group)
+            first = group[0][1]
+            variants = []
+            for _, row in group:
+                attributes = [
+                    {"name": column[len(ImportService.ATTRIBUTE_PREFIX):], "value": value}
+                    for column, value in row.items()
+                    if column and column.startswith(ImportService.ATTRIBUTE_PREFIX) and value
+                ]
+                inventory = {field: row[field] for field in ImportService.INVENTORY_FIELDS if row.get(field)}
+                variants.append({
+                    "sku": row.get('sku'),
+                    "price": row.get('price'),
+                    "attributes": attributes,
+                    "inventory": inventory or None
+                })
+            product = {
+                "product_name": first.get('product_name'),
+                "category_id": first.get('category_id'),
+                "is_active": first.get('is_active') or True,
+                "variants": variants
+            }
+            yield [line for line, _ in group], product, None
+
+    @staticmethod
+    def parse_ndjson(stream):
+        """
+        Parse newline delimited JSON with one product per line, in the same shape accepted by add_product
+        :param stream: Text stream of the NDJSON file
+        :return: Generator of (line numbers, product data, error message) tuples
+        """
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                product = json.loads(line)
+            except ValueError:
+                yield [line_number], None, "Invalid JSON."
+                continue
+            if not isinstance(product, dict):
+                yield [line_number], None, "Expected a JSON object."
+                continue
+            yield [line_number], product, None
+
+    @staticmethod
+    def validate_product(product, category_ids, managed_levels=()):
+        """
+        Check and normalise a parsed product before it is written
+        :param product: Parsed product data
+        :param category_ids: Set of existing category ids
+        :param managed_levels: Inventory levels kept per location, which new products cannot bring stock to
+        :return: Normalised product, raises ValueError describing the first problem found
+        """
+        product_name = (product.get('product_name') or '').strip()
+        if not product_name:
+            raise ValueError("product_name is required.")
+        try:
+            category_id = int(product.get('category_id'))
+        except (TypeError, ValueError):
+            raise ValueError("category_id must be a number.")
+        if category_id not in category_ids:
+            raise ValueError(f"Category with ID {category_id} not found.")
+
+        is_active = product.get('is_active', True)
+        if isinstance(is_active, str):
+            is_active = is_active.lower() in ('true', '1')
+
+        variants = product.get('variants') or []
+        if not variants or not isinstance(variants, list):
+            raise ValueError("A product needs at least one variant.")
+        normalised_variants = []
+        for variant in variants:
+            if not isinstance(variant, dict):
+                raise ValueError("Each variant must be an object.")
+            sku = str(variant.get('sku') or '').strip()
+            if not sku:
+                raise ValueError("sku is required.")
+            try:
+                price = Decimal(str(variant.get('price')))
+            except InvalidOperation:
+                raise ValueError(f"Invalid price for SKU {sku}.")
+            if not price.is_finite() or price < 0:
+                raise ValueError(f"Invalid price for SKU {sku}.")
+
+            inventory = variant.get('inventory')
+            if inventory:
+                if not isinstance(inventory, dict):
+                    raise ValueError(f"Inventory for SKU {sku} must be an object.")
+                try:
+                    inventory = {field: int(inventory.get(field, 0)) for field in ImportService.INVENTORY_FIELDS}
+                except (TypeError, ValueError):
+                    raise ValueError(f"Inventory levels for SKU {sku} must be whole numbers.")
+                error = LocationService.stock_edit_error(inventory, managed_levels)
+                if error:
+                    raise ValueError(error)
+
+            attributes = []
+            for attribute in variant.get('attributes') or []:
+                if not isinstance(attribute, dict) or not attribute.get('name') or not attribute.get('value'):
+                    raise ValueError(f"Attributes for SKU {sku} need a name and value.")
+                attributes.append({"name": attribute['name'], "value": str(attribute['value'])})
+
+            normalised_variants.append({"sku": sku, "price": price, "attributes": attributes, "inventory": inventory})
+
+        return {
+            "product_name": product_name,
+            "category_id": category_id,
+            "is_active": bool(is_active),
+            "variants": normalised_variants
+        }
+
+    @staticmethod
+    def import_products(records, created_by, batch_size=None):
+        """
+        Import parsed products in batches, committing after each batch.
+
+        :param records: Iterable of (line numbers, product data, error message) tuples from parse_csv or parse_ndjson
+        :param created_by: ID of the staff member importing the products
+        :param batch_size: Products written per batch, defaults to IMPORT_BATCH_SIZE
+        :return: Summary with imported counts, per-row errors and throughput
+        """
+        batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+        start_time = time.perf_counter()
+        summary = {"rows": 0, "products": 0, "variants": 0, "errors": []}
+        category_ids = set(db.session.execute(select(Category.category_id)).scalars())
+        managed_levels = LocationService.managed_levels()
+        seen_skus = set()
+        batch = []
+
+        for lines, product, error in records:
+            summary["rows"] += len(lines)
+            if error is None:
+                try:
+                    product = ImportService.validate_product(product, category_ids, managed_levels)
+                except ValueError as e:
+                    error = str(e)
+            if error:
+                summary["errors"].append({"lines": lines, "error": error})
+                continue
+
+            batch.append((lines, product))
+            if len(batch) >= batch_size:
+                ImportService._write_batch(batch, created_by, seen_skus, summary)
+                batch = []
+        if batch:
+            ImportService._write_batch(batch, created_by, seen_skus, summary)
+
+        if summary["products"]:
+            catalog_cache.bump_version(catalog_cache.CATALOG, catalog_cache.STOCK)
+        elapsed = time.perf_counter() - start_time
+        summary["seconds"] = round(elapsed, 3)
+        summary["rows_per_second"] = round(summary["rows"] / elapsed) if elapsed else None
+        return summary
+
+    @staticmethod
+    def _write_batch(batch, created_by, seen_skus, summary):
+        # Reject SKUs repeated in the file or already in the catalog, with one query per batch
+        batch_skus = [variant['sku'] for _, product in batch for variant in product['variants']]
+        taken = set(db.session.execute(
+            select(ProductVariants.sku).where(ProductVariants.sku.in_(batch_skus))
+        ).scalars())
+        accepted = []
+        for lines, product in batch:
+            skus = [variant['sku'] for variant in product['variants']]
+            duplicates = [sku for sku in skus if sku in taken or sku in seen_skus or skus.count(sku) > 1]
+            if duplicates:
+                summary["errors"].append({"lines": lines, "error": f"SKU already exists: {duplicates[0]}"})
+                continue
+            seen_skus.update(skus)
+            accepted.append((lines, product))
+        if not accepted:
+            return
+
+        try:
+            with db.session.begin_nested():
+                ImportService._insert_products([product for _, product in accepted], created_by)
+            summary["products"] += len(accepted)
+            summary["variants"] += sum(len(product['variants']) for _, product in accepted)
+        except SQLAlchemyError:
+            # Retry one product at a time so that only the offending rows are rejected
+            for lines, product in accepted:
+                try:
+                    with db.session.begin_nested():
+                        ImportService._insert_products([product], created_by)
+                    summary["products"] += 1
+                    summary["variants"] += len(product['variants'])
+                except SQLAlchemyError as e:
+                    summary["errors"].append({"lines": lines, "error": f"An error has occurred: {str(e)}"})
+        db.session.commit()
+
+    @staticmethod
+    def _insert_products(products, created_by):
+        """Insert products and their related rows with one multi-row INSERT per table"""
+        product_table = Product.__table__
+        variant_table = ProductVariants.__table__
+
+        product_ids = db.session.execute(
+            insert(product_table).returning(product_table.c.product_id, sort_by_parameter_order=True),
+            [{
+                "product_name": product['product_name'],
+                "category_id": product['category_id'],
+                "is_active": product['is_active'],
+                "created_by": created_by
+            } for product in products]
+        ).scalars().all()
+
+        variants = [(product_id, variant) for product_id, product in zip(product_ids, products)
+                    for variant in product['variants']]
+        variant_ids = db.session.execute(
+            insert(variant_table).returning(variant_table.c.variant_id, sort_by_parameter_order=True),
+            [{
+                "product_id": product_id,
+                "sku": variant['sku'],
+                "price": variant['price'],
+                "created_by": created_by
+            } for product_id, variant in variants]
+        ).scalars().all()
+
+        attribute_rows = []
+        inventory_rows = []
+        for variant_id, (_, variant) in zip(variant_ids, variants):
+            attribute_rows.extend(
+                dict(attribute, variant_id=variant_id, created_by=created_by) for attribute in variant['attributes']
+            )
+            if variant['inventory']:
+                inventory_rows.append(dict(variant['inventory'], variant_id=variant_id, created_by=created_by))
+        if attribute_rows:
+            db.session.execute(insert(ProductAttributes.__table__), attribute_rows)
+        if inventory_rows:
+            db.session.execute(insert(Inventory.__table__), inventory_rows)
+            InventoryHistoryService.record([
+                InventoryHistoryService.change(row['variant_id'], None, row, InventoryHistoryService.NEW_STOCK,
+                                               created_by)
+                for row in inventory_rows
+            ])
@@ -0,0 +1,150 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, insert, select, true
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Inventory, InventoryHistory
+from app.extensions import db
+from .stock_alert_service import StockAlertService
+
+
+class InventoryHistoryService:
+    """
+    Journal of stock movements and the stock levels rebuilt from it.
+
+    Code changing stock passes the levels before and after each change to record(), which writes them in the same
+    transaction with one multi-row INSERT, so the journal holds exactly the committed changes. Journal rows are
+    written while the inventory rows are locked, so their order per variant is the order of the changes. The same
+    changes keep the low-stock alerts up to date.
+    """
+    # Reasons for a change in stock
+    SALE = 'sale'
+    NEW_STOCK = 'new_stock'
+    ADJUSTMENT = 'adjustment'
+    TRANSFER = 'transfer'
+    STOCK_LEVELS = ('quantity', 'warehouse_stock', 'shop_stock')
+    # Levels passed with every change, the reorder level is only used for the low-stock alerts
+    TRACKED_LEVELS = STOCK_LEVELS + ('reorder_level',)
+
+    @staticmethod
+    def level_columns():
+        """
+        Columns reading the TRACKED_LEVELS of inventory rows, the warehouse stock including the warehouse locations'
+        :return: List of column expressions labelled with the level names
+        """
+        inventory = Inventory.__table__
+        return [Inventory.warehouse_total.label(level) if level == 'warehouse_stock' else inventory.c[level]
+                for level in InventoryHistoryService.TRACKED_LEVELS]
+
+    @staticmethod
+    def change(variant_id, before, after, change_reason, staff_id):
+        """
+        Build a journal entry
+        :param variant_id: ID of the product variant
+        :param before: Mapping of TRACKED_LEVELS to the levels before the change, None for new stock
+        :param after: Mapping of TRACKED_LEVELS to the levels after the change
+        :param change_reason: One of the reasons above
+        :param staff_id: ID of the staff member making the change
+        :return: Dict to pass to record()
+        """
+        entry = {"variant_id": variant_id, "change_reason": change_reason, "staff_id": staff_id,
+                 "created_by": staff_id}
+        for level in InventoryHistoryService.TRACKED_LEVELS:
+            entry[f'{level}_before'] = before[level] if before is not None else 0
+            entry[f'{level}_after'] = after[level]
+        return entry
+
+    @staticmethod
+    def record(entries):
+        """
+        Write journal entries and the low-stock alerts they raise or clear in the current transaction, without
+        committing it
+        :param entries: List of dicts built by change()
+        """
+        StockAlertService.record_changes(entries)
+        rows = [
+            {key: value for key, value in entry.items() if not key.startswith('reorder_level_')}
+            for entry in entries if any(
+                entry[f'{level}_before'] != entry[f'{level}_after'] for level in InventoryHistoryService.STOCK_LEVELS
+            )
+        ]
+        if rows:
+            # The time of the change rather than the start of its transaction
+            db.session.execute(insert(InventoryHistory.__table__).values(change_date=func.clock_timestamp()), rows)
+
+    @staticmethod
+    def get_history(variant_id, date_from=None, date_to=None):
+        """
+        List the stock movements of a variant, oldest first
+        :param variant_id: ID of the product variant
+        :param date_from: Only return changes on or after this date, as YYYY-MM-DD
+        :param date_to: Only return changes on or before this date, as YYYY-MM-DD
+        :return: List of journal entries and an optional error message
+        """
+        try:
+            date_from = date.fromisoformat(date_from) if date_from else None
+            date_to = date.fromisoformat(date_to) if date_to else None
+        except ValueError:
+            return None, "Dates must be in YYYY-MM-DD format."
+
+        query = InventoryHistory.query.filter(InventoryHistory.variant_id == variant_id)
+        if date_from:
+            query = query.filter(InventoryHistory.change_date >= date_from)
+        if date_to:
+            query = query.filter(InventoryHistory.change_date < date_to + timedelta(days=1))
+        try:
+            entries = query.order_by(InventoryHistory.change_date, InventoryHistory.history_id).all()
+            return [entry.to_dict() for entry in entries], None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def get_stock_at(at=None, variant_ids=None):
+        """
+        Rebuild stock levels at a point in time from the journal.
+
+        A variant's levels are those after its last change up to that time or, when it only changed later, those
+        before its first later change. Variants that have not changed since are at their current levels. Each lookup
+        is a single probe of the (variant_id, change_date) index.
+        :param at: Point in time as an ISO 8601 date and time, now when omitted
+        :param variant_ids: Only return these variants
+        :return: List of stock levels per variant and an optional error message
+        """
+        try:
+            at = datetime.fromisoformat(at) if at else datetime.now()
+        except (TypeError, ValueError):
+            return None, "at must be an ISO 8601 date and time."
+
+        inventory = Inventory.__table__
+        history = InventoryHistory.__table__
+        levels = InventoryHistoryService.STOCK_LEVELS
+        last_change = (
+            select(*(history.c[f'{level}_after'].label(level) for level in levels))
+            .where(history.c.variant_id == inventory.c.variant_id, history.c.change_date <= at)
+            .order_by(history.c.change_date.desc(), history.c.history_id.desc())
+            .limit(1)
+            .lateral('last_change')
+        )
+        next_change = (
+            select(*(history.c[f'{level}_before'].label(level) for level in levels))
+            .where(history.c.variant_id == inventory.c.variant_id, history.c.change_date > at)
+            .order_by(history.c.change_date, history.c.history_id)
+            .limit(1)
+            .lateral('next_change')
+        )
+        current = {column.name: column for column in InventoryHistoryService.level_columns()}
+        query = (
+            select(inventory.c.variant_id, *(
+                func.coalesce(last_change.c[level], next_change.c[level], current[level]).label(level)
+                for level in levels
+            ))
+            .select_from(inventory)
+            .outerjoin(last_change, true())
+            .outerjoin(next_change, true())
+            .where(inventory.c.created_date <= at)
+            .order_by(inventory.c.variant_id)
+        )
+        if variant_ids:
+            query = query.where(inventory.c.variant_id.in_(variant_ids))
+        try:
+            return [row._asdict() for row in db.session.execute(query)], None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
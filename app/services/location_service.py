@@ -0,0 +1,407 @@
+from flask import current_app
+from sqlalchemy import Integer, bindparam, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Inventory, Location, LocationStock, ProductVariants
+from app.extensions import db, catalog_cache
+from .inventory_history_service import InventoryHistoryService
+
+
+class LocationService:
+    """
+    Stock kept per location, the warehouse and each shop, in rows of their own.
+
+    Warehouse stock is only kept on the warehouse rows, Inventory.warehouse_total adds them up, so receiving and moves
+    within the warehouse never touch the inventory row sales deduct from. The shop rows break down the shop_stock of
+    the inventory row, and stock reaching or leaving the shops changes its quantity, the stock that can be sold, so
+    only those transfers lock the inventory rows, in variant_id order like orders and before any location row. A batch
+    is applied with one conditional UPDATE ... FROM unnest(...) of the net change per location row, which fails the
+    batch when any location is left short, and journalled like any other stock change. Sales take their stock from
+    the shops through record_sales. The first location of each type takes over the stock of that type.
+    """
+    WAREHOUSE = 'warehouse'
+    SHOP = 'shop'
+    TYPES = (WAREHOUSE, SHOP)
+    # Inventory level holding the total of each type of location
+    LEVELS = {WAREHOUSE: 'warehouse_stock', SHOP: 'shop_stock'}
+
+    @staticmethod
+    def add_location(location_data):
+        """
+        Add a warehouse or shop, the first one of its type starts with the stock of that type on the inventory rows
+        :param location_data: Dict with location_name, location_type and created_by
+        :return: New location and an optional error message
+        """
+        location_name = location_data.get('location_name')
+        location_type = location_data.get('location_type')
+        if not isinstance(location_name, str) or not location_name.strip():
+            return None, "location_name is required."
+        if location_type not in LocationService.TYPES:
+            return None, f"location_type must be one of {', '.join(LocationService.TYPES)}."
+        inventory_table = Inventory.__table__
+        try:
+            if Location.query.filter_by(location_name=location_name.strip()).first():
+                return None, f"Location {location_name.strip()} already exists."
+            stock = {}
+            is_first = not Location.query.filter_by(location_type=location_type).first()
+            if is_first:
+                # Waits for stock changes in progress. A concurrent first location of the type waits here too and
+                # then finds this one.
+                for variant_id, quantity in db.session.execute(
+                    select(inventory_table.c.variant_id, inventory_table.c[LocationService.LEVELS[location_type]])
+                    .order_by(inventory_table.c.variant_id, inventory_table.c.inventory_id)
+                    .with_for_update()
+                ):
+                    if location_type == LocationService.WAREHOUSE:
+                        stock[variant_id] = stock.get(variant_id, 0) + quantity
+                    else:
+                        stock.setdefault(variant_id, quantity)
+                is_first = not Location.query.filter_by(location_type=location_type).first()
+
+            location = Location(location_name=location_name.strip(), location_type=location_type,
+                                created_by=location_data.get('created_by'))
+            db.session.add(location)
+            db.session.flush()
+            seeded = [{"variant_id": variant_id, "location_id": location.location_id, "quantity": quantity,
+                       "updated_by": location_data.get('created_by')}
+                      for variant_id, quantity in stock.items() if quantity > 0]
+            if is_first and seeded:
+                # The stock of this type counted on the inventory rows so far is kept here
+                db.session.execute(insert(LocationStock.__table__), seeded)
+                if location_type == LocationService.WAREHOUSE:
+                    # and from now on only here
+                    db.session.execute(update(inventory_table).where(inventory_table.c.warehouse_stock != 0)
+                                       .values(warehouse_stock=0))
+            db.session.commit()
+            return location, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def managed_levels():
+        """
+        Inventory levels kept per location, which only transfers change once there is a location of their type
+        :return: Set of level names
+        """
+        return {LocationService.LEVELS[location_type] for location_type in db.session.execute(
+            select(Location.location_type).distinct()
+        ).scalars()}
+
+    @staticmethod
+    def stock_edit_error(levels, managed, current=None):
+        """
+        Refuse a direct edit of the stock kept per location
+        :param levels: Dict of the inventory levels being set
+        :param managed: Levels kept per location, from managed_levels()
+        :param current: Current levels of the variant, None when it has no inventory yet
+        :return: Error message, None when the edit leaves the stock kept per location as it is
+        """
+        for level in sorted(managed):
+            if levels.get(level) is not None and levels[level] != (current[level] if current else 0):
+                return f"{level} is kept per location, change it with a stock transfer."
+        return None
+
+    @staticmethod
+    def get_locations():
+        """
+        List the locations
+        :return: List of locations and an optional error message
+        """
+        try:
+            return [location.to_dict() for location in Location.query.order_by(Location.location_id)], None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def parse_transfers(transfers):
+        """
+        Check a batch of transfers and net them per variant and location
+        :param transfers: List of dicts with variant_id, quantity, and from_location_id, to_location_id or both.
+                          Stock received from outside has no from_location_id, stock leaving has no to_location_id.
+        :return: Dict of (variant_id, location_id) to the net change of its stock and an optional error message
+        """
+        if not isinstance(transfers, list) or not transfers:
+            return None, "Provide a list of transfers."
+        max_lines = current_app.config['STOCK_TRANSFER_MAX_LINES']
+        if len(transfers) > max_lines:
+            return None, f"A request can have at most {max_lines} transfers."
+
+        changes = {}
+        for transfer in transfers:
+            if not isinstance(transfer, dict):
+                return None, "Each transfer must be an object."
+            variant_id = transfer.get('variant_id')
+            quantity = transfer.get('quantity')
+            source = transfer.get('from_location_id')
+            destination = transfer.get('to_location_id')
+            if not isinstance(variant_id, int) or not isinstance(quantity, int) or quantity < 1:
+                return None, "Each transfer needs a variant_id and a positive whole quantity."
+            if not all(location_id is None or isinstance(location_id, int) for location_id in (source, destination)) \
+                    or source == destination:
+                return None, "Each transfer needs a different from_location_id and to_location_id."
+            for location_id, change in ((source, -quantity), (destination, quantity)):
+                if location_id is not None:
+                    changes[(variant_id, location_id)] = changes.get((variant_id, location_id), 0) + change
+        return {key: change for key, change in changes.items() if change}, None
+
+    @staticmethod
+    def transfer(transfers, updated_by):
+        """
+        Move stock between locations, all transfers or none of them
+        :param transfers: List of transfers, see parse_transfers
+        :param updated_by: ID of the staff member moving the stock
+        :return: Stock left at each location changed and an optional error message
+        """
+        changes, error = LocationService.parse_transfers(transfers)
+        if error:
+            return None, error
+        if not changes:
+            return [], None
+
+        inventory_table = Inventory.__table__
+        stock_table = LocationStock.__table__
+        try:
+            variant_ids = {variant_id for variant_id, _ in changes}
+            location_ids = {location_id for _, location_id in changes}
+            known_variants = set(db.session.execute(
+                select(ProductVariants.variant_id).where(ProductVariants.variant_id.in_(variant_ids))
+            ).scalars())
+            location_types = dict(db.session.execute(
+                select(Location.location_id, Location.location_type).where(Location.location_id.in_(location_ids))
+            ).all())
+            if variant_ids - known_variants:
+                return None, f"Product variant for ID: {min(variant_ids - known_variants)} not found."
+            if location_ids - set(location_types):
+                return None, f"Location for ID: {min(location_ids - set(location_types))} not found."
+
+            # Net change of the stock of each variant at the warehouse and at the shops, moves between locations of
+            # one type leave it as it is
+            totals = {}
+            for (variant_id, location_id), change in changes.items():
+                total = totals.setdefault(variant_id, {"warehouse_stock": 0, "shop_stock": 0})
+                total[LocationService.LEVELS[location_types[location_id]]] += change
+            totals = {variant_id: total for variant_id, total in totals.items() if any(total.values())}
+            shop_changes = {variant_id: total['shop_stock'] for variant_id, total in totals.items()
+                            if total['shop_stock']}
+
+            # Transfers of a variant are journalled one after the other. FOR NO KEY UPDATE does not conflict with the
+            # key share lock of the order items being sold.
+            db.session.execute(
+                select(ProductVariants.variant_id).where(ProductVariants.variant_id.in_(sorted(totals)))
+                .order_by(ProductVariants.variant_id).with_for_update(key_share=True)
+            )
+            # Variants receiving stock without an inventory row get one, which carries their levels
+            stocked = set(db.session.execute(
+                select(inventory_table.c.variant_id).where(inventory_table.c.variant_id.in_(sorted(totals)))
+            ).scalars())
+            if set(totals) - stocked:
+                db.session.execute(insert(inventory_table), [
+                    {"variant_id": variant_id, "created_by": updated_by}
+                    for variant_id in sorted(set(totals) - stocked)
+                ])
+            # Only stock reaching or leaving the shops changes the inventory rows, stock held for baskets or sold
+            # cannot leave
+            inventory = LocationService._lock_inventory(shop_changes) if shop_changes else {}
+            for variant_id, change in sorted(shop_changes.items()):
+                available = inventory[variant_id]['quantity'] - inventory[variant_id]['reserved_quantity']
+                if available + change < 0:
+                    db.session.rollback()
+                    return None, f"Insufficient inventory for Product Variant: {variant_id}. " \
+                                 f"Available stock is {available}"
+
+            # The rows are passed as arrays so the statements compile the same whatever the size of the batch
+            keys = sorted(changes)
+            moves = func.unnest(
+                bindparam('variant_ids', [variant_id for variant_id, _ in keys], type_=ARRAY(Integer)),
+                bindparam('location_ids', [location_id for _, location_id in keys], type_=ARRAY(Integer)),
+                bindparam('changes', [changes[key] for key in keys], type_=ARRAY(Integer))
+            ).table_valued('variant_id', 'location_id', 'change').render_derived(name='moves')
+
+            # Rows receiving stock for the first time start empty, rows only giving stock must exist already
+            db.session.execute(pg_insert(stock_table).from_select(
+                ['variant_id', 'location_id', 'quantity'],
+                select(moves.c.variant_id, moves.c.location_id, literal(0)).where(moves.c.change > 0)
+            ).on_conflict_do_nothing())
+            applied = {(row.variant_id, row.location_id): row.quantity for row in db.session.execute(
+                update(stock_table)
+                .where(stock_table.c.variant_id == moves.c.variant_id,
+                       stock_table.c.location_id == moves.c.location_id,
+                       stock_table.c.quantity + moves.c.change >= 0)
+                .values(quantity=stock_table.c.quantity + moves.c.change, updated_by=updated_by,
+                        updated_date=func.current_timestamp())
+                .returning(stock_table.c.variant_id, stock_table.c.location_id, stock_table.c.quantity)
+            )}
+            short = [key for key in sorted(changes) if key not in applied]
+            if short:
+                db.session.rollback()
+                variant_id, location_id = short[0]
+                available = db.session.execute(
+                    select(LocationStock.quantity)
+                    .where(LocationStock.variant_id == variant_id, LocationStock.location_id == location_id)
+                ).scalar() or 0
+                return None, f"Insufficient stock of Product Variant: {variant_id} at Location: {location_id}. " \
+                             f"Available stock is {available}"
+
+            if shop_changes:
+                rows = sorted((inventory[variant_id]['inventory_id'], change)
+                              for variant_id, change in shop_changes.items())
+                deltas = func.unnest(
+                    bindparam('inventory_ids', [inventory_id for inventory_id, _ in rows], type_=ARRAY(Integer)),
+                    bindparam('shop_changes', [change for _, change in rows], type_=ARRAY(Integer))
+                ).table_valued('inventory_id', 'shop_change').render_derived(name='deltas')
+                db.session.execute(
+                    update(inventory_table)
+                    .where(inventory_table.c.inventory_id == deltas.c.inventory_id)
+                    .values(quantity=inventory_table.c.quantity + deltas.c.shop_change,
+                            shop_stock=inventory_table.c.shop_stock + deltas.c.shop_change,
+                            updated_by=updated_by, updated_date=func.current_timestamp())
+                )
+            if totals:
+                # Levels after the batch, those before it follow from the net changes
+                levels = {}
+                for row in db.session.execute(
+                    select(inventory_table.c.variant_id, *InventoryHistoryService.level_columns())
+                    .where(inventory_table.c.variant_id.in_(sorted(totals)))
+                    .order_by(inventory_table.c.variant_id, inventory_table.c.inventory_id)
+                ):
+                    levels.setdefault(row.variant_id, row._mapping)
+                InventoryHistoryService.record([
+                    InventoryHistoryService.change(variant_id, dict(
+                        levels[variant_id], quantity=levels[variant_id]['quantity'] - total['shop_stock'],
+                        warehouse_stock=levels[variant_id]['warehouse_stock'] - total['warehouse_stock'],
+                        shop_stock=levels[variant_id]['shop_stock'] - total['shop_stock']
+                    ), levels[variant_id], InventoryHistoryService.TRANSFER, updated_by)
+                    for variant_id, total in sorted(totals.items())
+                ])
+            db.session.commit()
+            if totals:
+                catalog_cache.bump_version(catalog_cache.STOCK)
+            return [{"variant_id": variant_id, "location_id": location_id, "quantity": quantity}
+                    for (variant_id, location_id), quantity in sorted(applied.items())], None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def _lock_inventory(variant_ids):
+        """
+        Lock the first inventory row of variants in variant_id order
+        :param variant_ids: IDs of the product variants
+        :return: Dict of variant_id to the inventory_id, quantity and reserved_quantity of its inventory row
+        """
+        inventory_table = Inventory.__table__
+        inventory = {}
+        for row in db.session.execute(
+            select(inventory_table.c.inventory_id, inventory_table.c.variant_id, inventory_table.c.quantity,
+                   inventory_table.c.reserved_quantity)
+            .where(inventory_table.c.variant_id.in_(sorted(variant_ids)))
+            .order_by(inventory_table.c.variant_id, inventory_table.c.inventory_id)
+            .with_for_update()
+        ):
+            inventory.setdefault(row.variant_id, row._mapping)
+        return inventory
+
+    @staticmethod
+    def lock_shops(variant_ids):
+        """
+        Lock the stock of variants at the shops in variant_id and location_id order. The caller holds the locks on the
+        inventory rows, so the location rows are locked after them like in transfer().
+        :param variant_ids: IDs of the product variants
+        :return: Dict of variant_id to a list of [location_id, quantity] of the shops holding it, empty when there are
+                 no shops yet
+        """
+        if not db.session.execute(
+            select(Location.location_id).where(Location.location_type == LocationService.SHOP).limit(1)
+        ).first():
+            return {}
+        shops = {variant_id: [] for variant_id in variant_ids}
+        for row in db.session.execute(
+            select(LocationStock.variant_id, LocationStock.location_id, LocationStock.quantity)
+            .join(Location, Location.location_id == LocationStock.location_id)
+            .where(LocationStock.variant_id.in_(sorted(variant_ids)), Location.location_type == LocationService.SHOP,
+                   LocationStock.quantity > 0)
+            .order_by(LocationStock.variant_id, LocationStock.location_id)
+            .with_for_update(of=LocationStock)
+        ):
+            shops[row.variant_id].append([row.location_id, row.quantity])
+        return shops
+
+    @staticmethod
+    def record_sales(sales, shops=None):
+        """
+        Take sold stock from the shops holding it in the current transaction, without committing it
+        :param sales: List of dicts with variant_id, quantity and the ID of the staff member selling, as updated_by
+        :param shops: Stock at the shops as returned by lock_shops, locked here when omitted
+        :return: Dict of variant_id to the stock left at the shops for the sales they cannot cover, nothing is taken
+                 then and the caller must roll back
+        """
+        if shops is None:
+            shops = LocationService.lock_shops({sale['variant_id'] for sale in sales})
+        if not shops:
+            return {}
+
+        taken = {}
+        short = {}
+        for sale in sales:
+            # From the shops in location_id order
+            remaining = sale['quantity']
+            held = sum(quantity for _, quantity in shops[sale['variant_id']])
+            for shop in shops[sale['variant_id']]:
+                quantity = min(remaining, shop[1])
+                if quantity:
+                    shop[1] -= quantity
+                    remaining -= quantity
+                    key = (sale['variant_id'], shop[0])
+                    taken[key] = {"b_variant_id": key[0], "b_location_id": key[1], "b_updated_by": sale['updated_by'],
+                                  "b_quantity": taken.get(key, {}).get('b_quantity', 0) + quantity}
+            if remaining:
+                short[sale['variant_id']] = held
+        if short or not taken:
+            return short
+        stock_table = LocationStock.__table__
+        db.session.execute(
+            update(stock_table)
+            .where(stock_table.c.variant_id == bindparam('b_variant_id'),
+                   stock_table.c.location_id == bindparam('b_location_id'))
+            .values(quantity=stock_table.c.quantity - bindparam('b_quantity'), updated_by=bindparam('b_updated_by'),
+                    updated_date=func.current_timestamp()),
+            [taken[key] for key in sorted(taken)]
+        )
+        return short
+
+    @staticmethod
+    def get_availability(variant_ids):
+        """
+        Stock of variants across all locations
+        :param variant_ids: IDs of the product variants
+        :return: Per variant the stock at each location, its totals per location type and the quantity available for
+                 sale, and an optional error message
+        """
+        if not variant_ids:
+            return None, "Provide at least one variant_id."
+        try:
+            availability = {variant_id: {
+                "variant_id": variant_id, "on_hand": 0, "warehouse": 0, "shop": 0, "available_for_sale": 0,
+                "locations": []
+            } for variant_id in sorted(set(variant_ids))}
+            for variant_id, available in db.session.execute(
+                select(Inventory.variant_id, Inventory.quantity - Inventory.reserved_quantity)
+                .where(Inventory.variant_id.in_(availability))
+            ):
+                availability[variant_id]['available_for_sale'] += available
+            for row in db.session.execute(
+                select(LocationStock.variant_id, LocationStock.location_id, Location.location_name,
+                       Location.location_type, LocationStock.quantity)
+                .join(Location, Location.location_id == LocationStock.location_id)
+                .where(LocationStock.variant_id.in_(availability))
+                .order_by(LocationStock.variant_id, LocationStock.location_id)
+            ):
+                variant = availability[row.variant_id]
+                variant['on_hand'] += row.quantity
+                variant[row.location_type] += row.quantity
+                variant['locations'].append({"location_id": row.location_id, "location_name": row.location_name,
+                                             "location_type": row.location_type, "quantity": row.quantity})
+            return list(availability.values()), None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
@@ -0,0 +1,143 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Customer, OrderRequest
+from app.extensions import db, catalog_cache
+from .order_service import OrderService
+
+
+class OrderIntakeService:
+    """
+    Asynchronous order intake through a transactional outbox.
+
+    Requests are validated and written to the order_requests table, and the client gets a ticket straight away.
+    Workers drain the table in batches of orders, each claimed, placed and marked in its own transaction, so the
+    inventory rows of an order are locked only while that order is placed and one failed order does not undo the
+    others.
+    """
+    QUEUED = 'Queued'
+    PROCESSING = 'Processing'
+    PLACED = 'Placed'
+    FAILED = 'Failed'
+
+    @staticmethod
+    def submit(order_data):
+        """
+        Queue an order for placement by the order workers
+        :param order_data: Dict containing order items, total amount, and other order details
+        :return: Queued OrderRequest and an optional error message
+        """
+        _, error = OrderService.validate_order(order_data)
+        if error:
+            return None, error
+        try:
+            customer_id = order_data.get('customer_id')
+            if customer_id is None or not db.session.get(Customer, customer_id):
+                return None, "Customer not found."
+            order_request = OrderRequest(
+                customer_id=customer_id,
+                payload=order_data,
+                status=OrderIntakeService.QUEUED,
+                created_by=order_data.get('created_by', 1001)
+            )
+            db.session.add(order_request)
+            db.session.commit()
+            return order_request, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def get_request(request_id):
+        """
+        Look up a queued order by its ticket
+        :param request_id: Ticket returned when the order was queued
+        :return: OrderRequest and an optional error message
+        """
+        try:
+            order_request = db.session.get(OrderRequest, request_id)
+            if not order_request:
+                return None, "Order request not found."
+            return order_request, None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def _claim(table):
+        """
+        Claim the next queued request in the current transaction.
+
+        The row is read with FOR UPDATE SKIP LOCKED so concurrent workers take different requests, and claimed with a
+        conditional UPDATE, which keeps databases without row locks, such as SQLite, from placing an order twice.
+        :param table: The order_requests table
+        :return: (request_id, payload) of the claimed request, or None when the outbox is empty
+        """
+        while True:
+            queued = db.session.execute(
+                select(table.c.request_id, table.c.payload)
+                .where(table.c.status == OrderIntakeService.QUEUED)
+                .order_by(table.c.request_id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).first()
+            if queued is None:
+                return None
+            claimed = db.session.execute(
+                update(table)
+                .where(table.c.request_id == queued.request_id, table.c.status == OrderIntakeService.QUEUED)
+                .values(status=OrderIntakeService.PROCESSING)
+            ).rowcount
+            if claimed:
+                return queued
+
+    @staticmethod
+    def drain(batch_size=50):
+        """
+        Place up to a batch of queued orders, committing each one on its own.
+
+        An order's inventory rows stay locked only until its own commit, and a worker that dies mid batch leaves the
+        orders it had not committed queued. Each order is placed in a savepoint: an order that is rejected or raises
+        is rolled back to it and recorded as failed, and the rest of the batch goes on.
+        :param batch_size: Maximum number of queued orders to place
+        :return: Number of requests processed and an optional error message
+        """
+        table = OrderRequest.__table__
+        processed = placed = 0
+        try:
+            while processed < batch_size:
+                queued = OrderIntakeService._claim(table)
+                if queued is None:
+                    db.session.commit()
+                    break
+                request_id, payload = queued
+
+                new_order = None
+                savepoint = db.session.begin_nested()
+                try:
+                    lines, error = OrderService.validate_order(payload)
+                    if not error:
+                        new_order, error = OrderService.place_order(payload, lines)
+                    if error:
+                        savepoint.rollback()
+                    else:
+                        savepoint.commit()
+                except Exception as e:
+                    savepoint.rollback()
+                    error = f"An error occurred while processing the order: {str(e)}"
+
+                db.session.execute(
+                    update(table)
+                    .where(table.c.request_id == request_id)
+                    .values(status=OrderIntakeService.FAILED if error else OrderIntakeService.PLACED,
+                            order_id=None if error else new_order.order_id, error=error,
+                            processed_date=func.current_timestamp())
+                )
+                db.session.commit()
+                processed += 1
+                placed += not error
+            return processed, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+        finally:
+            if placed:
+                catalog_cache.bump_version(catalog_cache.STOCK)
@@ -1,79 +1,538 @@
-from app.models import Order, OrderItem, Inventory, Customer, ProductVariants
-from app.extensions import db
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from flask import current_app
+from sqlalchemy import Integer, bindparam, column, func, insert, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
+from app.models import Order, OrderItem, Inventory, Customer, ProductVariants
+from app.extensions import db, catalog_cache
+from app.schemas import order_item_serializer, order_serializer
+from app.utils import decode_cursor, encode_cursor
+from .idempotency_service import IdempotencyService
+from .sales_report_service import SalesReportService
+from .customer_ledger_service import CustomerLedgerService
+from .inventory_history_service import InventoryHistoryService
+from .location_service import LocationService
 
 
 class OrderService:
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    CLIENT_ORDER_ID_LENGTH = 64
+    # Outcomes of orders in a bulk submission
+    PLACED = 'placed'
+    DUPLICATE = 'duplicate'
+    FAILED = 'failed'
 
     @staticmethod
-    def create_order(order_data):
+    def parse_items(items):
         """
-        Creates a new order, updates inventory levels, customer balance, and order items.
+        Check the lines of an order before anything is locked
+        :param items: List of dicts with variant_id, quantity and optional price_at_purchase, discount_rate and
+                      discount_amount
+        :return: Normalised lines and an optional error message
+        """
+        if not isinstance(items, list) or not items:
+            return None, "An order needs at least one item."
+        lines = []
+        for item in items:
+            if not isinstance(item, dict):
+                return None, "Each item must be an object."
+            variant_id = item.get('variant_id')
+            quantity = item.get('quantity')
+            if not isinstance(variant_id, int) or not isinstance(quantity, int) or quantity < 1:
+                return None, "Each item needs a variant_id and a positive whole quantity."
+            try:
+                price_at_purchase = item.get('price_at_purchase')
+                lines.append({
+                    "variant_id": variant_id,
+                    "quantity": quantity,
+                    "price_at_purchase": Decimal(str(price_at_purchase)) if price_at_purchase is not None else None,
+                    "discount_rate": Decimal(str(item.get('discount_rate') or 0)),
+                    "discount_amount": Decimal(str(item.get('discount_amount') or 0))
+                })
+            except InvalidOperation:
+                return None, f"Invalid price or discount for Product Variant: {variant_id}."
+        return lines, None
+
+    @staticmethod
+    def lock_stock(variant_ids):
+        """
+        Lock the inventory rows of variants with one SELECT ... FOR UPDATE in variant_id order, so baskets sharing
+        variants always lock them in the same order and cannot deadlock
+        :param variant_ids: IDs of the product variants
+        :return: Dict of variant_id to the stock levels and price of the variant, from its first inventory row
+        """
+        inventory_table = Inventory.__table__
+        variant_table = ProductVariants.__table__
+        stock = {}
+        for row in db.session.execute(
+            select(inventory_table.c.inventory_id, inventory_table.c.variant_id,
+                   *InventoryHistoryService.level_columns(), inventory_table.c.reserved_quantity, variant_table.c.price)
+            .join(variant_table, variant_table.c.variant_id == inventory_table.c.variant_id)
+            .where(inventory_table.c.variant_id.in_(sorted(variant_ids)))
+            .order_by(inventory_table.c.variant_id, inventory_table.c.inventory_id)
+            .with_for_update(of=inventory_table)
+        ):
+            stock.setdefault(row.variant_id, dict(row._mapping))
+        return stock
+
+    @staticmethod
+    def _stock_error(variant_id, available):
+        """
+        Explain why a basket line could not be deducted
+        :param variant_id: ID of the product variant
+        :param available: Stock available to the line, None when the variant has no inventory
+        :return: Error message
+        """
+        if available is None:
+            return f"Product variant for ID: {variant_id} not found in store!"
+        return f'Insufficient inventory for Product Variant: {variant_id}. Available stock is {available}'
+
+    @staticmethod
+    def _available(variant_id, reserved=False):
+        """
+        Read the stock a basket line could have taken, after its deduction matched no row
+        :param variant_id: ID of the product variant
+        :param reserved: The line is held by a reservation being checked out
+        :return: Available stock, None when the variant has no inventory
+        """
+        available = func.least(Inventory.reserved_quantity, Inventory.quantity, Inventory.shop_stock) if reserved \
+            else func.least(Inventory.quantity - Inventory.reserved_quantity, Inventory.shop_stock)
+        return db.session.execute(
+            select(available).where(Inventory.variant_id == variant_id).order_by(Inventory.inventory_id)
+        ).scalars().first()
+
+    @staticmethod
+    def validate_order(order_data):
+        """
+        Check an order request before anything is written
+        :param order_data: Dict containing order items, total amount, and other order details
+        :return: Normalised lines and an optional error message
+        """
+        if not isinstance(order_data, dict):
+            return None, "Order details must be an object."
+        lines, error = OrderService.parse_items(order_data.get('items', []))
+        if error:
+            return None, error
+        if order_data.get('order_total_amount') is None:
+            return None, "order_total_amount is required."
+        return lines, None
+
+    @staticmethod
+    def place_order(order_data, lines, reserved=False):
+        """
+        Write an order in the current transaction, without committing it.
+
+        Stock for the whole basket is deducted by one UPDATE ... FROM (VALUES ...) WHERE available and shop stock >=
+        requested RETURNING, with the lines sorted by variant_id, so rows are only locked for that statement and
+        concurrent orders can never take stock below zero or out of active reservations. Lines missing from the
+        returned rows are reported as not found or short of stock. Order items, the customer's ledger entry, the sales
+        rollup deltas, the stock journal and the shops' stock are then written with one statement each, a line the
+        shops cannot cover is reported as short of stock too.
+        The caller must roll back when an error is returned.
+        :param order_data: Dict containing order items, total amount, and other order details
+        :param lines: Lines returned by validate_order
+        :param reserved: The lines are held by a reservation being checked out, so their stock is taken from it
+        :return: Newly created order object and an optional error message
+        """
+        order_total_amount = order_data.get('order_total_amount')
+        order_status = order_data.get('order_status', 'Pending')
+        customer_id = order_data.get('customer_id')
+        created_by = order_data.get('created_by', 1001)
+
+        customer = db.session.get(Customer, customer_id) if customer_id is not None else None
+        if not customer:
+            return None, "Customer not found."
+
+        # Same variant on several lines is deducted once with the combined quantity
+        requested = {}
+        for line in lines:
+            requested[line['variant_id']] = requested.get(line['variant_id'], 0) + line['quantity']
+
+        # Deduct the whole basket with one conditional UPDATE, a line only matches while its stock covers it
+        inventory_table = Inventory.__table__
+        variant_table = ProductVariants.__table__
+        first_row = inventory_table.alias('first_row')
+        basket = values(
+            column('variant_id', Integer), column('quantity', Integer), name='basket'
+        ).data(sorted(requested.items()))
+        if reserved:
+            # A reservation's stock can still have been taken by a stock edit since it was reserved
+            covered = (inventory_table.c.reserved_quantity >= basket.c.quantity) & \
+                (inventory_table.c.quantity >= basket.c.quantity)
+            released = {"reserved_quantity": inventory_table.c.reserved_quantity - basket.c.quantity}
+        else:
+            # Stock held by active reservations is not available to other orders
+            covered = inventory_table.c.quantity - inventory_table.c.reserved_quantity >= basket.c.quantity
+            released = {}
+        # Sold stock leaves the shops, which cannot go below nothing
+        covered = covered & (inventory_table.c.shop_stock >= basket.c.quantity)
+        stock = {row.variant_id: dict(row._mapping) for row in db.session.execute(
+            update(inventory_table)
+            .where(inventory_table.c.inventory_id == select(func.min(first_row.c.inventory_id))
+                   .where(first_row.c.variant_id == basket.c.variant_id).scalar_subquery(),
+                   covered, variant_table.c.variant_id == inventory_table.c.variant_id)
+            .values(quantity=inventory_table.c.quantity - basket.c.quantity,
+                    shop_stock=inventory_table.c.shop_stock - basket.c.quantity, **released)
+            .returning(inventory_table.c.variant_id, *InventoryHistoryService.level_columns(), variant_table.c.price)
+        )}
+
+        missing = [variant_id for variant_id in sorted(requested) if variant_id not in stock]
+        if missing:
+            return None, OrderService._stock_error(missing[0], OrderService._available(missing[0], reserved))
+
+        new_order = Order(
+            customer_id=customer_id,
+            total_items_count=len(lines),
+            total_order_amount=order_total_amount,
+            order_status=order_status,
+            created_by=created_by
+        )
+        db.session.add(new_order)
+        db.session.flush()
+
+        # Create the OrderItems in one batched insert
+        db.session.execute(insert(OrderItem.__table__), [{
+            "order_id": new_order.order_id,
+            "variant_id": line['variant_id'],
+            "quantity": line['quantity'],
+            "price_at_purchase": line['price_at_purchase'] if line['price_at_purchase'] is not None
+            else stock[line['variant_id']]['price'],
+            "discount_rate": line['discount_rate'],
+            "discount_amount": line['discount_amount'],
+            "created_by": created_by
+        } for line in lines])
+
+        # Charge the customer through the ledger, so concurrent orders of one customer do not wait on each other
+        CustomerLedgerService.record_orders([{
+            "customer_id": customer_id, "order_id": new_order.order_id, "amount": order_total_amount,
+            "created_by": created_by
+        }])
+        SalesReportService.record_orders([new_order.order_id])
+        InventoryHistoryService.record([
+            InventoryHistoryService.change(variant_id, dict(
+                stock[variant_id], quantity=stock[variant_id]['quantity'] + quantity,
+                shop_stock=stock[variant_id]['shop_stock'] + quantity
+            ), stock[variant_id], InventoryHistoryService.SALE, created_by)
+            for variant_id, quantity in sorted(requested.items())
+        ])
+        short = LocationService.record_sales([{"variant_id": variant_id, "quantity": quantity, "updated_by": created_by}
+                                              for variant_id, quantity in sorted(requested.items())])
+        if short:
+            variant_id = min(short)
+            return None, OrderService._stock_error(variant_id, short[variant_id])
+        return new_order, None
 
+    @staticmethod
+    def create_order(order_data, idempotency_key=None, owner=None):
+        """
+        Creates a new order, updates inventory levels, customer balance, and order items.
         :param order_data: Dict containing order items, total amount, and other order details
+        :param idempotency_key: Key claimed with IdempotencyService.claim in the current transaction, the placed order
+                                is saved under it when committing. Every failure rolls the claim back.
+        :param owner: Caller the key was claimed for
         :return: Newly created order object and an optional error message
         """
+        lines, error = OrderService.validate_order(order_data)
+        if error:
+            db.session.rollback()
+            return None, error
+
         try:
-            # Extract order details
-            items = order_data.get('items', [])
-            order_total_amount = order_data.get('order_total_amount')
-            order_status = order_data.get('order_status', 'Pending')
-            customer_id = order_data.get('customer_id')
-            created_by = order_data.get('created_by', 1001)
-
-            customer = Customer.query.get(customer_id)
-            if not customer:
-                return None, "Customer not found."
-
-            new_order = Order(
-                customer_id=customer_id,
-                order_items_count=len(items),
-                order_total_amount=order_total_amount,
-                order_status=order_status
-            )
-
-            db.session.add(new_order)
-            db.session.flush()
-
-            # Process each item in the order
-            for item in items:
-                variant_id = item.get('variant_id')
-                quantity = item.get('quantity')
-                price_at_purchase = item.get('price_at_purchase')
-                discount_rate = item.get('discount_rate', 0)
-                discount_amount = item.get('discount_amount', 0)
-
-                # Fetch Product Variant and Inventory records
-                variant = ProductVariants.query.get(variant_id)
-                inventory = Inventory.query.filter_by(variant_id=variant_id).first()
-
-                if not variant or not inventory:
-                    return None, f"Product variant for ID: {variant_id} not found in store!"
-
-                # Check availability of stock
-                if inventory.quantity < quantity:
-                    return None, f'Insufficient inventory for Product Variant: {variant_id}. Available stock is {inventory.quantity}'
-
-                # Deduct the ordered quantity:
-                inventory.quantity -= quantity
-                inventory.shop_stock -= quantity
-
-                # Create the OrderItems
-                order_item = OrderItem(
-                    order_id=new_order.order_id,
-                    variant_id=variant_id,
-                    quantity=quantity,
-                    price_at_purchase=price_at_purchase,
-                    discount_rate=discount_rate,
-                    discount_amount=discount_amount,
-                    created_by=created_by
-                )
-                db.session.add(order_item)
-
-            # Update Customer Balances
-            customer.outstanding_balance += order_total_amount
+            new_order, error = OrderService.place_order(order_data, lines)
+            if error:
+                db.session.rollback()
+                return None, error
+            if idempotency_key is not None:
+                IdempotencyService.save(idempotency_key, new_order.to_dict(), owner)
             db.session.commit()
+            # Stock levels are part of the catalog responses
+            catalog_cache.bump_version(catalog_cache.STOCK)
             return new_order, None
         except SQLAlchemyError as e:
             db.session.rollback()
             return None, f"An error occurred while processing the order: {str(e)}"
+
+    @staticmethod
+    def create_orders(orders_data, created_by):
+        """
+        Place a batch of orders submitted at once, such as the sales a till queued while offline.
+
+        Orders are de-duplicated by their client_order_id, within the batch and against orders placed before, so a
+        batch can be replayed safely. Each chunk of BULK_ORDER_CHUNK_SIZE orders is one transaction with a fixed
+        number of statements, and orders are accepted in submission order while stock lasts.
+        :param orders_data: List of order dicts, each with a client_order_id and optionally the order_date of the sale
+        :param created_by: ID of the staff member submitting the batch
+        :return: List of per-order results in submission order and an optional error message
+        """
+        if not isinstance(orders_data, list) or not orders_data:
+            return None, "Provide a list of orders."
+        max_orders = current_app.config['BULK_ORDER_MAX_ORDERS']
+        if len(orders_data) > max_orders:
+            return None, f"A batch can have at most {max_orders} orders."
+
+        results = []
+        first_results = {}
+        pending = []
+        # Sales without their own order_date are recorded as made when the batch arrived
+        submitted_at = datetime.now()
+        for order_data in orders_data:
+            client_order_id = order_data.get('client_order_id') if isinstance(order_data, dict) else None
+            result = {"client_order_id": client_order_id, "status": None, "order_id": None, "error": None}
+            results.append(result)
+            if not isinstance(client_order_id, str) or \
+                    not 0 < len(client_order_id) <= OrderService.CLIENT_ORDER_ID_LENGTH:
+                result.update(status=OrderService.FAILED, error=f"Each order needs a client_order_id of at most "
+                                                                f"{OrderService.CLIENT_ORDER_ID_LENGTH} characters.")
+                continue
+            if client_order_id in first_results:
+                result['status'] = OrderService.DUPLICATE
+                continue
+            first_results[client_order_id] = result
+
+            lines, error = OrderService.validate_order(order_data)
+            if not error and (not isinstance(order_data.get('customer_id'), int)
+                              or isinstance(order_data['customer_id'], bool)):
+                # Looked up for the whole chunk at once, so one malformed id would fail the others with it
+                error = "customer_id must be a whole number."
+            if not error:
+                try:
+                    order_total_amount = Decimal(str(order_data['order_total_amount']))
+                except InvalidOperation:
+                    error = "order_total_amount must be a number."
+            if not error:
+                try:
+                    order_date = datetime.fromisoformat(order_data['order_date']) \
+                        if order_data.get('order_date') is not None else submitted_at
+                except (TypeError, ValueError):
+                    error = "order_date must be an ISO 8601 date and time."
+            if error:
+                result.update(status=OrderService.FAILED, error=error)
+                continue
+            pending.append((result, dict(order_data, order_total_amount=order_total_amount, order_date=order_date,
+                                         created_by=created_by), lines))
+
+        chunk_size = current_app.config['BULK_ORDER_CHUNK_SIZE']
+        placed = False
+        for position in range(0, len(pending), chunk_size):
+            chunk = pending[position:position + chunk_size]
+            try:
+                placed = OrderService._place_chunk(chunk) or placed
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                for result, _, _ in chunk:
+                    result.update(status=OrderService.FAILED, order_id=None,
+                                  error=f"An error occurred while processing the order: {str(e)}")
+        if placed:
+            # Stock levels are part of the catalog responses
+            catalog_cache.bump_version(catalog_cache.STOCK)
+
+        # Repeats within the batch point at the order placed for the first occurrence
+        for result in results:
+            if result['status'] == OrderService.DUPLICATE and result['order_id'] is None:
+                first = first_results[result['client_order_id']]
+                result['order_id'] = first['order_id']
+                if first['status'] == OrderService.FAILED:
+                    result.update(status=OrderService.FAILED, error=first['error'])
+        return results, None
+
+    @staticmethod
+    def _place_chunk(chunk):
+        """
+        Write a chunk of a bulk submission in the current transaction, filling in the result of every order.
+
+        The inventory rows of every variant in the chunk are locked in variant_id order with one SELECT ... FOR
+        UPDATE, stock is allocated to the orders in memory, then the orders, items, stock, customer ledger entries,
+        stock journal and shops' stock are written with one statement each.
+        :param chunk: List of (result, order_data, lines) tuples
+        :return: True when at least one order was placed
+        """
+        client_order_ids = [result['client_order_id'] for result, _, _ in chunk]
+        existing = dict(db.session.execute(
+            select(Order.client_order_id, Order.order_id).where(Order.client_order_id.in_(client_order_ids))
+        ).all())
+        customer_ids = set(db.session.execute(
+            select(Customer.customer_id)
+            .where(Customer.customer_id.in_({order_data.get('customer_id') for _, order_data, _ in chunk}))
+        ).scalars())
+
+        inventory_table = Inventory.__table__
+        variant_ids = {line['variant_id'] for _, _, lines in chunk for line in lines}
+        stock = OrderService.lock_stock(variant_ids)
+        shops = LocationService.lock_shops(variant_ids)
+        for variant_id, row in stock.items():
+            # Stock held by active reservations is not available to other orders, and sold stock leaves the shops
+            row['available'] = min(row['quantity'] - row['reserved_quantity'], row['shop_stock'])
+            if variant_id in shops:
+                row['available'] = min(row['available'], sum(quantity for _, quantity in shops[variant_id]))
+        # Stock levels as locked, for the journal
+        levels = {variant_id: {level: row[level] for level in InventoryHistoryService.TRACKED_LEVELS}
+                  for variant_id, row in stock.items()}
+
+        accepted = []
+        for result, order_data, lines in chunk:
+            if result['client_order_id'] in existing:
+                result.update(status=OrderService.DUPLICATE, order_id=existing[result['client_order_id']])
+                continue
+            if order_data.get('customer_id') not in customer_ids:
+                result.update(status=OrderService.FAILED, error="Customer not found.")
+                continue
+            requested = {}
+            for line in lines:
+                requested[line['variant_id']] = requested.get(line['variant_id'], 0) + line['quantity']
+            for variant_id, quantity in requested.items():
+                if variant_id not in stock:
+                    result.update(status=OrderService.FAILED,
+                                  error=f"Product variant for ID: {variant_id} not found in store!")
+                    break
+                if stock[variant_id]['available'] < quantity:
+                    result.update(status=OrderService.FAILED,
+                                  error=f"Insufficient inventory for Product Variant: {variant_id}. "
+                                        f"Available stock is {stock[variant_id]['available']}")
+                    break
+            else:
+                for variant_id, quantity in requested.items():
+                    stock[variant_id]['available'] -= quantity
+                accepted.append((result, order_data, lines, requested))
+        if not accepted:
+            return False
+
+        # Orders placed by a concurrent replay of the same batch are skipped by the unique client_order_id
+        order_table = Order.__table__
+        order_ids = dict(db.session.execute(
+            pg_insert(order_table).on_conflict_do_nothing(index_elements=[order_table.c.client_order_id])
+            .returning(order_table.c.client_order_id, order_table.c.order_id),
+            [{
+                "customer_id": order_data['customer_id'],
+                "total_items_count": len(lines),
+                "total_order_amount": order_data['order_total_amount'],
+                "order_status": order_data.get('order_status', 'Pending'),
+                "order_date": order_data['order_date'],
+                "client_order_id": result['client_order_id'],
+                "created_by": order_data['created_by']
+            } for result, order_data, lines, _ in accepted]
+        ).all())
+        raced = [result['client_order_id'] for result, _, _, _ in accepted
+                 if result['client_order_id'] not in order_ids]
+        if raced:
+            existing = dict(db.session.execute(
+                select(Order.client_order_id, Order.order_id).where(Order.client_order_id.in_(raced))
+            ).all())
+            for result, _, _, _ in accepted:
+                if result['client_order_id'] in existing:
+                    result.update(status=OrderService.DUPLICATE, order_id=existing[result['client_order_id']])
+            accepted = [entry for entry in accepted if entry[0]['client_order_id'] in order_ids]
+            if not accepted:
+                return False
+
+        deducted = {}
+        charges = []
+        items = []
+        changes = []
+        sales = []
+        for result, order_data, lines, requested in accepted:
+            order_id = order_ids[result['client_order_id']]
+            result.update(status=OrderService.PLACED, order_id=order_id)
+            for variant_id, quantity in requested.items():
+                deducted[variant_id] = deducted.get(variant_id, 0) + quantity
+                before = levels[variant_id]
+                levels[variant_id] = dict(before, quantity=before['quantity'] - quantity,
+                                          shop_stock=before['shop_stock'] - quantity)
+                changes.append(InventoryHistoryService.change(variant_id, before, levels[variant_id],
+                                                              InventoryHistoryService.SALE, order_data['created_by']))
+                sales.append({"variant_id": variant_id, "quantity": quantity, "updated_by": order_data['created_by']})
+            charges.append({"customer_id": order_data['customer_id'], "order_id": order_id,
+                            "amount": order_data['order_total_amount'], "created_by": order_data['created_by']})
+            items.extend({
+                "order_id": order_id,
+                "variant_id": line['variant_id'],
+                "quantity": line['quantity'],
+                "price_at_purchase": line['price_at_purchase'] if line['price_at_purchase'] is not None
+                else stock[line['variant_id']]['price'],
+                "discount_rate": line['discount_rate'],
+                "discount_amount": line['discount_amount'],
+                "created_by": order_data['created_by']
+            } for line in lines)
+
+        db.session.execute(insert(OrderItem.__table__), items)
+        # The rows are locked, so the deductions can be applied relative to the stored quantities
+        db.session.execute(
+            update(inventory_table)
+            .where(inventory_table.c.inventory_id == bindparam('b_inventory_id'))
+            .values(quantity=inventory_table.c.quantity - bindparam('b_quantity'),
+                    shop_stock=inventory_table.c.shop_stock - bindparam('b_quantity')),
+            [{"b_inventory_id": stock[variant_id]['inventory_id'], "b_quantity": quantity}
+             for variant_id, quantity in sorted(deducted.items())]
+        )
+        CustomerLedgerService.record_orders(charges)
+        SalesReportService.record_orders(list(order_ids.values()))
+        InventoryHistoryService.record(changes)
+        # Allocated within the shops' stock above, so no sale is left short
+        LocationService.record_sales(sales, shops)
+        return True
+
+    @staticmethod
+    def get_orders(limit=None, cursor=None, customer_id=None, status=None, date_from=None, date_to=None):
+        """
+        Fetch a page of the order history, newest first, using keyset pagination on (order_date, order_id).
+
+        The order items of the whole page are loaded with one extra query instead of one query per order.
+        :param limit: Number of orders per page, capped at MAX_PAGE_SIZE
+        :param cursor: Cursor returned with the previous page, None for the first page
+        :param customer_id: Only return orders of this customer
+        :param status: Only return orders with this status
+        :param date_from: Only return orders placed on or after this date, as YYYY-MM-DD
+        :param date_to: Only return orders placed on or before this date, as YYYY-MM-DD
+        :return: Dict with the page of orders and the cursor of the next page, and an optional error message.
+        """
+        limit = min(limit or OrderService.DEFAULT_PAGE_SIZE, OrderService.MAX_PAGE_SIZE)
+        if limit < 1:
+            return None, "Limit must be a positive number."
+        try:
+            date_from = date.fromisoformat(date_from) if date_from else None
+            date_to = date.fromisoformat(date_to) if date_to else None
+        except ValueError:
+            return None, "Dates must be in YYYY-MM-DD format."
+
+        sort_key = (Order.order_date, Order.order_id)
+        query = order_serializer.select()
+        if customer_id is not None:
+            query = query.where(Order.customer_id == customer_id)
+        if status:
+            query = query.where(Order.order_status == status)
+        if date_from:
+            query = query.where(Order.order_date >= date_from)
+        if date_to:
+            query = query.where(Order.order_date < date_to + timedelta(days=1))
+        if cursor:
+            try:
+                last_key = decode_cursor(cursor)
+                last_key = [datetime.fromisoformat(last_key[0]), int(last_key[1])]
+            except (ValueError, TypeError, IndexError):
+                return None, "Invalid cursor."
+            query = query.where(tuple_(*sort_key) < tuple_(*last_key))
+
+        try:
+            # Fetch one extra row to know whether another page follows
+            rows = db.session.execute(query.order_by(*(key.desc() for key in sort_key)).limit(limit + 1)).all()
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1].order_date, rows[-1].order_id)
+
+            orders = [order_serializer(row) for row in rows]
+            items = {order['order_id']: [] for order in orders}
+            if items:
+                for row in db.session.execute(
+                    order_item_serializer.select()
+                    .where(OrderItem.order_id.in_(list(items)))
+                    .order_by(OrderItem.order_id, OrderItem.order_item_id)
+                ):
+                    items[row.order_id].append(order_item_serializer(row))
+            for order in orders:
+                order['order_items'] = items[order['order_id']]
+            return {"data": orders, "next_cursor": next_cursor}, None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
@@ -0,0 +1,150 @@
+from decimal import Decimal, ROUND_HALF_UP
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Product, ProductVariants
+from app.extensions import db
+from app.services.discount_service import DiscountService
+
+
+class PricingService:
+    """
+    Server side pricing of baskets.
+
+    Amounts are worked out column by column in integer minor units (cents), so a basket of thousands of lines is a
+    few list comprehensions over plain ints rather than Decimal arithmetic per line, and rounds the same way
+    every time. Discount rates are percentages applied to the unit price, rounded half up to the minor unit,
+    and discount amounts are taken off each unit; a unit never goes below zero.
+    """
+    MINOR_UNITS = 100  # Minor units per major unit of the currency
+    RATE_SCALE = 100  # Discount rates are held in hundredths of a percent
+
+    @staticmethod
+    def to_minor(amount):
+        """
+        Convert an amount to integer minor units, rounding half up
+        :param amount: Decimal amount in major units
+        :return: Amount in minor units
+        """
+        return int((Decimal(amount) * PricingService.MINOR_UNITS).to_integral_value(ROUND_HALF_UP))
+
+    @staticmethod
+    def to_rate(rate):
+        """
+        Convert a discount rate to integer hundredths of a percent, rounding half up
+        :param rate: Decimal percentage
+        :return: Rate in hundredths of a percent
+        """
+        return int((Decimal(rate) * PricingService.RATE_SCALE).to_integral_value(ROUND_HALF_UP))
+
+    @staticmethod
+    def from_minor(amount):
+        """
+        Convert integer minor units back to a Decimal amount in major units
+        :param amount: Amount in minor units
+        :return: Decimal amount
+        """
+        return Decimal(amount) / PricingService.MINOR_UNITS
+
+    @staticmethod
+    def parse_lines(lines):
+        """
+        Check the basket lines of a quote
+        :param lines: List of dicts with 'variant_id' and 'quantity'
+        :return: Lists of variant ids and quantities, and an optional error message
+        """
+        if not isinstance(lines, list) or not lines:
+            return None, None, "A quote needs a list of lines."
+        max_lines = current_app.config['QUOTE_MAX_LINES']
+        if len(lines) > max_lines:
+            return None, None, f"A quote can have at most {max_lines} lines."
+
+        variant_ids = []
+        quantities = []
+        for line in lines:
+            variant_id = line.get('variant_id') if isinstance(line, dict) else None
+            quantity = line.get('quantity') if isinstance(line, dict) else None
+            if not isinstance(variant_id, int) or not isinstance(quantity, int) or quantity < 1:
+                return None, None, "Each line needs a variant_id and a positive whole quantity."
+            variant_ids.append(variant_id)
+            quantities.append(quantity)
+        return variant_ids, quantities, None
+
+    @staticmethod
+    def quote(lines, on=None):
+        """
+        Price a basket with the current prices and the discounts in effect.
+
+        :param lines: List of dicts with 'variant_id' and 'quantity'
+        :param on: Date to resolve discounts at, today when omitted
+        :return: Dict with the priced lines and basket totals, and an optional error message.
+        """
+        variant_ids, quantities, error = PricingService.parse_lines(lines)
+        if error:
+            return None, error
+
+        try:
+            # One query for the prices of every distinct variant, discounts come from the in-process index
+            rows = db.session.execute(
+                select(ProductVariants.variant_id, ProductVariants.product_id, ProductVariants.sku,
+                       ProductVariants.price, Product.is_active)
+                .join(Product, Product.product_id == ProductVariants.product_id)
+                .where(ProductVariants.variant_id.in_(set(variant_ids)))
+            ).all()
+            variants = {row.variant_id: row for row in rows}
+            for variant_id in variant_ids:
+                if variant_id not in variants:
+                    return None, f"Product variant for ID: {variant_id} not found in store!"
+                if not variants[variant_id].is_active:
+                    return None, f"Product variant for ID: {variant_id} is no longer sold."
+            discounts = DiscountService.get_index().resolve(
+                ((row.variant_id, row.product_id) for row in rows), on
+            )
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
+
+        # Convert each distinct variant once, then spread the values into per line columns
+        unit_price_of = {}
+        rate_of = {}
+        amount_of = {}
+        for variant_id, row in variants.items():
+            discount = discounts[variant_id]
+            unit_price_of[variant_id] = PricingService.to_minor(row.price)
+            rate_of[variant_id] = PricingService.to_rate(discount.discount_rate or 0) if discount else 0
+            amount_of[variant_id] = PricingService.to_minor(discount.discount_amount or 0) if discount else 0
+
+        unit_prices = [unit_price_of[variant_id] for variant_id in variant_ids]
+        rates = [rate_of[variant_id] for variant_id in variant_ids]
+        amounts = [amount_of[variant_id] for variant_id in variant_ids]
+
+        # Rate discounts round half up to the minor unit: (price * rate + half) // whole
+        whole = 100 * PricingService.RATE_SCALE
+        unit_discounts = [
+            min(price, (price * rate + whole // 2) // whole + amount)
+            for price, rate, amount in zip(unit_prices, rates, amounts)
+        ]
+        line_subtotals = [price * quantity for price, quantity in zip(unit_prices, quantities)]
+        line_discounts = [discount * quantity for discount, quantity in zip(unit_discounts, quantities)]
+        line_totals = [subtotal - discount for subtotal, discount in zip(line_subtotals, line_discounts)]
+
+        from_minor = PricingService.from_minor
+        quote_lines = [{
+            "variant_id": variant_id,
+            "sku": variants[variant_id].sku,
+            "quantity": quantity,
+            "unit_price": from_minor(unit_price),
+            "discount_id": discounts[variant_id].discount_id if discounts[variant_id] else None,
+            "unit_discount": from_minor(unit_discount),
+            "line_total": from_minor(line_total)
+        } for variant_id, quantity, unit_price, unit_discount, line_total
+            in zip(variant_ids, quantities, unit_prices, unit_discounts, line_totals)]
+
+        subtotal = sum(line_subtotals)
+        discount_total = sum(line_discounts)
+        return {
+            "lines": quote_lines,
+            "items_count": sum(quantities),
+            "subtotal": from_minor(subtotal),
+            "discount_total": from_minor(discount_total),
+            "total": from_minor(subtotal - discount_total)
+        }, None
@@ -1,10 +1,45 @@
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
 from flask import current_app
+from sqlalchemy import and_, tuple_, or_, select, update, insert, values, column, cast, func, Integer, Numeric
 from sqlalchemy.exc import SQLAlchemyError
-from app.models import Inventory, ProductAttributes, Product, ProductVariants
-from app.extensions import db
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import Inventory, ProductAttributes, Product, ProductVariants, Category, CategoryClosure, Discount
+from app.extensions import db, catalog_cache
+from .inventory_history_service import InventoryHistoryService
+from .location_service import LocationService
+from app.schemas import (ParentCategory, attribute_serializer, category_serializer, discount_serializer,
+                         inventory_serializer, product_serializer, variant_serializer)
+from app.utils import decode_cursor, encode_cursor
 
 
 class ProductService:
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    SORT_KEYS = ('product_id', 'updated_date')
+    STOCK_FIELDS = ('quantity', 'warehouse_stock', 'shop_stock', 'reorder_level')
+    BULK_UPDATE_CHUNK_SIZE = 1000  # Rows per UPDATE ... FROM (VALUES ...) statement
+
+    @staticmethod
+    def catalog_query():
+        """
+        Base query for the product catalog with the whole object graph eager loaded.
+
+        Category and parent category are joined onto the product rows, while variants and their attributes,
+        inventory and discounts are each fetched with one SELECT ... IN query, so serializing any number of
+        products costs a fixed number of statements.
+        :return: Product query with the eager loading options applied
+        """
+        return Product.query.options(
+            joinedload(Product.category).joinedload(Category.parent_category),
+            selectinload(Product.discounts),
+            selectinload(Product.variants).options(
+                selectinload(ProductVariants.attributes),
+                selectinload(ProductVariants.inventory),
+                selectinload(ProductVariants.discounts)
+            )
+        )
+
     @staticmethod
     def add_product(product_data):
         """
@@ -16,6 +51,13 @@ class ProductService:
         try:
             # Start a transaction 05/09/2024
             with (db.session.begin()):
+                # Stock kept per location only changes through transfers, checked before anything is added
+                managed = LocationService.managed_levels()
+                for variant_data in product_data.get('variants', []):
+                    error = LocationService.stock_edit_error(variant_data.get('inventory') or {}, managed)
+                    if error:
+                        return None, error
+
                 # 1. Add Product
                 new_product = Product(
                     product_name=product_data.get('product_name'),
@@ -27,6 +69,7 @@ class ProductService:
                 db.session.flush()  # To get the product_id for subsequent relations
 
                 # 2. Add Product Variants and Attributes
+                stock_changes = []
                 for variant_data in product_data.get('variants', []):
                     # Add Product variants
                     new_variant = ProductVariants(
@@ -60,8 +103,15 @@ class ProductService:
                             created_by=product_data.get('created_by')
                         )
                         db.session.add(new_inventory)
+                        stock_changes.append(InventoryHistoryService.change(
+                            new_variant.variant_id, None,
+                            {level: inventory_data.get(level, 0) for level in InventoryHistoryService.TRACKED_LEVELS},
+                            InventoryHistoryService.NEW_STOCK, product_data.get('created_by')
+                        ))
+                InventoryHistoryService.record(stock_changes)
             # Commit the transaction
             db.session.commit()
+            catalog_cache.bump_version(catalog_cache.CATALOG, catalog_cache.STOCK)
             return new_product, None
         except SQLAlchemyError as e:
             # Rollback on exception
@@ -85,6 +135,25 @@ class ProductService:
                 if not product:
                     return None, "Product not found."
 
+                # Stock held by reservations cannot be edited away and stock kept per location only changes through
+                # transfers, checked before anything is changed
+                managed = LocationService.managed_levels()
+                edits = [(variant_data.get('variant_id'), variant_data.get('inventory') or {})
+                         for variant_data in product_data.get('variants', [])]
+                quantities = {variant_id: inventory_data.get('quantity')
+                              for variant_id, inventory_data in edits if variant_id and inventory_data}
+                current = {}
+                for inventory in Inventory.query.filter(Inventory.variant_id.in_(list(quantities))) \
+                        .order_by(Inventory.variant_id).with_for_update(of=Inventory):
+                    quantity = quantities[inventory.variant_id]
+                    if quantity is not None and quantity < inventory.reserved_quantity:
+                        return None, ProductService._reserved_error(inventory.variant_id, inventory.reserved_quantity)
+                    current.setdefault(inventory.variant_id, inventory.stock_levels())
+                for variant_id, inventory_data in edits:
+                    error = LocationService.stock_edit_error(inventory_data, managed, current.get(variant_id))
+                    if error:
+                        return None, error
+
                 # 2. Update Product Details
                 if 'product_name' in product_data:
                     product.product_name = product_data['product_name']
@@ -99,6 +168,7 @@ class ProductService:
                 db.session.flush()
 
                 # 3. Update Variants
+                stock_changes = []
                 if 'variants' in product_data:
                     for variant_data in product_data['variants']:
                         variant_id = variant_data.get('variant_id')
@@ -151,16 +221,27 @@ class ProductService:
                                     db.session.flush()
 
                         # Step 5: Update or Add Inventory
-                        if 'inventory' in variant_data:
-                            inventory_data = variant_data['inventory']
-                            inventory = Inventory.query.filter_by(variant_id=variant_id).first()
+                        if variant_data.get('inventory'):
+                            # Levels kept per location were sent back as they are, the location rows hold them
+                            inventory_data = {level: value for level, value in variant_data['inventory'].items()
+                                              if level not in managed}
+                            # Locked, so the journal records the levels this change replaces
+                            inventory = Inventory.query.filter_by(variant_id=variant_id) \
+                                .with_for_update(of=Inventory).first()
 
                             if inventory:
+                                before = inventory.stock_levels()
                                 inventory.quantity = inventory_data.get('quantity', inventory.quantity)
                                 inventory.warehouse_stock = inventory_data.get('warehouse_stock', inventory.warehouse_stock)
                                 inventory.shop_stock = inventory_data.get('shop_stock', inventory.shop_stock)
                                 inventory.reorder_level = inventory_data.get('reorder_level', inventory.reorder_level)
                                 inventory.updated_by = product_data['updated_by']
+                                db.session.flush()
+                                after = inventory.stock_levels()
+                                stock_changes.append(InventoryHistoryService.change(
+                                    variant_id, before, after, InventoryHistoryService.ADJUSTMENT,
+                                    product_data['updated_by']
+                                ))
                             else:
                                 new_inventory = Inventory(
                                     variant_id=variant_id or new_variant.variant_id,
@@ -172,8 +253,14 @@ class ProductService:
                                 )
                                 db.session.add(new_inventory)
                                 db.session.flush()
+                                stock_changes.append(InventoryHistoryService.change(
+                                    new_inventory.variant_id, None, new_inventory.stock_levels(),
+                                    InventoryHistoryService.NEW_STOCK, product_data['updated_by']
+                                ))
+                InventoryHistoryService.record(stock_changes)
             # Commit the transaction
             db.session.commit()
+            catalog_cache.bump_version(catalog_cache.CATALOG, catalog_cache.STOCK)
 
             return product, None
 
@@ -182,10 +269,15 @@ class ProductService:
             db.session.rollback()
             return None, f'An error has occurred: {str(e)}'
 
+    @staticmethod
+    def _reserved_error(variant_id, reserved_quantity):
+        return f"Quantity of Product Variant: {variant_id} cannot be set below the {reserved_quantity} " \
+               f"held by reservations."
+
     @staticmethod
     def get_product(product_id):
         try:
-            product = Product.query.get(product_id)
+            product = ProductService.catalog_query().filter(Product.product_id == product_id).first()
             if not product:
                 return None, "Product not found."
             return product, None
@@ -193,10 +285,347 @@ class ProductService:
             return None, f'An error has occurred: {str(e)}'
 
     @staticmethod
-    def get_products():
+    def filter_products(query, category_id=None, is_active=None, min_price=None, max_price=None,
+                        include_subcategories=False):
+        """
+        Apply the catalog listing filters to a product query so that they run in SQL.
+        :param query: Product query or select statement to be filtered
+        :param category_id: Only return products in this category
+        :param is_active: Only return active or inactive products
+        :param min_price: Only return products with a variant priced at or above this amount
+        :param max_price: Only return products with a variant priced at or below this amount
+        :param include_subcategories: Also return products in the categories below category_id
+        :return: The filtered query
+        """
+        if category_id is not None:
+            if include_subcategories:
+                # One indexed join on the closure table instead of walking the hierarchy
+                query = query.join(CategoryClosure, CategoryClosure.descendant_id == Product.category_id) \
+                    .filter(CategoryClosure.ancestor_id == category_id)
+            else:
+                query = query.filter(Product.category_id == category_id)
+        if is_active is not None:
+            query = query.filter(Product.is_active == is_active)
+        if min_price is not None or max_price is not None:
+            price_filters = []
+            if min_price is not None:
+                price_filters.append(ProductVariants.price >= min_price)
+            if max_price is not None:
+                price_filters.append(ProductVariants.price <= max_price)
+            query = query.filter(Product.variants.any(and_(*price_filters)))
+        return query
+
+    @staticmethod
+    def get_products(limit=None, cursor=None, sort='product_id', **filters):
+        """
+        Fetch a page of the product catalog using keyset pagination.
+
+        Pages are selected with a WHERE on the sort key of the last row seen rather than an OFFSET, so deep pages
+        cost the same as the first one.
+        :param limit: Number of products per page, capped at MAX_PAGE_SIZE
+        :param cursor: Cursor returned with the previous page, None for the first page
+        :param sort: Keyset to page on, either 'product_id' or 'updated_date'
+        :param filters: Filters accepted by filter_products
+        :return: Dict with the page of products and the cursor of the next page, and an optional error message.
+        """
+        if sort not in ProductService.SORT_KEYS:
+            return None, f"Invalid sort key, expected one of: {', '.join(ProductService.SORT_KEYS)}."
+        limit = min(limit or ProductService.DEFAULT_PAGE_SIZE, ProductService.MAX_PAGE_SIZE)
+        if limit < 1:
+            return None, "Limit must be a positive number."
+
+        if sort == 'updated_date':
+            sort_key = (Product.last_modified, Product.product_id)
+        else:
+            sort_key = (Product.product_id,)
+
         try:
-            products = Product.query.all()
-            product_list = [product.to_dict() for product in products]
-            return product_list, None
+            query = ProductService.filter_products(ProductService.catalog_statement(), **filters)
+
+            if cursor:
+                try:
+                    last_key = decode_cursor(cursor)
+                    if sort == 'updated_date':
+                        last_key = [datetime.fromisoformat(last_key[0]), int(last_key[1])]
+                    else:
+                        last_key = [int(last_key[0])]
+                except (ValueError, TypeError, IndexError):
+                    return None, "Invalid cursor."
+                query = query.filter(tuple_(*sort_key) > tuple_(*last_key))
+
+            # Fetch one extra row to know whether another page follows
+            rows = db.session.execute(query.order_by(*sort_key).limit(limit + 1)).all()
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                if sort == 'updated_date':
+                    next_cursor = encode_cursor(last.last_modified, last.product_id)
+                else:
+                    next_cursor = encode_cursor(last.product_id)
+
+            product_list = ProductService.serialize_catalog(rows)
+            return {"data": product_list, "next_cursor": next_cursor}, None
         except SQLAlchemyError as e:
             return None, str(e)
+
+    @staticmethod
+    def iter_products(**filters):
+        """
+        Iterate over the filtered catalog in batches through a server-side cursor, for streaming responses.
+        :param filters: Filters accepted by filter_products
+        :return: Generator of product dicts, with the related rows of each batch loaded together
+        """
+        statement = ProductService.filter_products(ProductService.catalog_statement(), **filters)
+        statement = statement.order_by(Product.product_id)
+        batch_size = current_app.config['STREAM_BATCH_SIZE']
+        for rows in db.session.execute(statement.execution_options(yield_per=batch_size)).partitions():
+            yield from ProductService.serialize_catalog(rows)
+
+    @staticmethod
+    def catalog_statement():
+        """
+        Select the product rows of the catalog for serialize_catalog, with the category and its parent joined
+        and the last modification time as the final column
+        :return: Select statement accepted by filter_products
+        """
+        return select(*product_serializer.columns, *category_serializer.columns, Product.last_modified) \
+            .select_from(Product) \
+            .outerjoin(Category, Product.category_id == Category.category_id) \
+            .outerjoin(ParentCategory, Category.parent_category_id == ParentCategory.category_id)
+
+    @staticmethod
+    def serialize_catalog(rows):
+        """
+        Serialize product rows into the same nested representation as Product.to_dict.
+
+        Variants and their attributes, inventory and discounts are each read with one query, as row tuples handed
+        straight to the compiled serializers, so no ORM objects are built for the catalog.
+        :param rows: Product rows selected with catalog_statement
+        :return: List of product dicts in the order of the rows
+        """
+        category_position = len(product_serializer.columns)
+        serialize_category = category_serializer.compile(category_position)
+        products = {}
+        for row in rows:
+            product = product_serializer(row)
+            product["category"] = serialize_category(row) if row[category_position] is not None else None
+            product["variants"] = []
+            products[product["product_id"]] = product
+        if not products:
+            return []
+
+        variants = {}
+        for row in db.session.execute(
+            variant_serializer.select(ProductVariants.product_id)
+            .where(ProductVariants.product_id.in_(list(products)))
+            .order_by(ProductVariants.variant_id)
+        ):
+            variant = variant_serializer(row)
+            variant["attributes"] = []
+            variant["inventory"] = None
+            variant["discounts"] = []
+            variants[variant["variant_id"]] = variant
+            products[row[-1]]["variants"].append(variant)
+
+        if variants:
+            variant_ids = list(variants)
+            for row in db.session.execute(
+                attribute_serializer.select(ProductAttributes.variant_id)
+                .where(ProductAttributes.variant_id.in_(variant_ids))
+                .order_by(ProductAttributes.attribute_id)
+            ):
+                variants[row[-1]]["attributes"].append(attribute_serializer(row))
+            for row in db.session.execute(
+                inventory_serializer.select(Inventory.variant_id).where(Inventory.variant_id.in_(variant_ids))
+            ):
+                variants[row[-1]]["inventory"] = inventory_serializer(row)
+            # Only the discounts in effect today, both the variant's own and those of its product
+            today = date.today()
+            for row in db.session.execute(
+                discount_serializer.select().where(
+                    or_(Discount.variant_id.in_(variant_ids),
+                        and_(Discount.variant_id.is_(None), Discount.product_id.in_(list(products)))),
+                    Discount.start_date <= today,
+                    or_(Discount.expiry_date.is_(None), Discount.expiry_date >= today)
+                ).order_by(Discount.discount_id)
+            ):
+                discount = discount_serializer(row)
+                if discount["variant_id"] is not None:
+                    variants[discount["variant_id"]]["discounts"].append(discount)
+                else:
+                    for variant in products[discount["product_id"]]["variants"]:
+                        variant["discounts"].append(discount)
+        return list(products.values())
+
+    @staticmethod
+    def bulk_update_variants(items, updated_by):
+        """
+        Apply price and stock changes to many variants with set-based UPDATE ... FROM (VALUES ...) statements
+        in a single transaction.
+
+        :param items: List of dicts keyed by 'sku' or 'variant_id', with any of 'price' and the stock fields
+        :param updated_by: ID of the staff member applying the changes
+        :return: Per item results with the status of each change, and an optional error message.
+        """
+        variant_table = ProductVariants.__table__
+        inventory_table = Inventory.__table__
+
+        try:
+            # 1. Resolve every SKU and variant ID with one query
+            skus = [item.get('sku') for item in items if isinstance(item, dict) and item.get('sku')]
+            variant_ids = [item.get('variant_id') for item in items
+                           if isinstance(item, dict) and isinstance(item.get('variant_id'), int)]
+            known = db.session.execute(
+                select(variant_table.c.variant_id, variant_table.c.sku)
+                .where(or_(variant_table.c.sku.in_(skus), variant_table.c.variant_id.in_(variant_ids)))
+            ).all()
+            by_sku = {row.sku: row.variant_id for row in known}
+            by_id = {row.variant_id: row.sku for row in known}
+
+            # 2. Validate the changes in memory
+            results = []
+            price_rows = {}
+            stock_rows = {}
+            for item in items:
+                if not isinstance(item, dict):
+                    results.append({"status": "invalid", "error": "Each item must be an object."})
+                    continue
+                result = {"sku": item.get('sku'), "variant_id": item.get('variant_id')}
+                results.append(result)
+                if item.get('variant_id') is not None:
+                    variant_id = item['variant_id'] if item['variant_id'] in by_id else None
+                else:
+                    variant_id = by_sku.get(item.get('sku'))
+                if variant_id is None:
+                    result.update(status="not_found", error="Variant not found.")
+                    continue
+                result.update(variant_id=variant_id, sku=by_id[variant_id])
+                if variant_id in price_rows or variant_id in stock_rows:
+                    result.update(status="invalid", error="Duplicate entry for this variant.")
+                    continue
+
+                error = None
+                price = None
+                if item.get('price') is not None:
+                    try:
+                        price = Decimal(str(item['price']))
+                    except InvalidOperation:
+                        price = None
+                    if price is None or not price.is_finite() or price < 0:
+                        error = "Price must be a non-negative number."
+                stock = {}
+                for field in ProductService.STOCK_FIELDS:
+                    if item.get(field) is not None:
+                        if not isinstance(item[field], int) or isinstance(item[field], bool) or item[field] < 0:
+                            error = f"{field} must be a non-negative whole number."
+                        stock[field] = item[field]
+                if not error and price is None and not stock:
+                    error = "Nothing to update."
+                if error:
+                    result.update(status="invalid", error=error)
+                    continue
+
+                if price is not None:
+                    price_rows[variant_id] = price
+                if stock:
+                    stock_rows[variant_id] = stock
+                result["status"] = "updated"
+
+            chunk_size = ProductService.BULK_UPDATE_CHUNK_SIZE
+
+            # 3. Stock levels, keeping the current value of any field not provided
+            # Levels kept per location can only be sent back as they are, the location rows hold them
+            managed = LocationService.managed_levels()
+            stock_items = [(variant_id, *(stock.get(field) if field not in managed else None
+                                          for field in ProductService.STOCK_FIELDS))
+                           for variant_id, stock in stock_rows.items()]
+            stock_changes = []
+            updated_inventory = set()
+            rejected = {}
+            for start in range(0, len(stock_items), chunk_size):
+                chunk = stock_items[start:start + chunk_size]
+                # Lock the rows in variant order and keep their current levels for the journal
+                before = {row.variant_id: row._mapping for row in db.session.execute(
+                    select(inventory_table.c.variant_id, inventory_table.c.reserved_quantity,
+                           *InventoryHistoryService.level_columns())
+                    .where(inventory_table.c.variant_id.in_([item[0] for item in chunk]))
+                    .order_by(inventory_table.c.variant_id)
+                    .with_for_update()
+                )}
+                # Stock held by reservations cannot be edited away and stock kept per location only changes through
+                # transfers, the variant is left unchanged
+                for variant_id, quantity, *_ in chunk:
+                    if variant_id in before and quantity is not None \
+                            and quantity < before[variant_id]['reserved_quantity']:
+                        rejected[variant_id] = ProductService._reserved_error(
+                            variant_id, before[variant_id]['reserved_quantity']
+                        )
+                    else:
+                        error = LocationService.stock_edit_error(stock_rows[variant_id], managed,
+                                                                 before.get(variant_id))
+                        if error:
+                            rejected[variant_id] = error
+                chunk = [item for item in chunk if item[0] not in rejected]
+                if not chunk:
+                    continue
+                changes = values(
+                    column('variant_id', Integer), *(column(field, Integer) for field in ProductService.STOCK_FIELDS),
+                    name='changes'
+                ).data(chunk)
+                for row in db.session.execute(
+                    update(inventory_table)
+                    .where(inventory_table.c.variant_id == changes.c.variant_id)
+                    .values(updated_by=updated_by, updated_date=func.current_timestamp(), **{
+                        field: func.coalesce(cast(changes.c[field], Integer), inventory_table.c[field])
+                        for field in ProductService.STOCK_FIELDS
+                    })
+                    .returning(inventory_table.c.variant_id, *InventoryHistoryService.level_columns())
+                ):
+                    updated_inventory.add(row.variant_id)
+                    stock_changes.append(InventoryHistoryService.change(
+                        row.variant_id, before[row.variant_id], row._mapping, InventoryHistoryService.ADJUSTMENT,
+                        updated_by
+                    ))
+
+            # Variants without an inventory record get one
+            missing = [
+                dict({field: stock.get(field) or 0 for field in ProductService.STOCK_FIELDS},
+                     variant_id=variant_id, created_by=updated_by)
+                for variant_id, stock in stock_rows.items()
+                if variant_id not in updated_inventory and variant_id not in rejected
+            ]
+            if missing:
+                db.session.execute(insert(inventory_table), missing)
+                stock_changes.extend(InventoryHistoryService.change(
+                    row['variant_id'], None, row, InventoryHistoryService.NEW_STOCK, updated_by
+                ) for row in missing)
+
+            # 4. Prices, of the variants whose stock changes were accepted
+            price_items = [(variant_id, price) for variant_id, price in price_rows.items()
+                           if variant_id not in rejected]
+            for start in range(0, len(price_items), chunk_size):
+                changes = values(
+                    column('variant_id', Integer), column('price', Numeric), name='changes'
+                ).data(price_items[start:start + chunk_size])
+                db.session.execute(
+                    update(variant_table)
+                    .where(variant_table.c.variant_id == changes.c.variant_id)
+                    .values(price=cast(changes.c.price, Numeric), updated_by=updated_by,
+                            updated_date=func.current_timestamp())
+                )
+
+            InventoryHistoryService.record(stock_changes)
+            for result in results:
+                if result.get('variant_id') in rejected and result.get('status') == "updated":
+                    result.update(status="invalid", error=rejected[result['variant_id']])
+
+            db.session.commit()
+            if price_rows:
+                catalog_cache.bump_version(catalog_cache.CATALOG)
+            if stock_rows:
+                catalog_cache.bump_version(catalog_cache.STOCK)
+            return results, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
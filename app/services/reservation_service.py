@@ -0,0 +1,223 @@
+from flask import current_app
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Customer, Inventory, Reservation, ReservationItem
+from app.extensions import db, catalog_cache
+from .order_service import OrderService
+
+
+class ReservationService:
+    """
+    Time-limited stock reservations for baskets.
+
+    Reserving moves stock into Inventory.reserved_quantity, locking the inventory rows in variant_id order the same
+    way orders do, so no row lock is held while the customer shops. Orders can only take the stock that is not reserved,
+    stock edits cannot go below it, and checking out a reservation takes its own stock. Reservations that are
+    released, converted or expire give their stock back; expired ones are reaped by ReservationReaper.
+    """
+    ACTIVE = 'Active'
+    RELEASED = 'Released'
+    EXPIRED = 'Expired'
+    CONVERTED = 'Converted'
+
+    @staticmethod
+    def reserve(reservation_data):
+        """
+        Reserve stock for a basket for RESERVATION_TTL
+        :param reservation_data: Dict with customer_id, created_by and items of variant_id and quantity
+        :return: New reservation and an optional error message
+        """
+        if not isinstance(reservation_data, dict):
+            return None, "Reservation details must be an object."
+        lines, error = OrderService.parse_items(reservation_data.get('items', []))
+        if error:
+            return None, error
+        requested = {}
+        for line in lines:
+            requested[line['variant_id']] = requested.get(line['variant_id'], 0) + line['quantity']
+
+        try:
+            customer_id = reservation_data.get('customer_id')
+            if customer_id is None or not db.session.get(Customer, customer_id):
+                return None, "Customer not found."
+
+            stock = OrderService.lock_stock(requested)
+            for variant_id, quantity in sorted(requested.items()):
+                if variant_id not in stock:
+                    db.session.rollback()
+                    return None, OrderService._stock_error(variant_id, None)
+                available = stock[variant_id]['quantity'] - stock[variant_id]['reserved_quantity']
+                if available < quantity:
+                    db.session.rollback()
+                    return None, OrderService._stock_error(variant_id, available)
+            ReservationService._hold(stock, requested)
+
+            reservation = Reservation(
+                customer_id=customer_id,
+                status=ReservationService.ACTIVE,
+                expires_at=func.current_timestamp() + current_app.config['RESERVATION_TTL'],
+                created_by=reservation_data.get('created_by', 1001)
+            )
+            db.session.add(reservation)
+            db.session.flush()
+            db.session.execute(insert(ReservationItem.__table__), [
+                {"reservation_id": reservation.reservation_id, "variant_id": variant_id, "quantity": quantity}
+                for variant_id, quantity in sorted(requested.items())
+            ])
+            db.session.commit()
+            return reservation, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def get_reservation(reservation_id):
+        """
+        Look up a reservation
+        :param reservation_id: ID of the reservation
+        :return: Reservation and an optional error message
+        """
+        try:
+            reservation = db.session.get(Reservation, reservation_id)
+            if not reservation:
+                return None, "Reservation not found."
+            return reservation, None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def _end(condition, status, skip_locked=False):
+        """
+        End the active reservations matching a condition and give their stock back, without committing
+        :param condition: WHERE clause on Reservation
+        :param status: Status the reservations end with
+        :param skip_locked: Leave out reservations being ended or checked out by another transaction
+        :return: IDs of the reservations ended
+        """
+        matching = (
+            select(Reservation.reservation_id)
+            .where(condition, Reservation.status == ReservationService.ACTIVE)
+            .with_for_update(skip_locked=skip_locked)
+        )
+        ended = db.session.execute(
+            update(Reservation)
+            .where(Reservation.reservation_id.in_(matching.scalar_subquery()),
+                   Reservation.status == ReservationService.ACTIVE)
+            .values(status=status, updated_date=func.current_timestamp())
+            .returning(Reservation.reservation_id)
+        ).scalars().all()
+        if ended:
+            held = db.session.execute(
+                select(ReservationItem.variant_id, func.sum(ReservationItem.quantity))
+                .where(ReservationItem.reservation_id.in_(ended))
+                .group_by(ReservationItem.variant_id)
+                .order_by(ReservationItem.variant_id)
+            ).all()
+            held = dict(held)
+            ReservationService._hold(OrderService.lock_stock(held), {
+                variant_id: -quantity for variant_id, quantity in held.items()
+            })
+        return ended
+
+    @staticmethod
+    def _hold(stock, changes):
+        """
+        Change the stock held by reservations on inventory rows locked by OrderService.lock_stock
+        :param stock: Locked stock levels per variant
+        :param changes: Dict of variant_id to the quantity to hold, negative to give stock back
+        """
+        rows = [{"b_inventory_id": stock[variant_id]['inventory_id'], "b_quantity": quantity}
+                for variant_id, quantity in sorted(changes.items()) if variant_id in stock]
+        if rows:
+            inventory_table = Inventory.__table__
+            db.session.execute(
+                update(inventory_table)
+                .where(inventory_table.c.inventory_id == bindparam('b_inventory_id'))
+                .values(reserved_quantity=inventory_table.c.reserved_quantity + bindparam('b_quantity')),
+                rows
+            )
+
+    @staticmethod
+    def release(reservation_id):
+        """
+        Give the stock of an active reservation back
+        :param reservation_id: ID of the reservation
+        :return: Released reservation and an optional error message
+        """
+        try:
+            if not ReservationService._end(Reservation.reservation_id == reservation_id, ReservationService.RELEASED):
+                db.session.rollback()
+                return None, "Reservation not found or no longer active."
+            db.session.commit()
+            return db.session.get(Reservation, reservation_id), None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def checkout(reservation_id, order_data):
+        """
+        Convert an active reservation into an order of the reserved items
+        :param reservation_id: ID of the reservation
+        :param order_data: Dict with the order total amount, and other order details, created by the creator of the
+                           reservation when created_by is omitted
+        :return: Newly created order object and an optional error message
+        """
+        if not isinstance(order_data, dict):
+            return None, "Order details must be an object."
+        if order_data.get('order_total_amount') is None:
+            return None, "order_total_amount is required."
+        try:
+            # Claims the reservation, a concurrent checkout, release or reaper waits here and then finds it ended
+            reservation = db.session.execute(
+                update(Reservation)
+                .where(Reservation.reservation_id == reservation_id,
+                       Reservation.status == ReservationService.ACTIVE,
+                       Reservation.expires_at > func.current_timestamp())
+                .values(status=ReservationService.CONVERTED, updated_date=func.current_timestamp())
+                .returning(Reservation.customer_id, Reservation.created_by)
+            ).first()
+            if not reservation:
+                db.session.rollback()
+                return None, "Reservation not found, expired or no longer active."
+
+            items = db.session.execute(
+                select(ReservationItem.variant_id, ReservationItem.quantity)
+                .where(ReservationItem.reservation_id == reservation_id)
+            ).all()
+            lines, _ = OrderService.parse_items([
+                {"variant_id": variant_id, "quantity": quantity} for variant_id, quantity in items
+            ])
+            order_data = dict(order_data, customer_id=reservation.customer_id)
+            order_data.setdefault('created_by', reservation.created_by)
+            new_order, error = OrderService.place_order(order_data, lines, reserved=True)
+            if error:
+                db.session.rollback()
+                return None, error
+            db.session.execute(
+                update(Reservation).where(Reservation.reservation_id == reservation_id)
+                .values(order_id=new_order.order_id)
+            )
+            db.session.commit()
+            catalog_cache.bump_version(catalog_cache.STOCK)
+            return new_order, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f"An error occurred while processing the order: {str(e)}"
+
+    @staticmethod
+    def reap_expired():
+        """
+        Expire the reservations past their expiry time and give their stock back
+        :return: Number of reservations expired and an optional error message
+        """
+        try:
+            # Reapers running side by side each take the reservations the others have not locked
+            expired = ReservationService._end(
+                Reservation.expires_at <= func.current_timestamp(), ReservationService.EXPIRED, skip_locked=True
+            )
+            db.session.commit()
+            return len(expired), None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
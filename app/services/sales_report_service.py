@@ -0,0 +1,208 @@
+from datetime import date, timedelta
+from sqlalchemy import Date, cast, delete, func, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import (Category, DailyCategorySales, DailyStaffSales, DailyVariantSales, Order, OrderItem, Product,
+                        ProductVariants, SalesRollupDelta, Staff)
+from app.extensions import db
+
+
+class SalesReportService:
+    """
+    Daily sales rollups per variant, category and staff member, and the reports read from them.
+
+    Placed orders only append their sales to SalesRollupDelta in the transaction that places them, with one
+    INSERT ... SELECT per grouping, so concurrent orders never queue on the rollup rows of the day. The deltas are
+    folded into the rollup tables periodically, and reports add the deltas not folded yet, so they never scan orders
+    or order items. Sales are net of the discounts recorded on the order items.
+    """
+    GROUPINGS = ('variant', 'category', 'staff')
+    DEFAULT_PERIOD_DAYS = 30
+    # Rollup table and its columns per grouping: date, key and the lines, units and amount counters
+    ROLLUPS = (
+        ('variant', DailyVariantSales, ('sales_date', 'variant_id', 'order_lines', 'units_sold', 'gross_sales')),
+        ('category', DailyCategorySales, ('sales_date', 'category_id', 'order_lines', 'units_sold', 'gross_sales')),
+        ('staff', DailyStaffSales, ('sales_date', 'staff_id', 'orders_count', 'items_count', 'order_total'))
+    )
+    DELTA_COLUMNS = ('sales_date', 'key_id', 'lines', 'units', 'amount')
+
+    @staticmethod
+    def _rollups(order_filter):
+        """
+        Aggregations of the orders matching a filter, one per grouping in ROLLUPS order
+        :param order_filter: WHERE clause on Order
+        :return: List of select statements with the date, key and counters of each grouping
+        """
+        sales_date = cast(Order.order_date, Date).label('sales_date')
+        # Rate discounts round to the minor unit, as in PricingService.quote
+        unit_discount = func.round(OrderItem.price_at_purchase * func.coalesce(OrderItem.discount_rate, 0) / 100, 2) \
+            + func.coalesce(OrderItem.discount_amount, 0)
+        line_total = OrderItem.quantity * func.greatest(OrderItem.price_at_purchase - unit_discount, 0)
+
+        variant_sales = (
+            select(sales_date, OrderItem.variant_id, func.count(), func.sum(OrderItem.quantity), func.sum(line_total))
+            .join(Order, Order.order_id == OrderItem.order_id)
+            .where(order_filter)
+            .group_by(sales_date, OrderItem.variant_id)
+            .order_by(sales_date, OrderItem.variant_id)
+        )
+        category_sales = (
+            select(sales_date, Product.category_id, func.count(), func.sum(OrderItem.quantity), func.sum(line_total))
+            .join(Order, Order.order_id == OrderItem.order_id)
+            .join(ProductVariants, ProductVariants.variant_id == OrderItem.variant_id)
+            .join(Product, Product.product_id == ProductVariants.product_id)
+            .where(order_filter)
+            .group_by(sales_date, Product.category_id)
+            .order_by(sales_date, Product.category_id)
+        )
+        staff_sales = (
+            select(sales_date, Order.created_by, func.count(), func.sum(Order.total_items_count),
+                   func.sum(Order.total_order_amount))
+            .where(order_filter)
+            .group_by(sales_date, Order.created_by)
+            .order_by(sales_date, Order.created_by)
+        )
+        return [variant_sales, category_sales, staff_sales]
+
+    @staticmethod
+    def record_orders(order_ids):
+        """
+        Append the sales of newly placed orders to the rollup deltas in the current transaction, without committing it
+        :param order_ids: IDs of orders whose items have been written
+        """
+        if not order_ids:
+            return
+        queries = SalesReportService._rollups(Order.order_id.in_(order_ids))
+        for (grouping, _, _), query in zip(SalesReportService.ROLLUPS, queries):
+            db.session.execute(insert(SalesRollupDelta).from_select(
+                [*SalesReportService.DELTA_COLUMNS, 'grouping'], query.add_columns(literal(grouping))
+            ))
+
+    @staticmethod
+    def fold_rollups():
+        """
+        Fold the rollup deltas into the daily rollup tables.
+        Deltas are deleted and summed in the same statement that adds them to the rollups, so a fold running alongside
+        another one, or alongside new orders, never counts a delta twice or misses it. Rollup rows are written in key
+        order, so concurrent folds queue on each other instead of deadlocking.
+        :return: Number of rollup rows written and an optional error message
+        """
+        deltas = SalesRollupDelta.__table__
+        rows = 0
+        try:
+            for grouping, model, columns in SalesReportService.ROLLUPS:
+                table = model.__table__
+                folded = (
+                    delete(deltas).where(deltas.c.grouping == grouping)
+                    .returning(*(deltas.c[name] for name in SalesReportService.DELTA_COLUMNS))
+                    .cte('folded')
+                )
+                totals = (
+                    select(folded.c.sales_date, folded.c.key_id, func.sum(folded.c.lines), func.sum(folded.c.units),
+                           func.sum(folded.c.amount))
+                    .group_by(folded.c.sales_date, folded.c.key_id)
+                    .order_by(folded.c.sales_date, folded.c.key_id)
+                )
+                statement = insert(table).from_select(columns, totals)
+                rows += db.session.execute(statement.on_conflict_do_update(
+                    index_elements=list(table.primary_key.columns),
+                    set_={name: table.c[name] + statement.excluded[name] for name in columns[2:]}
+                )).rowcount
+            db.session.commit()
+            return rows, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def rebuild_rollups(date_from=None, date_to=None):
+        """
+        Recompute the rollups of a date range from the orders, for backfilling and repairs.
+        The deltas and rollup tables are locked for the rebuild, so orders placed and folds run meanwhile wait instead
+        of being counted twice or lost.
+        :param date_from: First day to rebuild, the first order's day when omitted
+        :param date_to: Last day to rebuild, the last order's day when omitted
+        :return: Number of days rebuilt and an optional error message
+        """
+        try:
+            # The deltas first, in the order folds take them
+            for model in (SalesRollupDelta, DailyVariantSales, DailyCategorySales, DailyStaffSales):
+                db.session.execute(text(f'LOCK TABLE dev.{model.__tablename__} IN SHARE ROW EXCLUSIVE MODE'))
+            first, last = db.session.execute(
+                select(func.min(cast(Order.order_date, Date)), func.max(cast(Order.order_date, Date)))
+            ).one()
+            date_from = date_from or first
+            date_to = date_to or last
+            if date_from is None or date_to is None:
+                db.session.commit()
+                return 0, None
+
+            for model in (SalesRollupDelta, DailyVariantSales, DailyCategorySales, DailyStaffSales):
+                db.session.execute(delete(model).where(model.sales_date.between(date_from, date_to)))
+            queries = SalesReportService._rollups(
+                (Order.order_date >= date_from) & (Order.order_date < date_to + timedelta(days=1))
+            )
+            for (_, model, columns), query in zip(SalesReportService.ROLLUPS, queries):
+                db.session.execute(insert(model).from_select(columns, query))
+            db.session.commit()
+            return (date_to - date_from).days + 1, None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def get_sales(group_by='variant', date_from=None, date_to=None, daily=False):
+        """
+        Report sales over a date range from the rollups
+        :param group_by: 'variant', 'category' or 'staff'
+        :param date_from: First day of the report as YYYY-MM-DD, DEFAULT_PERIOD_DAYS before date_to when omitted
+        :param date_to: Last day of the report as YYYY-MM-DD, today when omitted
+        :param daily: Report every day separately instead of totals over the range
+        :return: List of report rows and an optional error message
+        """
+        if group_by not in SalesReportService.GROUPINGS:
+            return None, f"Invalid grouping, expected one of: {', '.join(SalesReportService.GROUPINGS)}."
+        try:
+            date_to = date.fromisoformat(date_to) if date_to else date.today()
+            date_from = date.fromisoformat(date_from) if date_from else \
+                date_to - timedelta(days=SalesReportService.DEFAULT_PERIOD_DAYS - 1)
+        except ValueError:
+            return None, "Dates must be in YYYY-MM-DD format."
+        if date_from > date_to:
+            return None, "date_from cannot be after date_to."
+
+        if group_by == 'variant':
+            name, name_key = ProductVariants.sku, ProductVariants.variant_id
+        elif group_by == 'category':
+            name, name_key = Category.category_name, Category.category_id
+        else:
+            name, name_key = Staff.name, Staff.staff_id
+
+        # The folded rollups plus the deltas not folded yet
+        _, model, columns = SalesReportService.ROLLUPS[SalesReportService.GROUPINGS.index(group_by)]
+        table = model.__table__
+        deltas = SalesRollupDelta.__table__
+        rows = union_all(
+            select(*(table.c[column] for column in columns)).where(table.c.sales_date.between(date_from, date_to)),
+            select(*(deltas.c[delta].label(column) for delta, column in zip(SalesReportService.DELTA_COLUMNS, columns)))
+            .where((deltas.c.grouping == group_by) & deltas.c.sales_date.between(date_from, date_to))
+        ).subquery('rows')
+        key = rows.c[columns[1]]
+        counters = [rows.c[column] for column in columns[2:]]
+
+        group = [rows.c.sales_date, key, name] if daily else [key, name]
+        query = (
+            select(*group, *(func.sum(counter).label(counter.key) for counter in counters))
+            .select_from(rows)
+            .join(name.class_, name_key == key)
+            .group_by(*group)
+        )
+        if daily:
+            query = query.order_by(rows.c.sales_date, key)
+        else:
+            query = query.order_by(func.sum(counters[-1]).desc(), key)
+
+        try:
+            return [row._asdict() for row in db.session.execute(query)], None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
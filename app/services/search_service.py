@@ -0,0 +1,167 @@
+import threading
+from flask import current_app
+from sqlalchemy import select, func, exists, or_
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Product, ProductVariants, ProductAttributes
+from app.extensions import db, catalog_cache
+from app.search_index import SearchIndex, tokenize
+
+
+class SearchService:
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+
+    # In-process index, rebuilt whenever the catalog version changes
+    _index = None
+    _index_version = None
+    _index_lock = threading.Lock()
+
+    @staticmethod
+    def use_database_search():
+        """
+        Decide whether searches run on the database or on the in-process index.
+        SEARCH_BACKEND can force 'database' or 'memory', otherwise Postgres uses its full-text search.
+        """
+        backend = current_app.config.get('SEARCH_BACKEND')
+        if backend:
+            return backend == 'database'
+        return db.engine.dialect.name == 'postgresql'
+
+    @staticmethod
+    def parse_attributes(values):
+        """
+        Parse attribute filters given as 'name:value' strings
+        :param values: List of filter strings
+        :return: List of (name, value) pairs and an optional error message
+        """
+        attributes = []
+        for value in values:
+            name, separator, attribute_value = value.partition(':')
+            if not separator or not name or not attribute_value:
+                return None, f"Invalid attribute filter '{value}', expected name:value."
+            attributes.append((name, attribute_value))
+        return attributes, None
+
+    @staticmethod
+    def search_products(query=None, attributes=(), limit=None):
+        """
+        Search active product variants by product name and attributes, with facet counts per attribute value.
+
+        :param query: Free text matched against product names, each word as a prefix
+        :param attributes: List of (name, value) pairs the variants must carry
+        :param limit: Maximum number of variants returned, capped at MAX_LIMIT
+        :return: Dict with matching variants, total matches and facets, and an optional error message.
+        """
+        limit = min(limit or SearchService.DEFAULT_LIMIT, SearchService.MAX_LIMIT)
+        if limit < 1:
+            return None, "Limit must be a positive number."
+
+        try:
+            if SearchService.use_database_search():
+                results, total, facets = SearchService._search_database(query, attributes, limit)
+            else:
+                index = SearchService.get_index()
+                variants, total, facets = index.search(query, attributes, limit)
+                results = [{
+                    "variant_id": variant.variant_id,
+                    "product_id": variant.product_id,
+                    "product_name": variant.product_name,
+                    "sku": variant.sku,
+                    "price": variant.price,
+                    "attributes": [{"name": name, "value": value} for name, value in variant.attributes]
+                } for variant in variants]
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
+
+        facet_counts = {}
+        for (name, value), count in facets.items():
+            facet_counts.setdefault(name, {})[value] = count
+        return {"data": results, "total": total, "facets": facet_counts}, None
+
+    @staticmethod
+    def get_index():
+        """Return the in-process search index, rebuilding it if the products have changed since it was built"""
+        version = catalog_cache.version_key(catalog_cache.CATALOG)
+        with SearchService._index_lock:
+            if SearchService._index is None or SearchService._index_version != version:
+                products = Product.__table__
+                variants = ProductVariants.__table__
+                attributes = ProductAttributes.__table__
+                statement = select(
+                    variants.c.variant_id, products.c.product_id, products.c.product_name, variants.c.sku,
+                    variants.c.price, attributes.c.name, attributes.c.value
+                ).select_from(
+                    variants.join(products, variants.c.product_id == products.c.product_id)
+                    .outerjoin(attributes, attributes.c.variant_id == variants.c.variant_id)
+                ).where(products.c.is_active.is_(True))
+                rows = db.session.execute(
+                    statement.execution_options(yield_per=current_app.config['STREAM_BATCH_SIZE'])
+                )
+                SearchService._index = SearchIndex(rows)
+                SearchService._index_version = version
+            return SearchService._index
+
+    @staticmethod
+    def _search_database(query, attributes, limit):
+        """Run the search with Postgres full-text and trigram matching on product names, in four statements"""
+        products = Product.__table__
+        variants = ProductVariants.__table__
+        product_attributes = ProductAttributes.__table__
+
+        conditions = [products.c.is_active.is_(True)]
+        tokens = tokenize(query)
+        if tokens:
+            ts_query = ' & '.join(f'{token}:*' for token in tokens)
+            conditions.append(or_(
+                func.to_tsvector('simple', products.c.product_name).op('@@')(func.to_tsquery('simple', ts_query)),
+                products.c.product_name.icontains(query, autoescape=True)
+            ))
+        for name, value in attributes:
+            conditions.append(exists().where(
+                product_attributes.c.variant_id == variants.c.variant_id,
+                func.lower(product_attributes.c.name) == name.lower(),
+                func.lower(product_attributes.c.value) == value.lower()
+            ))
+
+        joined = variants.join(products, variants.c.product_id == products.c.product_id)
+        matched = select(variants.c.variant_id).select_from(joined).where(*conditions).cte('matched_variants')
+
+        page = db.session.execute(
+            select(variants.c.variant_id, products.c.product_id, products.c.product_name, variants.c.sku,
+                   variants.c.price)
+            .select_from(joined)
+            .where(variants.c.variant_id.in_(select(matched.c.variant_id)))
+            .order_by(variants.c.variant_id)
+            .limit(limit)
+        ).all()
+        total = db.session.execute(select(func.count()).select_from(matched)).scalar()
+
+        facet_name = func.lower(product_attributes.c.name)
+        facet_value = func.lower(product_attributes.c.value)
+        facets = {
+            (name, value): count for name, value, count in db.session.execute(
+                select(facet_name, facet_value, func.count(func.distinct(product_attributes.c.variant_id)))
+                .where(product_attributes.c.variant_id.in_(select(matched.c.variant_id)))
+                .group_by(facet_name, facet_value)
+            )
+        }
+
+        page_attributes = {}
+        page_ids = [row.variant_id for row in page]
+        if page_ids:
+            for variant_id, name, value in db.session.execute(
+                select(product_attributes.c.variant_id, product_attributes.c.name, product_attributes.c.value)
+                .where(product_attributes.c.variant_id.in_(page_ids))
+                .order_by(product_attributes.c.attribute_id)
+            ):
+                page_attributes.setdefault(variant_id, []).append({"name": name, "value": value})
+
+        results = [{
+            "variant_id": row.variant_id,
+            "product_id": row.product_id,
+            "product_name": row.product_name,
+            "sku": row.sku,
+            "price": float(row.price),
+            "attributes": page_attributes.get(row.variant_id, [])
+        } for row in page]
+        return results, total, facets
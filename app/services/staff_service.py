@@ -1,6 +1,5 @@
-from werkzeug.security import generate_password_hash
 from sqlalchemy.exc import SQLAlchemyError
-from app.extensions import db
+from app.extensions import db, password_hasher
 from app.models import LoginDetails, Staff
 
 
@@ -19,6 +18,8 @@ class StaffService:
         :param created_by: ID of the staff who is creating this member
         :return: Newly created staff member and an optional error message
         """
+        # Hashed before any database work, so no connection is held while waiting for the password hasher
+        hashed_password = password_hasher.hash(password) if username and password else None
         try:
             # Check if email or username already exists
             if email and Staff.query.filter_by(email=email).first():
@@ -43,7 +44,6 @@ class StaffService:
 
                 # Create the login details
                 if username and password:
-                    hashed_password = generate_password_hash(password)
                     login_details = LoginDetails(
                         staff_id=new_staff.staff_id,
                         username=username,
@@ -0,0 +1,106 @@
+from sqlalchemy import insert, literal_column, select, true, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from app.models import Inventory, Product, ProductVariants, StockAlert
+from app.extensions import db
+from app.utils import decode_cursor, encode_cursor
+
+
+class StockAlertService:
+    """
+    Variants below their reorder level, and a feed of the moments they fall below it or recover.
+
+    The low-stock listing reads the partial index on inventory rows below their reorder level, so it costs one row
+    per alert whatever the size of the catalog. Stock changes reported to the stock journal are also checked here,
+    and each one crossing the reorder level adds an alert to the feed in the same transaction.
+    """
+    LOW_STOCK = 'low_stock'
+    RESTOCKED = 'restocked'
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+
+    @staticmethod
+    def record_changes(entries):
+        """
+        Add an alert for every change crossing a reorder level in the current transaction, without committing it
+        :param entries: List of stock journal entries built by InventoryHistoryService.change
+        """
+        alerts = []
+        for entry in entries:
+            was_low = entry['quantity_before'] < entry['reorder_level_before']
+            is_low = entry['quantity_after'] < entry['reorder_level_after']
+            if was_low != is_low:
+                alerts.append({
+                    "variant_id": entry['variant_id'],
+                    "alert_type": StockAlertService.LOW_STOCK if is_low else StockAlertService.RESTOCKED,
+                    "quantity": entry['quantity_after'],
+                    "reorder_level": entry['reorder_level_after'],
+                    "created_by": entry['staff_id']
+                })
+        if alerts:
+            db.session.execute(insert(StockAlert.__table__), alerts)
+
+    @staticmethod
+    def get_low_stock():
+        """
+        List the variants whose quantity is below their reorder level
+        :return: List of variants with their stock levels and an optional error message
+        """
+        inventory = Inventory.__table__
+        # Looked up per alert: the planner cannot tell how few rows match the partial index and would otherwise
+        # hash join the whole catalog. The LIMIT keeps the lateral subquery from being flattened into that join.
+        variant = (
+            select(ProductVariants.sku, Product.product_id, Product.product_name)
+            .join(Product, Product.product_id == ProductVariants.product_id)
+            .where(ProductVariants.variant_id == inventory.c.variant_id)
+            .limit(1)
+            .lateral('variant')
+        )
+        query = (
+            select(inventory.c.variant_id, variant.c.sku, variant.c.product_id, variant.c.product_name,
+                   inventory.c.quantity, inventory.c.reorder_level,
+                   (inventory.c.reorder_level - inventory.c.quantity).label('shortfall'))
+            .select_from(inventory)
+            .join(variant, true())
+            # Same predicate as the partial index
+            .where(inventory.c.quantity < inventory.c.reorder_level)
+            .order_by(inventory.c.variant_id)
+        )
+        try:
+            return [row._asdict() for row in db.session.execute(query)], None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
+
+    @staticmethod
+    def get_feed(cursor=None, limit=None):
+        """
+        Read the alerts added since a cursor, oldest first.
+
+        Alerts are ordered by the ID of the transaction that wrote them and only returned once every transaction
+        with a lower ID has finished, so an alert can never appear behind a cursor already handed out.
+        :param cursor: Cursor returned by the previous call, None to read from the start
+        :param limit: Number of alerts to return, capped at MAX_PAGE_SIZE
+        :return: Dict with the alerts and the cursor to poll with next, and an optional error message
+        """
+        limit = min(limit or StockAlertService.DEFAULT_PAGE_SIZE, StockAlertService.MAX_PAGE_SIZE)
+        if limit < 1:
+            return None, "Limit must be a positive number."
+
+        sort_key = (StockAlert.txid, StockAlert.alert_id)
+        query = select(StockAlert).where(
+            StockAlert.txid < literal_column('pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        )
+        if cursor:
+            try:
+                last_key = [int(value) for value in decode_cursor(cursor)]
+            except (ValueError, TypeError):
+                return None, "Invalid cursor."
+            if len(last_key) != 2:
+                return None, "Invalid cursor."
+            query = query.where(tuple_(*sort_key) > tuple_(*last_key))
+
+        try:
+            alerts = db.session.execute(query.order_by(*sort_key).limit(limit)).scalars().all()
+            next_cursor = encode_cursor(alerts[-1].txid, alerts[-1].alert_id) if alerts else cursor
+            return {"data": [alert.to_dict() for alert in alerts], "next_cursor": next_cursor}, None
+        except SQLAlchemyError as e:
+            return None, f'An error has occurred: {str(e)}'
@@ -1,6 +1,10 @@
+import base64
+import binascii
+import json
+from datetime import datetime
 from functools import wraps
 from flask_jwt_extended import verify_jwt_in_request, get_jwt
-from flask import jsonify
+from flask import current_app, jsonify, Response, stream_with_context
 
 
 def roles_required(*roles):
@@ -23,3 +27,55 @@ def roles_required(*roles):
             return fn(*args, **kwargs)
         return wrapper
     return decorator
+
+
+def encode_cursor(*values):
+    """
+    Encodes the keyset values of the last row on a page into an opaque pagination cursor
+    :param values: Sort key values of the last row returned
+    :return: URL safe cursor string
+    """
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a pagination cursor back into its keyset values
+    :param cursor: Cursor string produced by encode_cursor
+    :return: List of keyset values, raises ValueError for a malformed cursor
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor.")
+    return values
+
+
+def parse_bool(value):
+    """
+    Parses a boolean query string argument
+    :param value: Raw argument value such as 'true' or '0'
+    :return: True for 'true' or '1', otherwise False
+    """
+    return value.lower() in ('true', '1')
+
+
+def stream_json(rows, serialize, envelope=None):
+    """
+    Streams a JSON array to the client one element at a time instead of building the whole list in memory
+    :param rows: Iterable of records, typically a query using yield_per so rows are read through a server-side cursor
+    :param serialize: Callable converting a record into a dict the app's JSON provider can encode
+    :param envelope: Key to nest the array under, or None to stream a bare array
+    :return: Streaming JSON response
+    """
+    def generate():
+        dumps = current_app.json.dumps
+        yield '{%s: [' % dumps(envelope) if envelope else '['
+        for index, row in enumerate(rows):
+            yield (',' if index else '') + dumps(serialize(row))
+        yield ']}' if envelope else ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -26,6 +26,12 @@ CREATE TABLE dev.staff (
 INSERT INTO dev.staff (name, role) 
 VALUES ('hseofgla','system');
 
+-- Catalog versions, bumped after every write to products, categories, discounts or stock respectively
+CREATE SEQUENCE dev.catalog_version_seq;
+CREATE SEQUENCE dev.category_version_seq;
+CREATE SEQUENCE dev.discount_version_seq;
+CREATE SEQUENCE dev.stock_version_seq;
+
 -- Creating the Categories table with a self-referencing parent_category_id
 CREATE TABLE dev.categories (
     category_id SERIAL PRIMARY KEY,
@@ -40,6 +46,16 @@ CREATE TABLE dev.categories (
     FOREIGN KEY (updated_by) REFERENCES dev.staff(staff_id)
 );
 
+-- Creating the Category Closure table, one row per ancestor and descendant pair
+CREATE TABLE dev.category_closure (
+    ancestor_id INT NOT NULL,
+    descendant_id INT NOT NULL,
+    depth INT NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id),
+    FOREIGN KEY (ancestor_id) REFERENCES dev.categories(category_id),
+    FOREIGN KEY (descendant_id) REFERENCES dev.categories(category_id)
+);
+
 -- Creating the Products table
 CREATE TABLE dev.products (
     product_id SERIAL PRIMARY KEY,
@@ -78,10 +94,12 @@ CREATE TABLE dev.inventory (
     warehouse_stock INT NOT NULL DEFAULT 0,
     shop_stock INT NOT NULL DEFAULT 0,
     reorder_level INT NOT NULL DEFAULT 0,
+    reserved_quantity INT NOT NULL DEFAULT 0,
 	created_by INT,
 	created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
 	updated_by INT,
 	updated_date TIMESTAMP,
+    CONSTRAINT check_inventory_quantity_non_negative CHECK (quantity >= 0),
     FOREIGN KEY (variant_id) REFERENCES dev.product_variants(variant_id),
 	FOREIGN KEY (created_by) REFERENCES dev.staff(staff_id),
     FOREIGN KEY (updated_by) REFERENCES dev.staff(staff_id)
@@ -126,6 +144,7 @@ CREATE TABLE dev.orders (
 	total_order_amount NUMERIC NOT NULL,
     order_status VARCHAR(50) NOT NULL,
     order_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    client_order_id VARCHAR(64) UNIQUE,
 	created_by INT,
 	created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
 	updated_by INT,
@@ -155,12 +174,157 @@ CREATE TABLE dev.order_items (
     FOREIGN KEY (updated_by) REFERENCES dev.staff(staff_id)
 );
 
+-- Creating the Idempotency Keys table, responses of placed orders kept for client retries
+CREATE TABLE dev.idempotency_keys (
+    owner VARCHAR(64) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash BYTEA NOT NULL,
+    response JSON,
+    created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (owner, idempotency_key)
+);
+
+-- Creating the Customer Ledger table, append-only charges and payments folded into customers.outstanding_balance
+CREATE TABLE dev.customer_ledger (
+    entry_id BIGSERIAL PRIMARY KEY,
+    customer_id INT NOT NULL,
+    entry_type VARCHAR(20) NOT NULL,
+    amount NUMERIC NOT NULL,
+    order_id INT,
+    folded BOOLEAN NOT NULL DEFAULT FALSE,
+	created_by INT NOT NULL,
+	created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES dev.customers (customer_id),
+    FOREIGN KEY (order_id) REFERENCES dev.orders (order_id),
+	FOREIGN KEY (created_by) REFERENCES dev.staff(staff_id)
+);
+
+-- Creating the Order Requests table, the outbox of orders queued for asynchronous placement
+CREATE TABLE dev.order_requests (
+    request_id SERIAL PRIMARY KEY,
+    customer_id INT,
+    payload JSON NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'Queued',
+    order_id INT,
+    error TEXT,
+	created_by INT NOT NULL,
+	created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    processed_date TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES dev.customers (customer_id),
+    FOREIGN KEY (order_id) REFERENCES dev.orders (order_id),
+	FOREIGN KEY (created_by) REFERENCES dev.staff(staff_id)
+);
+
+-- Creating the daily sales rollup tables, maintained with every placed order
+CREATE TABLE dev.daily_variant_sales (
+    sales_date DATE NOT NULL,
+    variant_id INT NOT NULL,
+    order_lines INT NOT NULL DEFAULT 0,
+    units_sold INT NOT NULL DEFAULT 0,
+    gross_sales NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, variant_id),
+    FOREIGN KEY (variant_id) REFERENCES dev.product_variants (variant_id)
+);
+
+CREATE TABLE dev.daily_category_sales (
+    sales_date DATE NOT NULL,
+    category_id INT NOT NULL,
+    order_lines INT NOT NULL DEFAULT 0,
+    units_sold INT NOT NULL DEFAULT 0,
+    gross_sales NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, category_id),
+    FOREIGN KEY (category_id) REFERENCES dev.categories (category_id)
+);
+
+CREATE TABLE dev.daily_staff_sales (
+    sales_date DATE NOT NULL,
+    staff_id INT NOT NULL,
+    orders_count INT NOT NULL DEFAULT 0,
+    items_count INT NOT NULL DEFAULT 0,
+    order_total NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, staff_id),
+    FOREIGN KEY (staff_id) REFERENCES dev.staff (staff_id)
+);
+
+-- Creating the Sales Rollup Deltas table, append-only sales of placed orders folded into the daily rollups
+CREATE TABLE dev.sales_rollup_deltas (
+    delta_id BIGSERIAL PRIMARY KEY,
+    grouping VARCHAR(10) NOT NULL,
+    sales_date DATE NOT NULL,
+    key_id INT NOT NULL,
+    lines INT NOT NULL,
+    units INT NOT NULL,
+    amount NUMERIC NOT NULL
+);
+
+-- Creating the Stock Alerts table, the feed of variants falling below their reorder level or recovering
+CREATE TABLE dev.stock_alerts (
+    alert_id BIGSERIAL PRIMARY KEY,
+    variant_id INT NOT NULL,
+    alert_type VARCHAR(20) NOT NULL,
+    quantity INT NOT NULL,
+    reorder_level INT NOT NULL,
+    txid BIGINT NOT NULL DEFAULT pg_current_xact_id()::TEXT::BIGINT,
+	created_by INT NOT NULL,
+	created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (variant_id) REFERENCES dev.product_variants (variant_id),
+	FOREIGN KEY (created_by) REFERENCES dev.staff(staff_id)
+);
+
+-- Creating the Reservations tables, stock held for baskets until checkout or expiry
+CREATE TABLE dev.reservations (
+    reservation_id SERIAL PRIMARY KEY,
+    customer_id INT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    order_id INT,
+	created_by INT NOT NULL,
+	created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+	updated_date TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES dev.customers (customer_id),
+    FOREIGN KEY (order_id) REFERENCES dev.orders (order_id),
+	FOREIGN KEY (created_by) REFERENCES dev.staff(staff_id)
+);
+
+CREATE TABLE dev.reservation_items (
+    reservation_item_id SERIAL PRIMARY KEY,
+    reservation_id INT NOT NULL,
+    variant_id INT NOT NULL,
+    quantity INT NOT NULL,
+    FOREIGN KEY (reservation_id) REFERENCES dev.reservations (reservation_id),
+    FOREIGN KEY (variant_id) REFERENCES dev.product_variants (variant_id)
+);
+
+-- Creating the Locations tables, the stock of each variant at the warehouse and at each shop
+CREATE TABLE dev.locations (
+    location_id SERIAL PRIMARY KEY,
+    location_name VARCHAR(100) NOT NULL UNIQUE,
+    location_type VARCHAR(20) NOT NULL,
+	created_by INT NOT NULL,
+	created_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+	FOREIGN KEY (created_by) REFERENCES dev.staff(staff_id)
+);
+
+CREATE TABLE dev.location_stock (
+    variant_id INT NOT NULL,
+    location_id INT NOT NULL,
+    quantity INT NOT NULL DEFAULT 0,
+	updated_by INT,
+	updated_date TIMESTAMP,
+    PRIMARY KEY (variant_id, location_id),
+    CONSTRAINT check_location_stock_non_negative CHECK (quantity >= 0),
+    FOREIGN KEY (variant_id) REFERENCES dev.product_variants (variant_id),
+    FOREIGN KEY (location_id) REFERENCES dev.locations (location_id),
+	FOREIGN KEY (updated_by) REFERENCES dev.staff(staff_id)
+);
+
 -- Creating the Discounts table
 CREATE TABLE dev.discounts (
     discount_id SERIAL PRIMARY KEY,
     discount_name VARCHAR(255) NOT NULL,
 	product_id INT NOT NULL,
-	variant_id INT NOT NULL,
+	variant_id INT,
     discount_rate NUMERIC,
     discount_amount NUMERIC,
     start_date DATE NOT NULL,
@@ -215,6 +379,8 @@ CREATE TABLE dev.shipping_addresses (
 CREATE TABLE dev.inventory_history (
     history_id SERIAL PRIMARY KEY,
     variant_id INT NOT NULL,
+    quantity_before INT NOT NULL,
+    quantity_after INT NOT NULL,
     warehouse_stock_before INT NOT NULL,
     warehouse_stock_after INT NOT NULL,
     shop_stock_before INT NOT NULL,
@@ -296,6 +462,57 @@ CREATE TABLE aud.audit_log (
     FOREIGN KEY (changed_by) REFERENCES dev.staff(staff_id)
 );
 
+---	INDEXES
+
+-- Keyset pagination and filtering of the product catalog
+CREATE INDEX ix_products_category_id ON dev.products (category_id);
+CREATE INDEX ix_products_last_modified ON dev.products ((COALESCE(updated_date, created_date)), product_id);
+CREATE INDEX ix_product_variants_product_id ON dev.product_variants (product_id);
+
+-- Category subtree listings and closure maintenance
+CREATE INDEX ix_dev_category_closure_descendant_id ON dev.category_closure (descendant_id);
+
+-- Conditional stock deduction when placing orders
+CREATE INDEX ix_dev_inventory_variant_id ON dev.inventory (variant_id);
+
+-- Low-stock listing: only the variants below their reorder level
+CREATE INDEX ix_dev_inventory_below_reorder_level ON dev.inventory (variant_id) WHERE quantity < reorder_level;
+
+-- Stock alert feed
+CREATE INDEX ix_dev_stock_alerts_txid ON dev.stock_alerts (txid, alert_id);
+
+-- Stock movement journal per variant and stock levels at a point in time
+CREATE INDEX ix_dev_inventory_history_variant_id_change_date ON dev.inventory_history (variant_id, change_date, history_id);
+
+-- Order history pages and the items of a page of orders
+CREATE INDEX ix_dev_orders_order_date ON dev.orders (order_date, order_id);
+CREATE INDEX ix_dev_orders_customer_id_order_date ON dev.orders (customer_id, order_date, order_id);
+CREATE INDEX ix_dev_orders_order_status_order_date ON dev.orders (order_status, order_date, order_id);
+CREATE INDEX ix_dev_order_items_order_id ON dev.order_items (order_id);
+
+-- Customer balances: ledger entries not folded into the balance yet
+CREATE INDEX ix_dev_customer_ledger_unfolded ON dev.customer_ledger (customer_id) WHERE NOT folded;
+
+-- Sales reports: order sales not folded into the daily rollups yet
+CREATE INDEX ix_dev_sales_rollup_deltas_grouping_sales_date ON dev.sales_rollup_deltas (grouping, sales_date);
+
+-- Order workers draining queued order requests
+CREATE INDEX ix_dev_order_requests_status ON dev.order_requests (status, request_id);
+
+-- Reaping expired reservations and the items of a reservation
+CREATE INDEX ix_dev_reservations_active_expires_at ON dev.reservations (expires_at) WHERE status = 'Active';
+CREATE INDEX ix_dev_reservation_items_reservation_id ON dev.reservation_items (reservation_id);
+
+-- Purging expired idempotency keys
+CREATE INDEX ix_dev_idempotency_keys_expires_at ON dev.idempotency_keys (expires_at);
+
+-- Product search: full-text and trigram matching on names, attribute filters and facets
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX ix_products_name_fts ON dev.products USING GIN (to_tsvector('simple', product_name));
+CREATE INDEX ix_products_name_trgm ON dev.products USING GIN (product_name gin_trgm_ops);
+CREATE INDEX ix_product_attributes_variant_id ON dev.product_attributes (variant_id);
+CREATE INDEX ix_product_attributes_name_value ON dev.product_attributes (LOWER(name), LOWER(value));
+
 ---	TRIGGERS
 
 -- Audit Trail Trigger for Products Table
@@ -378,11 +595,16 @@ CREATE OR REPLACE FUNCTION dev.audit_customer_changes()
 RETURNS TRIGGER AS $$
 BEGIN
 	IF TG_OP = 'UPDATE' THEN
+		-- Only fields that changed are logged; balance folds have no updated_by and are logged against the creator
 		INSERT INTO aud.audit_log(table_name,field_name, old_value, new_value, operation_type, changed_by,changed_date)
-		VALUES ('customers','name', OLD.name,NEW.name,'UPDATE',NEW.updated_by,NOW()),
-				('customers','mobile_number', OLD.role,NEW.role,'UPDATE',NEW.updated_by,NOW()),
-				('customers','email', OLD.role,NEW.role,'UPDATE',NEW.updated_by,NOW()),
-				('customers','credit_balance', OLD.role,NEW.role,'UPDATE',NEW.updated_by,NOW());	
+		SELECT 'customers', changes.field_name, changes.old_value, changes.new_value, 'UPDATE',
+				COALESCE(NEW.updated_by, NEW.created_by), NOW()
+		FROM (VALUES ('name', OLD.name, NEW.name),
+				('mobile_number', OLD.mobile_number, NEW.mobile_number),
+				('email', OLD.email, NEW.email),
+				('credit_balance', OLD.outstanding_balance::TEXT, NEW.outstanding_balance::TEXT)
+		) AS changes(field_name, old_value, new_value)
+		WHERE changes.old_value IS DISTINCT FROM changes.new_value;
 	ELSIF TG_OP = 'INSERT' THEN
 		INSERT INTO aud.audit_log(table_name, operation_type, changed_by,changed_date)
 		VALUES ('customers','INSERT',NEW.created_by,NOW());	
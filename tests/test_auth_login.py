@@ -0,0 +1,151 @@
+import threading
+import time
+import unittest
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from app.extensions import password_hasher
+from app.password_hasher import PasswordHasherBusy
+from app.models import Staff, LoginDetails
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class LoginTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client and an admin with login details"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.flush()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+        db.session.add(LoginDetails(staff_id=self.staff_id, username='admin', password=password_hasher.hash('secret')))
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database and the hashing processes after each test"""
+        password_hasher.shutdown()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, password):
+        return self.client.post(url_for('auth.login'), json={"username": 'admin', "password": password})
+
+    def metrics(self):
+        response = self.client.get(url_for('auth.get_login_metrics'), headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['data']
+
+    def stored_hash(self):
+        db.session.expire_all()
+        return LoginDetails.query.filter_by(username='admin').one().password
+
+    def test_login_is_timed(self):
+        """Test logins succeed or fail as before and land in the login latency histogram"""
+        self.assertEqual(self.login('wrong').status_code, 401)
+        response = self.login('secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', response.get_json())
+        self.assertEqual(LoginDetails.query.filter_by(username='admin').one().failed_attempts, 0)
+
+        latency = self.metrics()['login_latency']
+        self.assertEqual((latency['count'], latency['statuses']), (2, {"200": 1, "401": 1}))
+        self.assertEqual(latency['buckets'][-1], {"le": '+Inf', "count": 2})
+        self.assertIsNotNone(latency['p99_seconds'])
+
+    def test_outdated_hash_is_rehashed_on_login(self):
+        """Test a hash made with older parameters is replaced after a successful login only"""
+        LoginDetails.query.filter_by(username='admin').update(
+            {"password": generate_password_hash('secret', 'pbkdf2:sha256:500')}
+        )
+        db.session.commit()
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertTrue(self.stored_hash().startswith('pbkdf2:sha256:500$'))
+
+        self.assertEqual(self.login('secret').status_code, 200)
+        self.assertTrue(self.stored_hash().startswith('pbkdf2:sha256:1000$'))
+        self.assertFalse(password_hasher.needs_rehash(self.stored_hash()))
+        self.assertEqual(self.login('secret').status_code, 200)
+
+    def test_accounts_are_hashed_by_the_pool(self):
+        """Test hashes made in the worker processes check in the web process and the other way round"""
+        self.app.config.update(PASSWORD_HASH_WORKERS=1)
+        password_hasher.init_app(self.app)
+        self.assertEqual(self.login('secret').status_code, 200)
+        self.assertTrue(password_hasher.check(password_hasher.hash('other'), 'other'))
+        self.assertEqual(password_hasher.stats()['completed'], 3)
+
+    def test_signup_is_refused_when_hashing_is_saturated(self):
+        """Test creating an account with a password is answered with a 503 while the hasher is full"""
+        self.app.config.update(PASSWORD_HASH_MAX_PENDING=0)
+        password_hasher.init_app(self.app)
+        response = self.client.post(url_for('customer.register_customer'), json={
+            "name": 'Jane', "email": 'jane@example.com', "created_by": self.staff_id, "username": 'jane',
+            "password": 'secret'
+        })
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(password_hasher.stats()['rejected'], 1)
+
+    def test_timed_out_hash_keeps_its_slot(self):
+        """Test a hash the request stopped waiting for holds its pending slot until the pool is done with it"""
+        self.app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_TIMEOUT=0.05,
+                               PASSWORD_HASH_METHOD='pbkdf2:sha256:400000')
+        password_hasher.init_app(self.app)
+        with self.assertRaises(PasswordHasherBusy):
+            password_hasher.hash('secret')
+        with self.assertRaises(PasswordHasherBusy):
+            password_hasher.hash('secret')
+        self.assertEqual(password_hasher.stats()['rejected'], 1)
+
+        deadline = time.monotonic() + 30
+        while password_hasher.stats()['pending'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(password_hasher.stats()['pending'], 0)
+
+    # Performance Testing (Load Testing)
+    def test_login_burst_is_shed(self):
+        """Test a burst of logins past the queue limit is answered with 503s instead of queuing"""
+        self.app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=2,
+                               PASSWORD_HASH_METHOD='pbkdf2:sha256:400000')
+        password_hasher.init_app(self.app)
+        LoginDetails.query.filter_by(username='admin').update({"password": password_hasher.hash('secret')})
+        db.session.commit()
+
+        login_url = url_for('auth.login')
+        responses = []
+        start = threading.Barrier(8)
+
+        def login():
+            client = self.app.test_client()
+            start.wait()
+            responses.append(client.post(login_url, json={"username": 'admin', "password": 'secret'}))
+
+        threads = [threading.Thread(target=login) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        statuses = sorted(response.status_code for response in responses)
+        self.assertIn(200, statuses)
+        self.assertIn(503, statuses)
+        self.assertEqual(set(statuses), {200, 503})
+        self.assertTrue(all(response.headers['Retry-After'] == '1' for response in responses
+                            if response.status_code == 503))
+        metrics = self.metrics()
+        self.assertEqual(metrics['password_hasher']['rejected'], statuses.count(503))
+        self.assertEqual(metrics['password_hasher']['pending'], 0)
+        self.assertEqual(metrics['login_latency']['statuses'], {
+            str(status): statuses.count(status) for status in (200, 503)
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
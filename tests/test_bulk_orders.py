@@ -0,0 +1,148 @@
+import time
+import unittest
+from datetime import datetime
+from app import create_app, db
+from app.models import Staff, Category, Customer, Product, ProductVariants, Inventory, Order, OrderItem
+from app.services import OrderService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class BulkOrderTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, two customers and two stocked variants"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='staff', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'staff'})
+
+        customers = [Customer(name=name, email=f'{name}@example.com', created_by=self.staff_id)
+                     for name in ('jane', 'john')]
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all(customers + [category])
+        db.session.flush()
+        self.customer_ids = [customer.customer_id for customer in customers]
+        product = Product(product_name='Dinner Set', category_id=category.category_id, created_by=self.staff_id)
+        db.session.add(product)
+        db.session.flush()
+        self.variant_ids = []
+        for sku, quantity in (('DS-1', 5000), ('DS-2', 10)):
+            variant = ProductVariants(product_id=product.product_id, sku=sku, price=100, created_by=self.staff_id)
+            db.session.add(variant)
+            db.session.flush()
+            db.session.add(Inventory(variant_id=variant.variant_id, quantity=quantity, shop_stock=quantity,
+                                     created_by=self.staff_id))
+            self.variant_ids.append(variant.variant_id)
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def order(self, client_order_id, variant_id, quantity, customer_id=None, **fields):
+        return dict({
+            "client_order_id": client_order_id,
+            "customer_id": customer_id or self.customer_ids[0],
+            "order_total_amount": quantity * 100,
+            "items": [{"variant_id": variant_id, "quantity": quantity}]
+        }, **fields)
+
+    def submit(self, orders):
+        response = self.client.post(url_for('order.place_orders'), json={"orders": orders},
+                                    headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def stock(self, variant_id):
+        db.session.expire_all()
+        return Inventory.query.filter_by(variant_id=variant_id).one().quantity
+
+    def sample_batch(self):
+        first, second = self.variant_ids
+        return [
+            self.order('till-1', first, 2, order_date='2026-10-17T18:45:00'),
+            self.order('till-2', second, 6, customer_id=self.customer_ids[1]),
+            self.order('till-3', second, 6),
+            self.order('till-1', first, 2),
+            self.order('till-4', first, 1, customer_id=9999),
+            self.order('', first, 1)
+        ]
+
+    def test_bulk_submission(self):
+        """Test per-order results, with stock taken in submission order and repeats de-duplicated"""
+        batch = self.submit(self.sample_batch())
+        results = batch['data']
+        self.assertEqual([result['status'] for result in results],
+                         ['placed', 'placed', 'failed', 'duplicate', 'failed', 'failed'])
+        self.assertEqual(batch['summary'], {'placed': 2, 'duplicate': 1, 'failed': 3})
+        self.assertEqual(results[2]['error'],
+                         f'Insufficient inventory for Product Variant: {self.variant_ids[1]}. Available stock is 4')
+        self.assertEqual(results[3]['order_id'], results[0]['order_id'])
+        self.assertEqual(results[4]['error'], "Customer not found.")
+
+        self.assertEqual(self.stock(self.variant_ids[0]), 4998)
+        self.assertEqual(self.stock(self.variant_ids[1]), 4)
+        order = db.session.get(Order, results[0]['order_id'])
+        self.assertEqual(order.order_date, datetime(2026, 10, 17, 18, 45))
+        self.assertEqual(order.order_items.count(), 1)
+        self.assertEqual(float(db.session.get(Customer, self.customer_ids[1]).balance), 600)
+
+    def test_malformed_customer_ids(self):
+        """Test an order with a malformed customer_id fails on its own without failing its chunk"""
+        first = self.variant_ids[0]
+        results = self.submit([
+            self.order('till-1', first, 1, customer_id='12abc'),
+            self.order('till-2', first, 1, customer_id=[self.customer_ids[0]]),
+            self.order('till-3', first, 1)
+        ])['data']
+        self.assertEqual([(result['status'], result['error']) for result in results], [
+            ('failed', "customer_id must be a whole number."), ('failed', "customer_id must be a whole number."),
+            ('placed', None)
+        ])
+        self.assertEqual(self.stock(first), 4999)
+
+    def test_replayed_batch(self):
+        """Test replaying a batch, in smaller chunks, places nothing twice"""
+        first = self.submit(self.sample_batch())['data']
+        self.app.config['BULK_ORDER_CHUNK_SIZE'] = 2
+        replay = self.submit(self.sample_batch())['data']
+        self.assertEqual([result['status'] for result in replay],
+                         ['duplicate', 'duplicate', 'failed', 'duplicate', 'failed', 'failed'])
+        self.assertEqual([result['order_id'] for result in replay[:2]], [result['order_id'] for result in first[:2]])
+        self.assertEqual(Order.query.count(), 2)
+        self.assertEqual(self.stock(self.variant_ids[0]), 4998)
+
+    # Performance Testing (Throughput)
+    def test_bulk_throughput(self):
+        """Benchmark a reconnect backlog of 2,000 orders against placing orders one at a time"""
+        orders = [self.order(f'till-{index}', self.variant_ids[0], 1, customer_id=self.customer_ids[index % 2])
+                  for index in range(2000)]
+
+        start_time = time.perf_counter()
+        for order_data in orders[:100]:
+            _, error = OrderService.create_order(dict(order_data, created_by=self.staff_id))
+            self.assertIsNone(error)
+        one_at_a_time = (time.perf_counter() - start_time) / 100
+
+        start_time = time.perf_counter()
+        results, error = OrderService.create_orders(orders[100:], self.staff_id)
+        bulk = (time.perf_counter() - start_time) / 1900
+        self.assertIsNone(error)
+
+        self.assertTrue(all(result['status'] == 'placed' for result in results))
+        self.assertEqual(OrderItem.query.count(), 2000)
+        self.assertEqual(self.stock(self.variant_ids[0]), 3000)
+        self.assertLess(bulk, one_at_a_time / 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
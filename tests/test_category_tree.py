@@ -0,0 +1,163 @@
+import time
+import unittest
+from app import create_app, db
+from app.models import Staff, Product, CategoryClosure
+from app.services import CategoryService
+from app.category_tree import CategoryTree
+from flask import url_for
+
+
+class CategoryTreeTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client and a category hierarchy: women > shoes > (heels, boots), and men"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+
+        self.ids = {}
+        for name, parent in (('women', None), ('shoes', 'women'), ('heels', 'shoes'), ('boots', 'shoes'),
+                             ('men', None)):
+            category, _ = CategoryService.create_category(name, self.staff_id, self.ids.get(parent))
+            self.ids[name] = category.category_id
+        for name in ('women', 'heels', 'boots', 'men'):
+            db.session.add(Product(product_name=f'{name} product', category_id=self.ids[name], created_by=self.staff_id))
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_category_tree(self):
+        """Test the whole hierarchy is returned nested under the root categories"""
+        response = self.client.get(url_for('category.get_category_tree'))
+        self.assertEqual(response.status_code, 200)
+        roots = response.get_json()['data']
+        self.assertEqual([root['category_name'] for root in roots], ['women', 'men'])
+        shoes = roots[0]['children'][0]
+        self.assertEqual(shoes['category_name'], 'shoes')
+        self.assertEqual([child['category_name'] for child in shoes['children']], ['heels', 'boots'])
+
+    def test_category_subtree(self):
+        """Test a subtree is returned from its top category, and an unknown category is rejected"""
+        response = self.client.get(url_for('category.get_category_subtree', category_id=self.ids['shoes']))
+        self.assertEqual(response.status_code, 200)
+        subtree = response.get_json()['data']
+        self.assertEqual(subtree['parent_category_id'], self.ids['women'])
+        self.assertEqual(len(subtree['children']), 2)
+
+        response = self.client.get(url_for('category.get_category_subtree', category_id=9999))
+        self.assertEqual(response.status_code, 400)
+
+    def test_descendant_ids_match_database(self):
+        """Test the in-process tree and the closure table resolve the same descendants"""
+        tree = CategoryService.get_tree()
+        for category_id in self.ids.values():
+            self.assertEqual(sorted(tree.descendant_ids(category_id)),
+                             sorted(CategoryService.get_subtree_ids(category_id)))
+        self.assertEqual(sorted(tree.descendant_ids(self.ids['women'])),
+                         sorted([self.ids['women'], self.ids['shoes'], self.ids['heels'], self.ids['boots']]))
+
+    def test_tree_rebuilt_on_change(self):
+        """Test the tree reflects a new category once the category version changes"""
+        self.client.get(url_for('category.get_category_tree'))
+        CategoryService.create_category('sandals', self.staff_id, parent_category_id=self.ids['shoes'])
+        response = self.client.get(url_for('category.get_category_subtree', category_id=self.ids['shoes']))
+        self.assertEqual([child['category_name'] for child in response.get_json()['data']['children']],
+                         ['heels', 'boots', 'sandals'])
+
+    def test_products_in_subcategories(self):
+        """Test filtering the catalog by a category can include its descendant categories"""
+        response = self.client.get(url_for('product.get_products', category_id=self.ids['women']))
+        self.assertEqual([p['product_name'] for p in response.get_json()['data']], ['women product'])
+
+        response = self.client.get(url_for('product.get_products', category_id=self.ids['women'],
+                                           subcategories='true'))
+        self.assertEqual([p['product_name'] for p in response.get_json()['data']],
+                         ['women product', 'heels product', 'boots product'])
+
+
+    def closure_ids(self, category_id):
+        return sorted(CategoryService.get_subtree_ids(category_id))
+
+    def test_closure_matches_hierarchy(self):
+        """Test the closure table maintained on create agrees with the parent links"""
+        tree = CategoryService.get_tree()
+        for category_id in self.ids.values():
+            self.assertEqual(self.closure_ids(category_id), sorted(tree.descendant_ids(category_id)))
+        depth = db.session.get(CategoryClosure, (self.ids['women'], self.ids['heels'])).depth
+        self.assertEqual(depth, 2)
+
+    def test_reparent_category(self):
+        """Test moving a category moves its whole subtree in the closure table"""
+        category, error = CategoryService.update_category(self.ids['shoes'], parent_category_id=self.ids['men'])
+        self.assertIsNone(error)
+        self.assertEqual(self.closure_ids(self.ids['women']), [self.ids['women']])
+        self.assertEqual(self.closure_ids(self.ids['men']),
+                         sorted([self.ids['men'], self.ids['shoes'], self.ids['heels'], self.ids['boots']]))
+        self.assertEqual(db.session.get(CategoryClosure, (self.ids['men'], self.ids['boots'])).depth, 2)
+        tree = CategoryService.get_tree()
+        for category_id in self.ids.values():
+            self.assertEqual(self.closure_ids(category_id), sorted(tree.descendant_ids(category_id)))
+
+    def test_reparent_below_subcategory_rejected(self):
+        """Test a category cannot be moved below one of its own subcategories"""
+        category, error = CategoryService.update_category(self.ids['women'], parent_category_id=self.ids['heels'])
+        self.assertIsNone(category)
+        self.assertEqual(error, "A category cannot be moved below one of its subcategories.")
+
+    def test_category_products(self):
+        """Test listing the products of a category subtree through the closure table"""
+        response = self.client.get(url_for('category.get_category_products', category_id=self.ids['shoes']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['product_name'] for p in response.get_json()['data']], ['heels product', 'boots product'])
+
+        CategoryService.update_category(self.ids['shoes'], parent_category_id=self.ids['men'])
+        response = self.client.get(url_for('category.get_category_products', category_id=self.ids['men']))
+        self.assertEqual([p['product_name'] for p in response.get_json()['data']],
+                         ['heels product', 'boots product', 'men product'])
+
+    def test_rebuild_closure_command(self):
+        """Test the closure table can be recomputed from the parent links"""
+        db.session.query(CategoryClosure).delete()
+        db.session.commit()
+        result = self.app.test_cli_runner().invoke(args=['rebuild-category-closure'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Wrote 10 category closure rows.', result.output)
+        self.assertEqual(self.closure_ids(self.ids['shoes']),
+                         sorted([self.ids['shoes'], self.ids['heels'], self.ids['boots']]))
+
+
+class CategoryTreePerformanceTestCase(unittest.TestCase):
+    CATEGORIES = 50000
+
+    @classmethod
+    def setUpClass(cls):
+        # Ten children per category
+        cls.tree = CategoryTree(
+            (category_id, f'category {category_id}', (category_id - 1) // 10 if category_id else None)
+            for category_id in range(cls.CATEGORIES)
+        )
+
+    # Performance Testing (Response Time)
+    def test_subtree_time_proportional_to_subtree(self):
+        # A subtree of 111 categories is read without walking the other 49,889
+        start_time = time.perf_counter()
+        subtree = self.tree.subtree(123)
+        descendants = self.tree.descendant_ids(123)
+        elapsed = time.perf_counter() - start_time
+        self.assertEqual(len(subtree['children']), 10)
+        self.assertEqual(len(descendants), 111)
+        self.assertLess(elapsed, 0.005)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import threading
+import time
+import unittest
+from app import create_app, db
+from app.extensions import folder
+from app.models import Staff, Category, Customer, Product, ProductVariants, Inventory, CustomerLedger
+from app.services import OrderService, CustomerLedgerService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class CustomerLedgerTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, a customer and a stocked variant"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='staff', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'staff'})
+
+        customer = Customer(name='Jane', email='jane@example.com', created_by=self.staff_id)
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all([customer, category])
+        db.session.flush()
+        self.customer_id = customer.customer_id
+        product = Product(product_name='Dinner Set', category_id=category.category_id, created_by=self.staff_id)
+        db.session.add(product)
+        db.session.flush()
+        variant = ProductVariants(product_id=product.product_id, sku='DS-1', price=100, created_by=self.staff_id)
+        db.session.add(variant)
+        db.session.flush()
+        self.variant_id = variant.variant_id
+        db.session.add(Inventory(variant_id=variant.variant_id, quantity=1000, shop_stock=1000,
+                                 created_by=self.staff_id))
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def place_order(self, quantity):
+        _, error = OrderService.create_order({
+            "customer_id": self.customer_id, "created_by": self.staff_id, "order_total_amount": quantity * 100,
+            "items": [{"variant_id": self.variant_id, "quantity": quantity}]
+        })
+        self.assertIsNone(error)
+
+    def balances(self):
+        db.session.expire_all()
+        customer = db.session.get(Customer, self.customer_id)
+        return float(customer.outstanding_balance), float(customer.balance)
+
+    def test_orders_and_payments(self):
+        """Test orders and payments are reflected in the customer's balance before and after folding"""
+        self.place_order(3)
+        self.place_order(2)
+        response = self.client.post(url_for('customer.record_payment', customer_id=self.customer_id),
+                                    json={"amount": 150}, headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['data']['outstanding_balance'], 350)
+        self.assertEqual(self.balances(), (0, 350))
+
+        response = self.client.get(url_for('customer.get_customer', customer_id=self.customer_id),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.get_json()['data']['outstanding_balance'], 350)
+        response = self.client.get(url_for('customer.get_customers'),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.get_json()['data'][0]['outstanding_balance'], 350)
+
+        self.assertEqual(CustomerLedgerService.fold_balances(), (1, None))
+        self.assertEqual(self.balances(), (350, 350))
+        self.assertEqual(CustomerLedger.query.filter_by(folded=False).count(), 0)
+        self.assertEqual(CustomerLedgerService.fold_balances(), (0, None))
+        self.assertEqual(self.balances(), (350, 350))
+
+    def test_balances_are_folded_by_the_app(self):
+        """Test the folder thread folds new ledger entries into the balances every FOLD_INTERVAL"""
+        self.place_order(3)
+        self.place_order(2)
+        self.app.config.update(FOLD_INTERVAL=0.05)
+        folder.init_app(self.app)
+        try:
+            deadline = time.monotonic() + 10
+            while CustomerLedger.query.filter_by(folded=False).count() and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            folder.stop()
+        self.assertEqual(CustomerLedger.query.filter_by(folded=False).count(), 0)
+        self.assertEqual(self.balances(), (500, 500))
+
+    def test_invalid_payment(self):
+        """Test payments that are not positive, exceed the balance or name an unknown customer are rejected"""
+        self.place_order(1)
+        self.assertEqual(CustomerLedgerService.record_payment(self.customer_id, 'ten', self.staff_id),
+                         (None, "Amount must be a number."))
+        self.assertEqual(CustomerLedgerService.record_payment(self.customer_id, -5, self.staff_id),
+                         (None, "Amount must be a positive number."))
+        self.assertEqual(CustomerLedgerService.record_payment(9999, 5, self.staff_id),
+                         (None, "Customer not found."))
+        self.assertEqual(CustomerLedgerService.record_payment(self.customer_id, 101, self.staff_id),
+                         (None, "Payment exceeds the outstanding balance of 100.00."))
+        self.assertEqual(self.balances(), (0, 100))
+
+    def test_concurrent_payments_never_overpay(self):
+        """Test concurrent payments for one customer together never take more than the outstanding balance"""
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('Concurrent transactions require Postgres')
+        self.place_order(1)
+        db.session.remove()
+        results = []
+        start = threading.Barrier(10)
+
+        def pay():
+            with self.app.app_context():
+                start.wait()
+                results.append(CustomerLedgerService.record_payment(self.customer_id, 30, self.staff_id))
+
+        threads = [threading.Thread(target=pay) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(float(balance) for balance, error in results if error is None), [10, 40, 70])
+        self.assertEqual(self.balances(), (0, 10))
+
+    # Performance Testing (Concurrency)
+    def test_concurrent_orders_for_one_customer(self):
+        """Place orders for one customer from several threads while balances are folded, and check none is lost"""
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('Concurrent transactions require Postgres')
+        db.session.remove()
+        errors = []
+        done = threading.Event()
+
+        def place_orders():
+            with self.app.app_context():
+                for _ in range(25):
+                    _, error = OrderService.create_order({
+                        "customer_id": self.customer_id, "created_by": self.staff_id, "order_total_amount": 100,
+                        "items": [{"variant_id": self.variant_id, "quantity": 1}]
+                    })
+                    if error:
+                        errors.append(error)
+
+        def fold():
+            with self.app.app_context():
+                while not done.is_set():
+                    _, error = CustomerLedgerService.fold_balances()
+                    if error:
+                        errors.append(error)
+                    time.sleep(0.01)
+
+        threads = [threading.Thread(target=place_orders) for _ in range(8)]
+        folder = threading.Thread(target=fold)
+        start_time = time.perf_counter()
+        folder.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+        done.set()
+        folder.join()
+
+        self.assertEqual(errors, [])
+        self.assertLess(elapsed, 20)
+        self.assertEqual(self.balances()[1], 20000)
+        CustomerLedgerService.fold_balances()
+        self.assertEqual(self.balances(), (20000, 20000))
+
+
+if __name__ == '__main__':
+    unittest.main()
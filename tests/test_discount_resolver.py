@@ -0,0 +1,199 @@
+import time
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from app import create_app, db
+from app.models import Staff, Category, Product, ProductVariants
+from app.services import DiscountService
+from app.extensions import catalog_cache
+from app.discount_index import DiscountIndex, IndexedDiscount
+from flask import url_for
+
+TODAY = date.today()
+
+
+def days(offset):
+    return TODAY + timedelta(days=offset)
+
+
+class DiscountIndexTestCase(unittest.TestCase):
+    def test_overlapping_discounts(self):
+        """Test the latest started discount wins while it runs, and the earlier one resumes after it expires"""
+        index = DiscountIndex([
+            IndexedDiscount(1, 10, 100, Decimal('10'), 0, days(-10), days(10)),
+            IndexedDiscount(2, 10, 100, Decimal('25'), 0, days(-2), days(2)),
+        ])
+        resolve = lambda on: index.resolve([(100, 10)], on)[100]
+        self.assertIsNone(resolve(days(-11)))
+        self.assertEqual(resolve(days(-3)).discount_id, 1)
+        self.assertEqual(resolve(days(-2)).discount_id, 2)
+        self.assertEqual(resolve(days(2)).discount_id, 2)
+        self.assertEqual(resolve(days(3)).discount_id, 1)
+        self.assertIsNone(resolve(days(11)))
+
+    def test_product_wide_discount(self):
+        """Test a variant falls back to its product's discount when it has none of its own"""
+        index = DiscountIndex([
+            IndexedDiscount(1, 10, None, Decimal('5'), 0, days(-1), None),
+            IndexedDiscount(2, 10, 100, Decimal('20'), 0, days(-1), days(1)),
+        ])
+        resolved = index.resolve([(100, 10), (101, 10), (200, 20)])
+        self.assertEqual(resolved[100].discount_id, 2)
+        self.assertEqual(resolved[101].discount_id, 1)
+        self.assertIsNone(resolved[200])
+        self.assertEqual(index.resolve([(100, 10)], days(400))[100].discount_id, 1)
+
+    def test_upsert_and_remove(self):
+        """Test changing a discount only needs its own variant recomputed"""
+        index = DiscountIndex([IndexedDiscount(1, 10, 100, Decimal('10'), 0, days(-1), days(1))])
+        index.upsert(IndexedDiscount(1, 10, 101, Decimal('10'), 0, days(-1), days(1)))
+        self.assertIsNone(index.resolve([(100, 10)])[100])
+        self.assertEqual(index.resolve([(101, 10)])[101].discount_id, 1)
+        index.remove(1)
+        self.assertIsNone(index.resolve([(101, 10)])[101])
+        self.assertEqual(index.timelines, {})
+
+
+class DiscountResolverTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client and a product with two variants"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add(category)
+        db.session.flush()
+        product = Product(product_name='Dinner Set', category_id=category.category_id, created_by=self.staff_id)
+        db.session.add(product)
+        db.session.flush()
+        self.product_id = product.product_id
+        self.variant_ids = []
+        for sku in ('DS-1', 'DS-2'):
+            variant = ProductVariants(product_id=product.product_id, sku=sku, price=1000, created_by=self.staff_id)
+            db.session.add(variant)
+            db.session.flush()
+            self.variant_ids.append(variant.variant_id)
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_discount(self, variant_id, start_date, expiry_date, rate=10):
+        discount, error = DiscountService.create_discount({
+            "discount_name": "Promo",
+            "product_id": self.product_id,
+            "variant_id": variant_id,
+            "discount_rate": rate,
+            "start_date": start_date.isoformat(),
+            "expiry_date": expiry_date.isoformat(),
+            "created_by": self.staff_id
+        })
+        self.assertIsNone(error)
+        return discount.discount_id
+
+    def resolve(self, **data):
+        response = self.client.post(url_for('discounts.resolve_discounts'), json=data)
+        self.assertEqual(response.status_code, 200)
+        return {item['variant_id']: item['discount'] for item in response.get_json()['data']}
+
+    def test_resolve_endpoint(self):
+        """Test resolving the discount in effect for variants today and on a given date"""
+        product_wide = self.create_discount(None, days(-5), days(30), rate=5)
+        own = self.create_discount(self.variant_ids[0], days(-1), days(1), rate=20)
+
+        resolved = self.resolve(variant_ids=self.variant_ids)
+        self.assertEqual(resolved[self.variant_ids[0]]['discount_id'], own)
+        self.assertEqual(resolved[self.variant_ids[0]]['discount_rate'], 20.0)
+        self.assertEqual(resolved[self.variant_ids[1]]['discount_id'], product_wide)
+
+        resolved = self.resolve(variant_ids=self.variant_ids, date=days(40).isoformat())
+        self.assertEqual(resolved, {self.variant_ids[0]: None, self.variant_ids[1]: None})
+
+    def test_index_patched_on_update(self):
+        """Test a discount update is applied to the index in place rather than rebuilding it"""
+        discount_id = self.create_discount(self.variant_ids[0], days(-1), days(1))
+        index = DiscountService.get_index()
+
+        _, error = DiscountService.update_discount(discount_id, {"variant_id": self.variant_ids[1]})
+        self.assertIsNone(error)
+        self.assertIs(DiscountService.get_index(), index)
+        resolved = self.resolve(variant_ids=self.variant_ids)
+        self.assertIsNone(resolved[self.variant_ids[0]])
+        self.assertEqual(resolved[self.variant_ids[1]]['discount_id'], discount_id)
+
+    def test_index_patched_after_other_writes(self):
+        """Test stock and product writes in between do not stop a discount update from patching the index"""
+        discount_id = self.create_discount(self.variant_ids[0], days(-1), days(1))
+        index = DiscountService.get_index()
+        catalog_cache.bump_version(catalog_cache.CATALOG, catalog_cache.STOCK)
+
+        _, error = DiscountService.update_discount(discount_id, {"variant_id": self.variant_ids[1]})
+        self.assertIsNone(error)
+        self.assertIs(DiscountService.get_index(), index)
+
+    def test_invalid_discounts_rejected(self):
+        """Test discounts with a reversed period or a variant of another product are rejected"""
+        _, error = DiscountService.create_discount({
+            "discount_name": "Promo", "product_id": self.product_id, "variant_id": self.variant_ids[0],
+            "discount_rate": 10, "start_date": days(1).isoformat(), "expiry_date": days(-1).isoformat(),
+            "created_by": self.staff_id
+        })
+        self.assertEqual(error, "The expiry date cannot be before the start date.")
+        _, error = DiscountService.create_discount({
+            "discount_name": "Promo", "product_id": self.product_id + 1, "variant_id": self.variant_ids[0],
+            "discount_rate": 10, "start_date": days(0).isoformat(), "created_by": self.staff_id
+        })
+        self.assertEqual(error, "The variant does not belong to the product.")
+
+    def test_catalog_shows_active_discounts(self):
+        """Test the catalog lists only discounts in effect, including product-wide ones"""
+        self.create_discount(self.variant_ids[0], days(-10), days(-1))
+        active = self.create_discount(self.variant_ids[0], days(-1), days(1))
+        product_wide = self.create_discount(None, days(-1), days(1))
+
+        for response in (self.client.get(url_for('product.get_products')),
+                         self.client.get(url_for('product.get_product', product_id=self.product_id))):
+            data = response.get_json()['data']
+            product = data[0] if isinstance(data, list) else data
+            discounts = {variant['variant_id']: [d['discount_id'] for d in variant['discounts']]
+                         for variant in product['variants']}
+            self.assertEqual(discounts, {self.variant_ids[0]: [active, product_wide],
+                                         self.variant_ids[1]: [product_wide]})
+
+
+class DiscountIndexPerformanceTestCase(unittest.TestCase):
+    VARIANTS = 20000
+    DISCOUNTS_PER_VARIANT = 10
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index = DiscountIndex(
+            IndexedDiscount(variant_id * cls.DISCOUNTS_PER_VARIANT + number, variant_id // 4, variant_id,
+                            Decimal('10'), 0, days(number * 7 - 35), days(number * 7 - 21))
+            for variant_id in range(cls.VARIANTS)
+            for number in range(cls.DISCOUNTS_PER_VARIANT)
+        )
+
+    # Performance Testing (Response Time)
+    def test_resolve_time(self):
+        variants = [(variant_id, variant_id // 4) for variant_id in range(0, self.VARIANTS, 4)]
+        start_time = time.perf_counter()
+        resolved = self.index.resolve(variants)
+        elapsed = time.perf_counter() - start_time
+        self.assertEqual(len(resolved), len(variants))
+        self.assertTrue(all(discount is not None for discount in resolved.values()))
+        self.assertLess(elapsed, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
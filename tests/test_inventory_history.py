@@ -0,0 +1,155 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+from app import create_app, db
+from app.models import Staff, Category, Customer, Product, ProductVariants, Inventory, InventoryHistory
+from app.services import OrderService, ProductService, InventoryHistoryService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class InventoryHistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, a customer and a product with one variant"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+
+        customer = Customer(name='Jane', email='jane@example.com', created_by=self.staff_id)
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all([customer, category])
+        db.session.flush()
+        self.customer_id = customer.customer_id
+        category_id = category.category_id
+        db.session.commit()
+
+        product, error = ProductService.add_product({
+            "product_name": 'Dinner Set', "category_id": category_id, "created_by": self.staff_id,
+            "variants": [{"sku": 'DS-1', "price": 100,
+                          "inventory": {"quantity": 20, "warehouse_stock": 50, "shop_stock": 20}}]
+        })
+        self.assertIsNone(error)
+        self.variant_id = product.variants[0].variant_id
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def now(self):
+        """Current time on the database clock, which dates the journal"""
+        return db.session.execute(text('SELECT clock_timestamp()::timestamp')).scalar()
+
+    def place_order(self, quantity):
+        return OrderService.create_order({
+            "customer_id": self.customer_id, "created_by": self.staff_id, "order_total_amount": quantity * 100,
+            "items": [{"variant_id": self.variant_id, "quantity": quantity}]
+        })
+
+    def stock_at(self, at):
+        response = self.client.get(url_for('product.get_stock_at', at=at.isoformat(), variant_id=self.variant_id),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        return [(row['quantity'], row['warehouse_stock'], row['shop_stock']) for row in response.get_json()['data']]
+
+    def test_every_stock_change_is_journaled(self):
+        """Test new stock, sales, adjustments and bulk sales each add a journal entry chained to the last one"""
+        self.assertIsNone(self.place_order(3)[1])
+        self.assertIsNotNone(self.place_order(50)[1])
+        results, error = ProductService.bulk_update_variants(
+            [{"variant_id": self.variant_id, "quantity": 40, "shop_stock": 30}], self.staff_id
+        )
+        self.assertIsNone(error)
+        results, error = OrderService.create_orders([
+            {"client_order_id": f'till-{index}', "customer_id": self.customer_id, "order_total_amount": 100,
+             "items": [{"variant_id": self.variant_id, "quantity": 1}]} for index in range(2)
+        ], self.staff_id)
+        self.assertIsNone(error)
+
+        response = self.client.get(url_for('product.get_inventory_history', variant_id=self.variant_id),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        history = response.get_json()['data']
+        self.assertEqual([(entry['change_reason'], entry['quantity_after'], entry['warehouse_stock_after'],
+                           entry['shop_stock_after']) for entry in history],
+                         [('new_stock', 20, 50, 20), ('sale', 17, 50, 17), ('adjustment', 40, 50, 30),
+                          ('sale', 39, 50, 29), ('sale', 38, 50, 28)])
+        for previous, entry in zip(history, history[1:]):
+            self.assertEqual((entry['quantity_before'], entry['shop_stock_before']),
+                             (previous['quantity_after'], previous['shop_stock_after']))
+        inventory = Inventory.query.filter_by(variant_id=self.variant_id).one()
+        self.assertEqual((inventory.quantity, inventory.shop_stock), (38, 28))
+
+    def test_stock_at_point_in_time(self):
+        """Test stock levels rebuilt from the journal match the levels at each point in time"""
+        before_sales = self.now()
+        self.place_order(5)
+        after_first_sale = self.now()
+        self.place_order(4)
+        self.assertEqual(self.stock_at(before_sales), [(20, 50, 20)])
+        self.assertEqual(self.stock_at(after_first_sale), [(15, 50, 15)])
+        self.assertEqual(self.stock_at(self.now()), [(11, 50, 11)])
+        self.assertEqual(self.stock_at(before_sales - timedelta(days=1)), [])
+
+        # A variant stocked before the journal existed is rebuilt from its first change
+        db.session.execute(insert(InventoryHistory).values(
+            variant_id=self.variant_id, quantity_before=11, quantity_after=9, warehouse_stock_before=50,
+            warehouse_stock_after=50, shop_stock_before=11, shop_stock_after=9, change_reason='sale',
+            change_date=datetime.now() + timedelta(days=1), staff_id=self.staff_id
+        ))
+        db.session.execute(text('DELETE FROM dev.inventory_history WHERE change_date < :date'),
+                           {"date": after_first_sale + timedelta(hours=1)})
+        db.session.commit()
+        self.assertEqual(self.stock_at(before_sales), [(11, 50, 11)])
+
+    def test_invalid_stock_query(self):
+        """Test malformed points in time are rejected"""
+        self.assertEqual(InventoryHistoryService.get_stock_at('yesterday'),
+                         (None, "at must be an ISO 8601 date and time."))
+
+    # Performance Testing (Response Time)
+    def test_stock_at_time(self):
+        """Benchmark rebuilding the stock of 200 variants from a journal of 100,000 changes"""
+        product = db.session.get(ProductVariants, self.variant_id).product
+        variants = [ProductVariants(product_id=product.product_id, sku=f'SKU-{index}', price=10,
+                                    created_by=self.staff_id) for index in range(199)]
+        db.session.add_all(variants)
+        db.session.flush()
+        variant_ids = [self.variant_id] + [variant.variant_id for variant in variants]
+        db.session.execute(insert(Inventory), [
+            {"variant_id": variant_id, "quantity": 0, "shop_stock": 0, "created_by": self.staff_id,
+             "created_date": datetime(2025, 1, 1)} for variant_id in variant_ids[1:]
+        ])
+        start = datetime(2025, 1, 1)
+        db.session.execute(insert(InventoryHistory), [
+            {"variant_id": variant_id, "quantity_before": index, "quantity_after": index + 1,
+             "warehouse_stock_before": 0, "warehouse_stock_after": 0, "shop_stock_before": index,
+             "shop_stock_after": index + 1, "change_reason": 'adjustment',
+             "change_date": start + timedelta(minutes=index), "staff_id": self.staff_id}
+            for variant_id in variant_ids for index in range(500)
+        ])
+        db.session.commit()
+        db.session.execute(text('ANALYZE dev.inventory_history'))
+
+        start_time = time.perf_counter()
+        stock, error = InventoryHistoryService.get_stock_at((start + timedelta(minutes=249, seconds=30)).isoformat())
+        elapsed = time.perf_counter() - start_time
+
+        self.assertIsNone(error)
+        self.assertEqual(len(stock), 199)
+        self.assertTrue(all(row['quantity'] == 250 for row in stock))
+        self.assertLess(elapsed, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,294 @@
+import time
+import unittest
+from app import create_app, db
+from app.models import Staff, Category, Customer, Inventory, LocationStock, ProductVariants, StockAlert
+from app.services import (OrderService, ProductService, LocationService, InventoryHistoryService,
+                          ReservationService)
+from flask import url_for
+from sqlalchemy import text
+from flask_jwt_extended import create_access_token
+
+
+class LocationTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, a warehouse, two shops and a product with one variant"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+
+        customer = Customer(name='Jane', email='jane@example.com', created_by=self.staff_id)
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all([customer, category])
+        db.session.flush()
+        self.customer_id = customer.customer_id
+        self.category_id = category.category_id
+        db.session.commit()
+
+        product, error = ProductService.add_product({
+            "product_name": 'Dinner Set', "category_id": self.category_id, "created_by": self.staff_id,
+            "variants": [{"sku": 'DS-1', "price": 100, "inventory": {"quantity": 20, "shop_stock": 20}}]
+        })
+        self.assertIsNone(error)
+        self.product_id = product.product_id
+        self.variant_id = product.variants[0].variant_id
+
+        self.warehouse_id, self.shop_id, self.other_shop_id = [
+            self.post('product.create_location', {"location_name": name, "location_type": location_type},
+                      201)['data']['location_id']
+            for name, location_type in (('Central', 'warehouse'), ('High Street', 'shop'), ('Market', 'shop'))
+        ]
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, endpoint, data, status_code=200):
+        response = self.client.post(url_for(endpoint), json=data, headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, status_code)
+        return response.get_json()
+
+    def inventory(self):
+        db.session.expire_all()
+        inventory = Inventory.query.filter_by(variant_id=self.variant_id).one()
+        return inventory.quantity, inventory.warehouse_total, inventory.shop_stock
+
+    def availability(self):
+        response = self.client.get(url_for('product.get_availability', variant_id=self.variant_id),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['data']
+
+    def test_transfers_move_stock_between_locations(self):
+        """Test receipts and moves in one batch are applied together and show in the availability"""
+        self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "to_location_id": self.warehouse_id, "quantity": 100},
+            {"variant_id": self.variant_id, "from_location_id": self.warehouse_id, "to_location_id": self.shop_id,
+             "quantity": 30},
+            {"variant_id": self.variant_id, "from_location_id": self.warehouse_id,
+             "to_location_id": self.other_shop_id, "quantity": 20}
+        ]})
+        data = self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "from_location_id": self.shop_id, "to_location_id": self.other_shop_id,
+             "quantity": 5},
+            {"variant_id": self.variant_id, "from_location_id": self.other_shop_id, "quantity": 2}
+        ]})['data']
+        self.assertEqual([(row['location_id'], row['quantity']) for row in data],
+                         [(self.shop_id, 45), (self.other_shop_id, 23)])
+
+        # Stock reaching or leaving the shops changes the stock for sale, moves between shops only its breakdown
+        self.assertEqual(self.availability(), [{
+            "variant_id": self.variant_id, "on_hand": 118, "warehouse": 50, "shop": 68, "available_for_sale": 68,
+            "locations": [
+                {"location_id": self.warehouse_id, "location_name": 'Central', "location_type": 'warehouse',
+                 "quantity": 50},
+                {"location_id": self.shop_id, "location_name": 'High Street', "location_type": 'shop', "quantity": 45},
+                {"location_id": self.other_shop_id, "location_name": 'Market', "location_type": 'shop',
+                 "quantity": 23}
+            ]
+        }])
+        self.assertEqual(self.inventory(), (68, 50, 68))
+        history, _ = InventoryHistoryService.get_history(self.variant_id)
+        self.assertEqual([(entry['change_reason'], entry['quantity_after'], entry['warehouse_stock_after'],
+                           entry['shop_stock_after']) for entry in history][-2:],
+                         [('transfer', 70, 50, 70), ('transfer', 68, 50, 68)])
+
+    def test_short_transfer_moves_nothing(self):
+        """Test a batch leaving any location short is rejected whole"""
+        LocationService.transfer([{"variant_id": self.variant_id, "to_location_id": self.shop_id, "quantity": 10}],
+                                 self.staff_id)
+        error = self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "to_location_id": self.warehouse_id, "quantity": 50},
+            {"variant_id": self.variant_id, "from_location_id": self.shop_id, "to_location_id": self.other_shop_id,
+             "quantity": 31}
+        ]}, 400)['error']
+        self.assertEqual(error, f"Insufficient stock of Product Variant: {self.variant_id} at Location: "
+                                f"{self.shop_id}. Available stock is 30")
+        self.assertEqual([(row['location_id'], row['quantity']) for row in self.availability()[0]['locations']],
+                         [(self.shop_id, 30)])
+        self.assertEqual(self.inventory(), (30, 0, 30))
+
+    def test_invalid_transfers(self):
+        """Test malformed transfers and unknown variants or locations are rejected"""
+        transfer = {"variant_id": self.variant_id, "to_location_id": self.shop_id, "quantity": 1}
+        self.assertEqual(LocationService.transfer([], self.staff_id), (None, "Provide a list of transfers."))
+        self.assertEqual(LocationService.transfer([dict(transfer, quantity=0)], self.staff_id),
+                         (None, "Each transfer needs a variant_id and a positive whole quantity."))
+        self.assertEqual(LocationService.transfer([dict(transfer, to_location_id=None)], self.staff_id),
+                         (None, "Each transfer needs a different from_location_id and to_location_id."))
+        self.assertEqual(LocationService.transfer([dict(transfer, to_location_id=999)], self.staff_id),
+                         (None, "Location for ID: 999 not found."))
+        self.assertEqual(LocationService.transfer([dict(transfer, variant_id=999)], self.staff_id),
+                         (None, "Product variant for ID: 999 not found."))
+        self.assertEqual(LocationService.add_location({"location_name": 'Central', "location_type": 'shop',
+                                                       "created_by": self.staff_id}),
+                         (None, "Location Central already exists."))
+
+    def test_sales_take_stock_from_the_shops(self):
+        """Test sales take their stock from the shops and stock held for baskets or sold cannot leave"""
+        self.assertEqual(self.availability()[0]['locations'], [
+            {"location_id": self.shop_id, "location_name": 'High Street', "location_type": 'shop', "quantity": 20}
+        ])
+        self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "from_location_id": self.shop_id, "to_location_id": self.other_shop_id,
+             "quantity": 2}
+        ]})
+        _, error = OrderService.create_order({
+            "customer_id": self.customer_id, "created_by": self.staff_id, "order_total_amount": 2000,
+            "items": [{"variant_id": self.variant_id, "quantity": 19}]
+        })
+        self.assertIsNone(error)
+        self.assertEqual([(row['location_id'], row['quantity']) for row in self.availability()[0]['locations']],
+                         [(self.shop_id, 0), (self.other_shop_id, 1)])
+        self.assertEqual(self.inventory(), (1, 0, 1))
+
+        self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "to_location_id": self.shop_id, "quantity": 5}
+        ]})
+        _, error = ReservationService.reserve({"customer_id": self.customer_id, "created_by": self.staff_id,
+                                              "items": [{"variant_id": self.variant_id, "quantity": 4}]})
+        self.assertIsNone(error)
+        error = self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "from_location_id": self.shop_id, "quantity": 3}
+        ]}, 400)['error']
+        self.assertEqual(error, f"Insufficient inventory for Product Variant: {self.variant_id}. Available stock is 2")
+        self.assertEqual(self.inventory(), (6, 0, 6))
+
+    def test_sales_cannot_leave_the_shops_short(self):
+        """Test an order the shops cannot cover is refused whole, on its own or in a batch"""
+        LocationStock.query.filter_by(variant_id=self.variant_id, location_id=self.shop_id).update({"quantity": 2})
+        db.session.commit()
+        order = {"customer_id": self.customer_id, "created_by": self.staff_id, "order_total_amount": 500,
+                 "items": [{"variant_id": self.variant_id, "quantity": 5}]}
+        _, error = OrderService.create_order(order)
+        self.assertEqual(error, f"Insufficient inventory for Product Variant: {self.variant_id}. Available stock is 2")
+        results, error = OrderService.create_orders([dict(order, client_order_id='till-1')], self.staff_id)
+        self.assertIsNone(error)
+        self.assertEqual((results[0]['status'], results[0]['error']), (
+            OrderService.FAILED, f"Insufficient inventory for Product Variant: {self.variant_id}. Available stock is 2"
+        ))
+        self.assertEqual(self.inventory(), (20, 0, 20))
+        self.assertEqual(self.availability()[0]['shop'], 2)
+
+    def test_stock_kept_per_location_is_not_edited_directly(self):
+        """Test stock edits that would take the inventory out of step with the locations are refused"""
+        self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "to_location_id": self.warehouse_id, "quantity": 40}
+        ]})
+        results, error = ProductService.bulk_update_variants([
+            {"variant_id": self.variant_id, "shop_stock": 25, "reorder_level": 5}
+        ], self.staff_id)
+        self.assertIsNone(error)
+        self.assertEqual((results[0]['status'], results[0]['error']),
+                         ('invalid', "shop_stock is kept per location, change it with a stock transfer."))
+        _, error = ProductService.update_product(self.product_id, {
+            "updated_by": self.staff_id,
+            "variants": [{"variant_id": self.variant_id, "inventory": {"warehouse_stock": 0, "shop_stock": 20}}]
+        })
+        self.assertEqual(error, "warehouse_stock is kept per location, change it with a stock transfer.")
+        _, error = ProductService.add_product({
+            "product_name": 'Tea Set', "category_id": self.category_id, "created_by": self.staff_id,
+            "variants": [{"sku": 'TS-1', "price": 50, "inventory": {"quantity": 5, "shop_stock": 5}}]
+        })
+        self.assertEqual(error, "shop_stock is kept per location, change it with a stock transfer.")
+
+        # Levels sent back as they are and the other levels can still be edited
+        results, error = ProductService.bulk_update_variants([
+            {"variant_id": self.variant_id, "warehouse_stock": 40, "shop_stock": 20, "reorder_level": 5}
+        ], self.staff_id)
+        self.assertEqual(results[0]['status'], 'updated')
+        db.session.commit()
+        _, error = ProductService.update_product(self.product_id, {
+            "updated_by": self.staff_id,
+            "variants": [{"variant_id": self.variant_id,
+                          "inventory": {"quantity": 18, "warehouse_stock": 40, "shop_stock": 20}}]
+        })
+        self.assertIsNone(error)
+        self.assertEqual(self.inventory(), (18, 40, 20))
+        self.assertEqual(self.availability()[0]['shop'], 20)
+
+    def test_transfers_raise_stock_alerts(self):
+        """Test stock leaving below the reorder level and coming back raises and clears an alert"""
+        ProductService.bulk_update_variants([{"variant_id": self.variant_id, "reorder_level": 15}], self.staff_id)
+        self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "from_location_id": self.shop_id, "quantity": 10}
+        ]})
+        self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "to_location_id": self.warehouse_id, "quantity": 10}
+        ]})
+        self.post('product.transfer_stock', {"transfers": [
+            {"variant_id": self.variant_id, "from_location_id": self.warehouse_id, "to_location_id": self.shop_id,
+             "quantity": 10}
+        ]})
+        self.assertEqual([(alert.alert_type, alert.quantity) for alert in
+                          StockAlert.query.order_by(StockAlert.alert_id)], [('low_stock', 10), ('restocked', 20)])
+
+    def test_receiving_does_not_wait_for_sales(self):
+        """Test stock received at the warehouse while a sale holds the variant's inventory row"""
+        with db.engine.connect() as connection:
+            # A sale in progress at a shop
+            connection.execute(text('UPDATE dev.inventory SET quantity = quantity - 1, shop_stock = shop_stock - 1 '
+                                    'WHERE variant_id = :variant_id'), {"variant_id": self.variant_id})
+            db.session.execute(text("SET LOCAL lock_timeout = '1s'"))
+            stock, error = LocationService.transfer(
+                [{"variant_id": self.variant_id, "to_location_id": self.warehouse_id, "quantity": 40}], self.staff_id
+            )
+            connection.commit()
+
+        self.assertIsNone(error)
+        self.assertEqual(stock, [{"variant_id": self.variant_id, "location_id": self.warehouse_id, "quantity": 40}])
+        _, error = OrderService.create_order({
+            "customer_id": self.customer_id, "created_by": self.staff_id, "order_total_amount": 100,
+            "items": [{"variant_id": self.variant_id, "quantity": 1}]
+        })
+        self.assertIsNone(error)
+        self.assertEqual(self.availability()[0]['available_for_sale'], 18)
+        self.assertEqual(self.inventory(), (18, 40, 18))
+
+    # Performance Testing (Response Time)
+    def test_transfer_time(self):
+        """Benchmark a batch of 5,000 transfers across 1,000 variants"""
+        variants = [ProductVariants(product_id=self.product_id, sku=f'SKU-{index}', price=10,
+                                    created_by=self.staff_id) for index in range(1000)]
+        db.session.add_all(variants)
+        db.session.flush()
+        variant_ids = [variant.variant_id for variant in variants]
+        db.session.commit()
+        LocationService.transfer([{"variant_id": variant_id, "to_location_id": self.warehouse_id, "quantity": 100}
+                                  for variant_id in variant_ids], self.staff_id)
+
+        transfers = []
+        for variant_id in variant_ids:
+            transfers += [
+                {"variant_id": variant_id, "from_location_id": self.warehouse_id, "to_location_id": self.shop_id,
+                 "quantity": 20},
+                {"variant_id": variant_id, "from_location_id": self.warehouse_id,
+                 "to_location_id": self.other_shop_id, "quantity": 10},
+                {"variant_id": variant_id, "from_location_id": self.shop_id, "to_location_id": self.other_shop_id,
+                 "quantity": 5},
+                {"variant_id": variant_id, "to_location_id": self.warehouse_id, "quantity": 7},
+                {"variant_id": variant_id, "from_location_id": self.other_shop_id, "quantity": 1}
+            ]
+        start_time = time.perf_counter()
+        stock, error = LocationService.transfer(transfers, self.staff_id)
+        elapsed = time.perf_counter() - start_time
+
+        self.assertIsNone(error)
+        self.assertEqual(len(stock), 3000)
+        availability, _ = LocationService.get_availability(variant_ids)
+        self.assertTrue(all((variant['warehouse'], variant['shop']) == (77, 29) for variant in availability))
+        # The batch also journals the change of each of the 1,000 inventory rows
+        self.assertLess(elapsed, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert
+from app import create_app, db
+from app.models import Staff, Category, Customer, Product, ProductVariants, Order, OrderItem
+from app.services import OrderService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class OrderHistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client and the order history of two customers"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+
+        customers = [Customer(name=name, email=f'{name}@example.com', created_by=self.staff_id)
+                     for name in ('jane', 'john')]
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all(customers + [category])
+        db.session.flush()
+        self.customer_ids = [customer.customer_id for customer in customers]
+        product = Product(product_name='Dinner Set', category_id=category.category_id, created_by=self.staff_id)
+        db.session.add(product)
+        db.session.flush()
+        variant = ProductVariants(product_id=product.product_id, sku='DS-1', price=250, created_by=self.staff_id)
+        db.session.add(variant)
+        db.session.flush()
+
+        # 30 orders over 10 days, three on each day so pages split orders with the same timestamp
+        self.start = datetime(2026, 3, 1, 9, 30)
+        order_ids = db.session.execute(
+            insert(Order).returning(Order.order_id, sort_by_parameter_order=True),
+            [{"customer_id": self.customer_ids[index % 2], "total_items_count": 2, "total_order_amount": 500,
+              "order_status": 'Delivered' if index % 3 else 'Pending', "order_date": self.start + timedelta(days=index // 3),
+              "created_by": self.staff_id} for index in range(30)]
+        ).scalars().all()
+        db.session.execute(insert(OrderItem), [
+            {"order_id": order_id, "variant_id": variant.variant_id, "quantity": 1, "price_at_purchase": 250,
+             "created_by": self.staff_id}
+            for order_id in order_ids for _ in range(2)
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def get_pages(self, url, **args):
+        orders = []
+        cursor = None
+        while True:
+            response = self.client.get(url_for(url, cursor=cursor, **args),
+                                       headers={'Authorization': f'Bearer {self.token}'})
+            self.assertEqual(response.status_code, 200)
+            page = response.get_json()
+            orders.extend(page['data'])
+            cursor = page['next_cursor']
+            if not cursor:
+                return orders
+
+    def test_pages_newest_first(self):
+        """Test paging through the history returns every order once, newest first, with its items"""
+        orders = self.get_pages('order.get_orders', limit=4)
+        self.assertEqual(len(orders), 30)
+        keys = [(order['order_date'], order['order_id']) for order in orders]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertTrue(all(len(order['order_items']) == 2 for order in orders))
+
+        expected = db.session.get(Order, orders[0]['order_id']).to_dict()
+        self.assertEqual(orders[0], expected)
+
+    def test_filters(self):
+        """Test the status, date and customer filters"""
+        orders = self.get_pages('order.get_orders', status='Pending', date_from='2026-03-03', date_to='2026-03-06')
+        self.assertEqual(len(orders), 4)
+        self.assertTrue(all(order['order_status'] == 'Pending' for order in orders))
+
+        orders = self.get_pages('customer.get_customer_orders', customer_id=self.customer_ids[1], limit=7)
+        self.assertEqual(len(orders), 15)
+        self.assertTrue(all(order['customer_id'] == self.customer_ids[1] for order in orders))
+
+        response = self.client.get(url_for('order.get_orders', date_from='March'),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_customer_sees_own_orders(self):
+        """Test a customer only lists their own orders"""
+        self.token = create_access_token(identity=self.customer_ids[0], additional_claims={'role': 'customer'})
+        orders = self.get_pages('order.get_orders', customer_id=self.customer_ids[1])
+        self.assertEqual({order['customer_id'] for order in orders}, {self.customer_ids[0]})
+        response = self.client.get(url_for('customer.get_customer_orders', customer_id=self.customer_ids[1]),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_page_query_count(self):
+        """Test a page of orders and their items is loaded with two queries"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            page, error = OrderService.get_orders(limit=30)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertIsNone(error)
+        self.assertEqual(len(page['data']), 30)
+        self.assertEqual(len(statements), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
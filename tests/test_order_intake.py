@@ -0,0 +1,147 @@
+import time
+import unittest
+from app import create_app, db
+from app.models import Staff, Category, Customer, Product, ProductVariants, Inventory, Order, OrderRequest
+from app.order_workers import OrderWorkerPool
+from app.services import OrderIntakeService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class OrderIntakeTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, a customer and a stocked variant"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+
+        customer = Customer(name='Jane', email='jane@example.com', created_by=self.staff_id)
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all([customer, category])
+        db.session.flush()
+        self.customer_id = customer.customer_id
+        product = Product(product_name='Dinner Set', category_id=category.category_id, created_by=self.staff_id)
+        db.session.add(product)
+        db.session.flush()
+        variant = ProductVariants(product_id=product.product_id, sku='DS-1', price=250, created_by=self.staff_id)
+        db.session.add(variant)
+        db.session.flush()
+        self.variant_id = variant.variant_id
+        db.session.add(Inventory(variant_id=variant.variant_id, quantity=150, shop_stock=150, created_by=self.staff_id))
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def order_data(self, quantity):
+        return {
+            "customer_id": self.customer_id,
+            "created_by": self.staff_id,
+            "order_total_amount": quantity * 250,
+            "items": [{"variant_id": self.variant_id, "quantity": quantity}]
+        }
+
+    def queue_order(self, data):
+        return self.client.post(url_for('order.place_order', **{'async': 'true'}), json=data,
+                                headers={'Authorization': f'Bearer {self.token}'})
+
+    def get_status(self, ticket):
+        response = self.client.get(url_for('order.get_order_request', request_id=ticket),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['data']
+
+    def stock(self):
+        db.session.expire_all()
+        return Inventory.query.filter_by(variant_id=self.variant_id).one().quantity
+
+    def test_queue_and_drain(self):
+        """Test a queued order gets a ticket and is placed when the outbox is drained"""
+        response = self.queue_order(self.order_data(2))
+        self.assertEqual(response.status_code, 202)
+        ticket = response.get_json()['data']['ticket']
+        self.assertTrue(response.headers['Location'].endswith(f'/api/v1/order/requests/{ticket}'))
+        self.assertEqual(self.get_status(ticket)['status'], 'Queued')
+        self.assertEqual(self.stock(), 150)
+
+        processed, error = OrderIntakeService.drain()
+        self.assertIsNone(error)
+        self.assertEqual(processed, 1)
+        status = self.get_status(ticket)
+        self.assertEqual(status['status'], 'Placed')
+        self.assertEqual(db.session.get(Order, status['order_id']).total_order_amount, 500)
+        self.assertEqual(self.stock(), 148)
+
+    def test_failed_order_does_not_undo_batch(self):
+        """Test an order that cannot be placed is recorded as failed while the rest of its batch commits"""
+        tickets = [self.queue_order(self.order_data(quantity)).get_json()['data']['ticket']
+                   for quantity in (100, 100, 50)]
+        self.assertEqual(OrderIntakeService.drain(), (3, None))
+        statuses = [self.get_status(ticket) for ticket in tickets]
+        self.assertEqual([status['status'] for status in statuses], ['Placed', 'Failed', 'Placed'])
+        self.assertEqual(statuses[1]['error'],
+                         f'Insufficient inventory for Product Variant: {self.variant_id}. Available stock is 50')
+        self.assertEqual(self.stock(), 0)
+
+    def test_order_raising_is_marked_failed(self):
+        """Test an order that raises while it is placed is recorded as failed and the orders after it are placed"""
+        data = self.order_data(1)
+        data['order_total_amount'] = 'unknown'
+        tickets = [self.queue_order(order_data).get_json()['data']['ticket']
+                   for order_data in (self.order_data(1), data, self.order_data(2))]
+        self.assertEqual(OrderIntakeService.drain(), (3, None))
+        statuses = [self.get_status(ticket) for ticket in tickets]
+        self.assertEqual([status['status'] for status in statuses], ['Placed', 'Failed', 'Placed'])
+        self.assertTrue(statuses[1]['error'].startswith('An error occurred while processing the order:'))
+        self.assertEqual(self.stock(), 147)
+
+    def test_invalid_order_rejected_on_intake(self):
+        """Test malformed orders are rejected before they are queued"""
+        data = self.order_data(1)
+        data['items'] = [{"variant_id": self.variant_id, "quantity": 0}]
+        self.assertEqual(self.queue_order(data).status_code, 400)
+        self.assertEqual(OrderRequest.query.count(), 0)
+
+    # Performance Testing (Throughput)
+    def test_worker_pool_drains_outbox(self):
+        """Queue more orders than there is stock and check a pool of workers places each one exactly once"""
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('Concurrent workers require Postgres row locks')
+        for _ in range(200):
+            _, error = OrderIntakeService.submit(self.order_data(1))
+            self.assertIsNone(error)
+        db.session.remove()
+
+        self.app.config['ORDER_BATCH_SIZE'] = 20
+        pool = OrderWorkerPool(self.app)
+        start_time = time.perf_counter()
+        pool.start(4)
+        try:
+            while OrderRequest.query.filter(OrderRequest.status.in_(['Queued', 'Processing'])).count():
+                self.assertLess(time.perf_counter() - start_time, 30)
+                db.session.remove()
+                time.sleep(0.05)
+        finally:
+            pool.stop()
+        elapsed = time.perf_counter() - start_time
+
+        self.assertLess(elapsed, 15)
+        self.assertEqual(OrderRequest.query.filter_by(status='Placed').count(), 150)
+        self.assertEqual(OrderRequest.query.filter_by(status='Failed').count(), 50)
+        self.assertEqual(Order.query.count(), 150)
+        self.assertEqual(self.stock(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
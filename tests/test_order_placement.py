@@ -0,0 +1,191 @@
+import time
+import unittest
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app, db
+from app.models import Staff, Category, Customer, Product, ProductVariants, Inventory, Order, OrderItem, IdempotencyKey
+from app.services import OrderService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class OrderPlacementTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, a customer and two stocked variants"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+
+        customer = Customer(name='Jane', email='jane@example.com', created_by=self.staff_id)
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all([customer, category])
+        db.session.flush()
+        self.customer_id = customer.customer_id
+        product = Product(product_name='Dinner Set', category_id=category.category_id, created_by=self.staff_id)
+        db.session.add(product)
+        db.session.flush()
+        self.variant_ids = []
+        for sku in ('DS-1', 'DS-2'):
+            variant = ProductVariants(product_id=product.product_id, sku=sku, price=250, created_by=self.staff_id)
+            db.session.add(variant)
+            db.session.flush()
+            db.session.add(Inventory(variant_id=variant.variant_id, quantity=50, shop_stock=50,
+                                     created_by=self.staff_id))
+            self.variant_ids.append(variant.variant_id)
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def order_data(self, *lines):
+        return {
+            "customer_id": self.customer_id,
+            "created_by": self.staff_id,
+            "order_total_amount": sum(quantity * 250 for _, quantity in lines),
+            "items": [{"variant_id": variant_id, "quantity": quantity} for variant_id, quantity in lines]
+        }
+
+    def stock(self, variant_id):
+        db.session.expire_all()
+        return Inventory.query.filter_by(variant_id=variant_id).one().quantity
+
+    def test_place_order(self):
+        """Test an order deducts stock, records its items and charges the customer"""
+        data = self.order_data((self.variant_ids[0], 2), (self.variant_ids[1], 3), (self.variant_ids[0], 1))
+        response = self.client.post(url_for('order.place_order'), json=data,
+                                    headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 201)
+        order = response.get_json()['data']
+        self.assertEqual(order['total_items_count'], 3)
+        self.assertEqual(len(order['order_items']), 3)
+        self.assertEqual(order['order_items'][0]['price_at_purchase'], 250)
+
+        self.assertEqual(self.stock(self.variant_ids[0]), 47)
+        self.assertEqual(self.stock(self.variant_ids[1]), 47)
+        self.assertEqual(float(db.session.get(Customer, self.customer_id).balance), 1500)
+
+    def test_basket_rejected_as_a_whole(self):
+        """Test a basket with one unavailable line writes nothing"""
+        _, error = OrderService.create_order(self.order_data((self.variant_ids[0], 5), (self.variant_ids[1], 51)))
+        self.assertEqual(error, f'Insufficient inventory for Product Variant: {self.variant_ids[1]}. '
+                                f'Available stock is 50')
+        _, error = OrderService.create_order(self.order_data((self.variant_ids[0], 5), (9999, 1)))
+        self.assertEqual(error, "Product variant for ID: 9999 not found in store!")
+        # Sold stock leaves the shops, which cannot cover more than they hold
+        Inventory.query.filter_by(variant_id=self.variant_ids[1]).update({"shop_stock": 3})
+        db.session.commit()
+        _, error = OrderService.create_order(self.order_data((self.variant_ids[0], 5), (self.variant_ids[1], 4)))
+        self.assertEqual(error, f'Insufficient inventory for Product Variant: {self.variant_ids[1]}. '
+                                f'Available stock is 3')
+        self.assertEqual(self.stock(self.variant_ids[0]), 50)
+        self.assertEqual(Order.query.count(), 0)
+
+    def post_order(self, data, key, client=None, url=None, token=None):
+        return (client or self.client).post(url or url_for('order.place_order'), json=data, headers={
+            'Authorization': f'Bearer {token or self.token}', 'Idempotency-Key': key
+        })
+
+    def test_idempotent_retry(self):
+        """Test a retried order returns the first response without deducting stock again"""
+        data = self.order_data((self.variant_ids[0], 2))
+        first = self.post_order(data, 'retry-1')
+        retry = self.post_order(data, 'retry-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.get_json(), first.get_json())
+        self.assertEqual(Order.query.count(), 1)
+        self.assertEqual(self.stock(self.variant_ids[0]), 48)
+
+        response = self.post_order(self.order_data((self.variant_ids[0], 3)), 'retry-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.get_json()['error'], "This Idempotency-Key was already used with a different request.")
+
+    def test_keys_are_scoped_to_the_caller(self):
+        """Test callers picking the same key each place their own order and get their own response"""
+        data = self.order_data((self.variant_ids[0], 2))
+        customer_token = create_access_token(identity=self.customer_id, additional_claims={'role': 'customer'})
+        # The customer shares its id with the staff member, keys are still kept apart
+        self.assertEqual(self.customer_id, self.staff_id)
+        staff = self.post_order(data, 'shared-1')
+        customer = self.post_order(data, 'shared-1', token=customer_token)
+        self.assertEqual(staff.status_code, 201)
+        self.assertEqual(customer.status_code, 201)
+        self.assertNotEqual(customer.get_json()['data']['order_id'], staff.get_json()['data']['order_id'])
+
+        other_staff = Staff(name='Other Person', role='staff', email='other.person@example.com')
+        db.session.add(other_staff)
+        db.session.commit()
+        other_token = create_access_token(identity=other_staff.staff_id, additional_claims={'role': 'staff'})
+        response = self.post_order(self.order_data((self.variant_ids[0], 3)), 'shared-1', token=other_token)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.query.count(), 3)
+        self.assertEqual(IdempotencyKey.query.count(), 3)
+        self.assertEqual(self.stock(self.variant_ids[0]), 43)
+
+    def test_failed_order_releases_key(self):
+        """Test a key whose order failed is not stored, and a later expired key can be reused"""
+        self.assertEqual(self.post_order(self.order_data((self.variant_ids[0], 51)), 'retry-2').status_code, 400)
+        self.assertEqual(IdempotencyKey.query.count(), 0)
+        self.assertEqual(self.post_order(self.order_data((self.variant_ids[0], 1)), 'retry-2').status_code, 201)
+
+        self.app.config['IDEMPOTENCY_KEY_TTL'] = timedelta(0)
+        self.assertEqual(self.post_order(self.order_data((self.variant_ids[0], 1)), 'retry-3').status_code, 201)
+        self.assertEqual(self.post_order(self.order_data((self.variant_ids[0], 1)), 'retry-3').status_code, 201)
+        self.assertEqual(Order.query.count(), 3)
+
+    def test_concurrent_duplicates_wait_for_first(self):
+        """Test parallel requests with one key place a single order and all get its response"""
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('Key claims require Postgres')
+        data = self.order_data((self.variant_ids[0], 1))
+        url = url_for('order.place_order')
+        db.session.remove()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(
+                lambda _: self.post_order(data, 'retry-4', self.app.test_client(), url), range(8)
+            ))
+        self.assertEqual({response.status_code for response in responses}, {201})
+        self.assertEqual(len({response.get_json()['data']['order_id'] for response in responses}), 1)
+        self.assertEqual(Order.query.count(), 1)
+        self.assertEqual(self.stock(self.variant_ids[0]), 49)
+
+    # Performance Testing (Concurrency)
+    def test_concurrent_orders_do_not_oversell(self):
+        """Fire parallel orders at the same SKUs, in both line orders, and check stock is never oversold"""
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('Row locking requires Postgres')
+        first, second = self.variant_ids
+        baskets = [((first, 1), (second, 1)) if index % 2 else ((second, 1), (first, 1)) for index in range(120)]
+
+        def place(lines):
+            with self.app.app_context():
+                return OrderService.create_order(self.order_data(*lines))[1]
+
+        db.session.remove()
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            errors = list(executor.map(place, baskets))
+        elapsed = time.perf_counter() - start_time
+
+        placed = errors.count(None)
+        self.assertEqual(placed, 50)
+        self.assertTrue(all(error is None or error.startswith('Insufficient inventory') for error in errors))
+        self.assertEqual(self.stock(first), 0)
+        self.assertEqual(self.stock(second), 0)
+        self.assertEqual(OrderItem.query.count(), 100)
+        self.assertGreater(len(baskets) / elapsed, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
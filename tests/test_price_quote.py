@@ -0,0 +1,128 @@
+import time
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import insert
+from app import create_app, db
+from app.extensions import catalog_cache
+from app.models import Staff, Category, Product, ProductVariants, Discount
+from app.services import PricingService
+from flask import url_for
+
+
+class PriceQuoteTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client and a product with discounted variants"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add(category)
+        db.session.flush()
+        self.category_id = category.category_id
+        product = Product(product_name='Dinner Set', category_id=category.category_id, created_by=self.staff_id)
+        db.session.add(product)
+        db.session.flush()
+        self.product_id = product.product_id
+
+        self.variant_ids = []
+        for sku, price in (('DS-1', Decimal('1000')), ('DS-2', Decimal('19.99')), ('DS-3', Decimal('5.50'))):
+            variant = ProductVariants(product_id=product.product_id, sku=sku, price=price, created_by=self.staff_id)
+            db.session.add(variant)
+            db.session.flush()
+            self.variant_ids.append(variant.variant_id)
+        today = date.today()
+        db.session.add_all([
+            Discount(discount_name='Rate', product_id=product.product_id, variant_id=self.variant_ids[0],
+                     discount_rate=Decimal('12.5'), discount_amount=0, start_date=today,
+                     expiry_date=today + timedelta(days=1), created_by=self.staff_id),
+            Discount(discount_name='Odd rate', product_id=product.product_id, variant_id=self.variant_ids[1],
+                     discount_rate=Decimal('15'), discount_amount=0, start_date=today,
+                     expiry_date=today + timedelta(days=1), created_by=self.staff_id),
+            Discount(discount_name='Amount off', product_id=product.product_id, variant_id=None,
+                     discount_rate=0, discount_amount=Decimal('8'), start_date=today,
+                     expiry_date=today + timedelta(days=1), created_by=self.staff_id)
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def quote(self, items):
+        return self.client.post(url_for('order.quote_order'), json={"items": items})
+
+    def test_quote(self):
+        """Test line and basket totals, with rates rounded half up and amounts never below zero"""
+        response = self.quote([
+            {"variant_id": self.variant_ids[0], "quantity": 2},
+            {"variant_id": self.variant_ids[1], "quantity": 3},
+            {"variant_id": self.variant_ids[2], "quantity": 1}
+        ])
+        self.assertEqual(response.status_code, 200)
+        quote = response.get_json()['data']
+        # 12.5% of 1000 is 125; 15% of 19.99 is 2.9985, rounded to 3.00; the 8.00 off is capped at the 5.50 price
+        self.assertEqual([line['unit_discount'] for line in quote['lines']], [125, 3, 5.5])
+        self.assertEqual([line['line_total'] for line in quote['lines']], [1750, 50.97, 0])
+        self.assertEqual(quote['items_count'], 6)
+        self.assertEqual(quote['subtotal'], 2065.47)
+        self.assertEqual(quote['discount_total'], 264.5)
+        self.assertEqual(quote['total'], 1800.97)
+
+    def test_fine_rates_are_rounded(self):
+        """Test rates finer than a hundredth of a percent round half up rather than being cut off"""
+        self.assertEqual([PricingService.to_rate(rate) for rate in (Decimal('12.3456'), Decimal('0.005'), 15)],
+                         [1235, 1, 1500])
+        Discount.query.filter_by(discount_name='Rate').update({"discount_rate": Decimal('12.3456')})
+        db.session.commit()
+        catalog_cache.bump_version(catalog_cache.DISCOUNTS)
+        response = self.quote([{"variant_id": self.variant_ids[0], "quantity": 1}])
+        # Applied as 12.35% of 1000, where a truncated 12.34% would take 123.40 off
+        self.assertEqual(response.get_json()['data']['lines'][0]['unit_discount'], 123.5)
+
+    def test_invalid_quotes(self):
+        """Test unknown variants, bad quantities and oversized baskets are rejected"""
+        self.assertEqual(self.quote([{"variant_id": 9999, "quantity": 1}]).status_code, 400)
+        self.assertEqual(self.quote([{"variant_id": self.variant_ids[0], "quantity": 0}]).status_code, 400)
+        self.assertEqual(self.quote([]).status_code, 400)
+        self.app.config['QUOTE_MAX_LINES'] = 2
+        response = self.quote([{"variant_id": self.variant_ids[0], "quantity": 1}] * 3)
+        self.assertEqual(response.get_json()['error'], "A quote can have at most 2 lines.")
+
+    # Performance Testing (Response Time)
+    def test_large_basket_time(self):
+        """Benchmark a 2,000 line wholesale basket and check it against per line Decimal arithmetic"""
+        prices = [Decimal(f'{100 + index}.{index % 100:02d}') for index in range(500)]
+        variant_ids = db.session.execute(
+            insert(ProductVariants).returning(ProductVariants.variant_id, sort_by_parameter_order=True),
+            [{"product_id": self.product_id, "sku": f'BULK-{index}', "price": price, "created_by": self.staff_id}
+             for index, price in enumerate(prices)]
+        ).scalars().all()
+        db.session.commit()
+        items = [{"variant_id": variant_ids[index % 500], "quantity": index % 7 + 1} for index in range(2000)]
+
+        start_time = time.perf_counter()
+        quote, error = PricingService.quote(items)
+        elapsed = time.perf_counter() - start_time
+        self.assertIsNone(error)
+
+        # Every bulk variant gets the product wide 8.00 off
+        expected = sum(
+            ((prices[index % 500] - Decimal('8')) * (index % 7 + 1)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+            for index in range(2000)
+        )
+        self.assertEqual(quote['total'], expected)
+        self.assertLess(elapsed, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
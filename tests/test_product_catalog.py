@@ -0,0 +1,311 @@
+import unittest
+from datetime import date, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Staff, Category, Customer, Product, ProductVariants, ProductAttributes, Inventory, Discount
+from app.services import CategoryService, DiscountService, OrderService, ProductService, SearchService
+from app.extensions import catalog_cache
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class ProductCatalogTestCase(unittest.TestCase):
+    # Statements needed to load products (with category and parent), variants, attributes, inventory and discounts
+    CATALOG_QUERY_BUDGET = 5
+
+    def setUp(self):
+        """Set up the test client and database"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+
+        parent = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add(parent)
+        db.session.flush()
+        category = Category(category_name='crockery', parent_category_id=parent.category_id, created_by=self.staff_id)
+        db.session.add(category)
+        db.session.commit()
+        self.category_id = category.category_id
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def seed_products(self, count, variants_per_product=2, price=1500, is_active=True):
+        """Add products, each with variants carrying attributes, inventory and a discount"""
+        for _ in range(count):
+            product = Product(
+                product_name='Dinner Set',
+                category_id=self.category_id,
+                is_active=is_active,
+                created_by=self.staff_id
+            )
+            db.session.add(product)
+            db.session.flush()
+            for _ in range(variants_per_product):
+                variant = ProductVariants(
+                    product_id=product.product_id,
+                    sku=f'SKU-{product.product_id}-{db.session.query(ProductVariants).count()}',
+                    price=price,
+                    created_by=self.staff_id
+                )
+                db.session.add(variant)
+                db.session.flush()
+                db.session.add_all([
+                    ProductAttributes(variant_id=variant.variant_id, name='colour', value='red', created_by=self.staff_id),
+                    ProductAttributes(variant_id=variant.variant_id, name='size', value='M', created_by=self.staff_id),
+                    Inventory(variant_id=variant.variant_id, quantity=10, shop_stock=10, created_by=self.staff_id),
+                    Discount(
+                        discount_name='Promo',
+                        product_id=product.product_id,
+                        variant_id=variant.variant_id,
+                        discount_rate=10,
+                        start_date=date.today(),
+                        expiry_date=date.today() + timedelta(days=7),
+                        created_by=self.staff_id
+                    )
+                ])
+        db.session.commit()
+        db.session.expunge_all()
+
+    def count_catalog_queries(self):
+        """Load and serialize the catalog, returning the number of SQL statements issued"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            page, error = ProductService.get_products()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertIsNone(error)
+        return page['data'], len(statements)
+
+    def test_catalog_query_budget(self):
+        """Test the catalog is loaded in a fixed number of queries"""
+        self.seed_products(3)
+        products, query_count = self.count_catalog_queries()
+        self.assertEqual(len(products), 3)
+        self.assertLessEqual(query_count, self.CATALOG_QUERY_BUDGET)
+
+    def test_catalog_query_count_independent_of_size(self):
+        """Test the number of queries does not grow with the number of products"""
+        self.seed_products(2)
+        _, small_count = self.count_catalog_queries()
+        db.session.expunge_all()
+
+        self.seed_products(20, variants_per_product=3)
+        products, large_count = self.count_catalog_queries()
+        self.assertEqual(len(products), 22)
+        self.assertEqual(small_count, large_count)
+
+    def test_catalog_serialization(self):
+        """Test the eager loaded catalog serializes the full product graph"""
+        self.seed_products(1)
+        response = self.client.get(url_for('product.get_products'))
+        self.assertEqual(response.status_code, 200)
+
+        product = response.get_json()['data'][0]
+        self.assertEqual(product['category']['parent_category'], 'kitchen')
+        self.assertEqual(len(product['variants']), 2)
+        variant = product['variants'][0]
+        self.assertEqual({a['name'] for a in variant['attributes']}, {'colour', 'size'})
+        self.assertEqual(variant['inventory']['quantity'], 10)
+        self.assertEqual(len(variant['discounts']), 1)
+
+    def test_keyset_pagination(self):
+        """Test paging through the catalog with cursors returns every product once"""
+        self.seed_products(7, variants_per_product=1)
+        seen = []
+        cursor = None
+        while True:
+            query = {'limit': 3}
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get(url_for('product.get_products', **query))
+            self.assertEqual(response.status_code, 200)
+            page = response.get_json()
+            seen.extend(product['product_id'] for product in page['data'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, sorted(set(seen)))
+
+    def test_keyset_pagination_by_updated_date(self):
+        """Test paging on last modification returns products in modification order"""
+        self.seed_products(4, variants_per_product=1)
+        first = Product.query.order_by(Product.product_id).first()
+        first.product_name = 'Tea Set'
+        db.session.commit()
+
+        page, error = ProductService.get_products(limit=3, sort='updated_date')
+        self.assertIsNone(error)
+        self.assertEqual(len(page['data']), 3)
+        page, error = ProductService.get_products(limit=3, sort='updated_date', cursor=page['next_cursor'])
+        self.assertIsNone(error)
+        self.assertEqual([product['product_id'] for product in page['data']], [first.product_id])
+        self.assertIsNone(page['next_cursor'])
+
+    def test_listing_filters(self):
+        """Test category, active and price filters are applied"""
+        self.seed_products(2, variants_per_product=1, price=500)
+        self.seed_products(3, variants_per_product=1, price=2500)
+        self.seed_products(1, variants_per_product=1, price=2500, is_active=False)
+
+        response = self.client.get(url_for('product.get_products', min_price=1000, is_active='true'))
+        self.assertEqual(len(response.get_json()['data']), 3)
+
+        response = self.client.get(url_for('product.get_products', max_price=1000))
+        self.assertEqual(len(response.get_json()['data']), 2)
+
+        response = self.client.get(url_for('product.get_products', category_id=self.category_id + 100))
+        self.assertEqual(response.get_json()['data'], [])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        response = self.client.get(url_for('product.get_products', cursor='not-a-cursor'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid cursor', str(response.data))
+
+    def test_streamed_catalog(self):
+        """Test the streaming mode returns the same products as the paginated listing"""
+        self.app.config['STREAM_BATCH_SIZE'] = 4
+        self.seed_products(10)
+
+        response = self.client.get(url_for('product.get_products', stream='true'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertFalse(response.is_sequence)
+        streamed = response.get_json()['data']
+
+        page = self.client.get(url_for('product.get_products', limit=10)).get_json()
+        self.assertEqual(streamed, page['data'])
+
+    def test_etag_not_modified(self):
+        """Test cached catalog responses carry an ETag and honour If-None-Match"""
+        self.seed_products(2)
+        response = self.client.get(url_for('product.get_products'))
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+
+        response = self.client.get(url_for('product.get_products'), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(catalog_cache.stats()['hits'], 1)
+
+        product_id = Product.query.first().product_id
+        response = self.client.get(url_for('product.get_product', product_id=product_id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['data']['product_id'], product_id)
+
+    def test_cache_invalidated_on_update(self):
+        """Test updating a product bumps the catalog version and changes the ETag"""
+        self.seed_products(1)
+        product_id = Product.query.first().product_id
+        response = self.client.get(url_for('product.get_product', product_id=product_id))
+        etag = response.headers['ETag']
+        db.session.remove()
+
+        token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+        response = self.client.put(
+            url_for('product.update_product', product_id=product_id),
+            json={'product_name': 'Tea Set'},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(url_for('product.get_product', product_id=product_id), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.get_json()['data']['product_name'], 'Tea Set')
+
+    def test_stock_writes_keep_catalog_indexes(self):
+        """Test an order only invalidates the responses showing stock, and the indexes of other parts stay built"""
+        self.seed_products(1, variants_per_product=1)
+        product_id, variant_id = db.session.query(ProductVariants.product_id, ProductVariants.variant_id).one()
+        customer = Customer(name='Jane', email='jane@example.com', created_by=self.staff_id)
+        db.session.add(customer)
+        db.session.commit()
+        customer_id = customer.customer_id
+
+        tree_etag = self.client.get(url_for('category.get_category_tree')).headers['ETag']
+        product_etag = self.client.get(url_for('product.get_product', product_id=product_id)).headers['ETag']
+        other_parts = (catalog_cache.CATALOG, catalog_cache.CATEGORIES, catalog_cache.DISCOUNTS)
+        versions = catalog_cache.version(other_parts)
+        indexes = (CategoryService.get_tree(), SearchService.get_index(), DiscountService.get_index())
+        _, error = OrderService.create_order({
+            "customer_id": customer_id, "created_by": self.staff_id, "order_total_amount": 1500,
+            "items": [{"variant_id": variant_id, "quantity": 1}]
+        })
+        self.assertIsNone(error)
+
+        self.assertEqual(catalog_cache.version(other_parts), versions)
+        response = self.client.get(url_for('category.get_category_tree'), headers={'If-None-Match': tree_etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertTrue(all(before is after for before, after in zip(indexes, (
+            CategoryService.get_tree(), SearchService.get_index(), DiscountService.get_index()
+        ))))
+        response = self.client.get(url_for('product.get_product', product_id=product_id),
+                                   headers={'If-None-Match': product_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['data']['variants'][0]['inventory']['quantity'], 9)
+
+    def test_cache_eviction(self):
+        """Test the cache stays within its bound and counts evictions"""
+        self.seed_products(1)
+        catalog_cache.max_entries = 2
+        try:
+            for limit in (1, 2, 3):
+                self.client.get(url_for('product.get_products', limit=limit))
+            stats = catalog_cache.stats()
+            self.assertEqual(stats['entries'], 2)
+            self.assertEqual(stats['evictions'], 1)
+            self.assertEqual(stats['misses'], 3)
+        finally:
+            catalog_cache.max_entries = self.app.config['CATALOG_CACHE_SIZE']
+
+    def test_bulk_variant_update(self):
+        """Test prices and stock are updated in bulk by SKU or variant ID with a result per item"""
+        self.seed_products(2, variants_per_product=1)
+        first, second = ProductVariants.query.order_by(ProductVariants.variant_id).all()
+        first_id, first_sku, second_id = first.variant_id, first.sku, second.variant_id
+        Inventory.query.filter_by(variant_id=second_id).delete()
+        db.session.commit()
+        db.session.remove()
+
+        token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+        response = self.client.put(url_for('product.bulk_update_variants'), headers={'Authorization': f'Bearer {token}'},
+                                   json={'items': [
+                                       {'sku': first_sku, 'price': '1999.50', 'shop_stock': 4},
+                                       {'variant_id': second_id, 'quantity': 25},
+                                       {'sku': 'UNKNOWN', 'price': 10},
+                                       {'sku': first_sku, 'price': 5},
+                                       {'variant_id': second_id + 100, 'quantity': 1}
+                                   ]})
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.get_json()['data']]
+        self.assertEqual(statuses, ['updated', 'updated', 'not_found', 'invalid', 'not_found'])
+
+        first = db.session.get(ProductVariants, first_id)
+        self.assertEqual(float(first.price), 1999.5)
+        self.assertEqual(first.inventory.shop_stock, 4)
+        self.assertEqual(first.inventory.quantity, 10)
+        second_inventory = Inventory.query.filter_by(variant_id=second_id).one()
+        self.assertEqual(second_inventory.quantity, 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.models import Staff, Category, Product, ProductVariants, ProductAttributes, Inventory
+from app.services import ImportService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+CSV_CATALOG = """product_name,category_id,is_active,sku,price,quantity,shop_stock,attr_colour,attr_size
+Bed Sheet,{category_id},true,BS-RED-M,1200,10,10,red,M
+Bed Sheet,{category_id},true,BS-BLUE-M,1200,5,5,blue,M
+Towel,{category_id},true,TW-RED,450.50,3,3,red,
+Pillow Case,{category_id},true,PC-RED,not-a-price,1,1,red,
+Duvet,999,true,DV-1,3000,1,1,,
+Towel Set,{category_id},false,TW-RED,900,2,2,red,
+"""
+
+
+class ProductImportTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client and database"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        category = Category(category_name='linen', created_by=self.staff_id)
+        db.session.add(category)
+        db.session.commit()
+        self.category_id = category.category_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_csv_import(self):
+        """Test importing a CSV file groups variants into products and reports invalid rows"""
+        response = self.client.post(
+            url_for('product.import_products'),
+            data=CSV_CATALOG.format(category_id=self.category_id),
+            content_type='text/csv',
+            headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        summary = response.get_json()['data']
+        self.assertEqual(summary['rows'], 6)
+        self.assertEqual(summary['products'], 2)
+        self.assertEqual(summary['variants'], 3)
+        self.assertEqual([error['lines'] for error in summary['errors']], [[5], [6], [7]])
+
+        sheet = Product.query.filter_by(product_name='Bed Sheet').one()
+        self.assertEqual(sorted(variant.sku for variant in sheet.variants), ['BS-BLUE-M', 'BS-RED-M'])
+        variant = ProductVariants.query.filter_by(sku='BS-BLUE-M').one()
+        self.assertEqual({(a.name, a.value) for a in variant.attributes}, {('colour', 'blue'), ('size', 'M')})
+        self.assertEqual(variant.inventory.quantity, 5)
+
+    def test_ndjson_import_isolates_failing_rows(self):
+        """Test a row rejected by the database does not abort the rest of its batch"""
+        lines = [
+            {"product_name": "Mug", "category_id": self.category_id, "variants": [{"sku": "MUG-1", "price": 300}]},
+            {"product_name": "M" * 300, "category_id": self.category_id, "variants": [{"sku": "MUG-2", "price": 1}]},
+            {"product_name": "Plate", "category_id": self.category_id,
+             "variants": [{"sku": "PLT-1", "price": 250, "inventory": {"quantity": 7}}]}
+        ]
+        payload = '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n'
+        summary = ImportService.import_products(ImportService.parse_ndjson(io.StringIO(payload)), self.staff_id)
+
+        self.assertEqual(summary['products'], 2)
+        self.assertEqual([error['lines'] for error in summary['errors']], [[4], [2]])
+        self.assertEqual(Inventory.query.one().quantity, 7)
+        self.assertIsNone(ProductVariants.query.filter_by(sku='MUG-2').first())
+
+    def test_cli_import(self):
+        """Test the import-products command loads a file"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write(CSV_CATALOG.format(category_id=self.category_id))
+        try:
+            result = self.app.test_cli_runner().invoke(
+                args=['import-products', csv_file.name, '--created-by', str(self.staff_id)]
+            )
+        finally:
+            os.remove(csv_file.name)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Imported 2 products and 3 variants from 6 rows', result.output)
+
+    # Performance Testing (Throughput)
+    def test_import_throughput(self):
+        """Benchmark the bulk import, in variant rows per second"""
+        rows = 5000
+        lines = (
+            "product_name,category_id,sku,price,quantity,attr_colour,attr_size\n" +
+            ''.join(f"Product {index // 2},{self.category_id},SKU-{index},{100 + index},10,red,M\n"
+                    for index in range(rows))
+        )
+        summary = ImportService.import_products(ImportService.parse_csv(io.StringIO(lines)), self.staff_id)
+
+        self.assertEqual(summary['errors'], [])
+        self.assertEqual(summary['variants'], rows)
+        self.assertEqual(ProductAttributes.query.count(), rows * 2)
+        self.assertGreater(summary['rows_per_second'], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import time
+import unittest
+from app import create_app, db
+from app.models import Staff, Category, Product, ProductVariants, ProductAttributes
+from app.search_index import SearchIndex
+from flask import url_for
+
+
+class ProductSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client and a small catalog"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        category = Category(category_name='linen', created_by=staff.staff_id)
+        db.session.add(category)
+        db.session.commit()
+
+        catalog = [
+            ('Cotton Bed Sheet', True, [{'colour': 'Red', 'size': 'M'}, {'colour': 'Blue', 'size': 'M'}]),
+            ('Cotton Towel', True, [{'colour': 'Red', 'size': 'L'}]),
+            ('Silk Pillow Case', True, [{'colour': 'red', 'size': 'M'}]),
+            ('Cotton Throw', False, [{'colour': 'Red', 'size': 'M'}])
+        ]
+        for product_name, is_active, variants in catalog:
+            product = Product(product_name=product_name, category_id=category.category_id, is_active=is_active,
+                              created_by=staff.staff_id)
+            db.session.add(product)
+            db.session.flush()
+            for attributes in variants:
+                variant = ProductVariants(product_id=product.product_id, price=100, created_by=staff.staff_id,
+                                          sku=f'{product.product_id}-{attributes["colour"]}-{attributes["size"]}')
+                db.session.add(variant)
+                db.session.flush()
+                for name, value in attributes.items():
+                    db.session.add(ProductAttributes(variant_id=variant.variant_id, name=name, value=value,
+                                                     created_by=staff.staff_id))
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def search(self, **params):
+        response = self.client.get(url_for('product.search_products', **params))
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def check_search(self):
+        result = self.search(q='cot')
+        self.assertEqual(result['total'], 3)
+        self.assertEqual({variant['product_name'] for variant in result['data']}, {'Cotton Bed Sheet', 'Cotton Towel'})
+        self.assertEqual(result['facets']['colour'], {'red': 2, 'blue': 1})
+
+        result = self.search(attribute=['colour:red', 'size:m'])
+        self.assertEqual(result['total'], 2)
+        self.assertEqual(result['facets']['size'], {'m': 2})
+
+        result = self.search(q='cotton sheet', attribute='colour:blue')
+        self.assertEqual(result['total'], 1)
+        self.assertEqual(result['data'][0]['sku'].split('-', 1)[1], 'Blue-M')
+        self.assertIn({'name': 'colour', 'value': 'Blue'}, result['data'][0]['attributes'])
+
+        result = self.search(q='velvet')
+        self.assertEqual(result['total'], 0)
+        self.assertEqual(result['facets'], {})
+
+    def test_memory_search(self):
+        """Test searching with the in-process inverted index"""
+        self.app.config['SEARCH_BACKEND'] = 'memory'
+        self.check_search()
+
+    def test_database_search(self):
+        """Test searching with Postgres full-text matching returns the same results"""
+        if db.engine.dialect.name != 'postgresql':
+            self.skipTest('Database search requires Postgres')
+        self.app.config['SEARCH_BACKEND'] = 'database'
+        self.check_search()
+
+    def test_invalid_attribute_filter(self):
+        """Test a malformed attribute filter is rejected"""
+        response = self.client.get(url_for('product.search_products', attribute='colour'))
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchIndexPerformanceTestCase(unittest.TestCase):
+    VARIANTS = 100000
+
+    @classmethod
+    def setUpClass(cls):
+        colours = ['red', 'blue', 'green', 'white', 'black', 'cream', 'grey', 'gold']
+        sizes = ['s', 'm', 'l', 'xl']
+        words = ['cotton', 'silk', 'linen', 'bed', 'sheet', 'towel', 'plate', 'bowl', 'mug', 'glass', 'cup', 'set']
+
+        def rows():
+            for variant_id in range(cls.VARIANTS):
+                product_id = variant_id // 4
+                name = f'{words[product_id % 12]} {words[(product_id // 12) % 12]} {product_id}'
+                for attribute_name, values in (('colour', colours), ('size', sizes)):
+                    value = values[variant_id % len(values)]
+                    yield variant_id, product_id, name, f'SKU-{variant_id}', 100, attribute_name, value
+
+        cls.index = SearchIndex(rows())
+
+    def timed_search(self, **kwargs):
+        start_time = time.perf_counter()
+        result = self.index.search(**kwargs)
+        return result, time.perf_counter() - start_time
+
+    # Performance Testing (Response Time)
+    def test_selective_search_time(self):
+        (results, total, facets), elapsed = self.timed_search(query='silk plate', attributes=[('colour', 'red')])
+        self.assertGreater(total, 0)
+        self.assertTrue(all(variant.attributes[0] == ('colour', 'red') for variant in results))
+        self.assertLess(elapsed, 0.05)
+
+    def test_facet_only_search_time(self):
+        (results, total, facets), elapsed = self.timed_search(attributes=[('size', 'm')])
+        self.assertEqual(total, self.VARIANTS // 4)
+        self.assertEqual(facets[('size', 'm')], total)
+        self.assertLess(elapsed, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
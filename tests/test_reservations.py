@@ -0,0 +1,232 @@
+import threading
+import unittest
+from sqlalchemy import func, text, update
+from app import create_app, db
+from app.models import Staff, Category, Customer, Inventory, OrderItem, Reservation, ReservationItem
+from app.services import OrderService, ProductService, ReservationService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class ReservationTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, two customers and a product with 10 in stock"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='staff', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'staff'})
+
+        customers = [Customer(name=name, email=f'{name.lower()}@example.com', created_by=self.staff_id)
+                     for name in ('Jane', 'John')]
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all(customers + [category])
+        db.session.flush()
+        self.customer_id, self.other_customer_id = [customer.customer_id for customer in customers]
+        category_id = category.category_id
+        db.session.commit()
+
+        product, error = ProductService.add_product({
+            "product_name": 'Dinner Set', "category_id": category_id, "created_by": self.staff_id,
+            "variants": [{"sku": 'DS-1', "price": 100, "inventory": {"quantity": 10, "shop_stock": 10}}]
+        })
+        self.assertIsNone(error)
+        self.product_id = product.product_id
+        self.variant_id = product.variants[0].variant_id
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def reserve(self, quantity, customer_id=None):
+        return ReservationService.reserve({
+            "customer_id": customer_id or self.customer_id, "created_by": self.staff_id,
+            "items": [{"variant_id": self.variant_id, "quantity": quantity}]
+        })
+
+    def place_order(self, quantity):
+        return OrderService.create_order({
+            "customer_id": self.other_customer_id, "created_by": self.staff_id, "order_total_amount": quantity * 100,
+            "items": [{"variant_id": self.variant_id, "quantity": quantity}]
+        })
+
+    def stock(self):
+        db.session.expire_all()
+        inventory = Inventory.query.filter_by(variant_id=self.variant_id).one()
+        return inventory.quantity, inventory.reserved_quantity
+
+    def expire(self, reservation_id):
+        db.session.execute(update(Reservation).where(Reservation.reservation_id == reservation_id)
+                           .values(expires_at=text("now() - interval '1 minute'")))
+        db.session.commit()
+
+    def test_reserved_stock_is_held_from_other_orders(self):
+        """Test orders and reservations can only take the stock no active reservation holds"""
+        reservation, error = self.reserve(6)
+        self.assertIsNone(error)
+        self.assertEqual(reservation.status, 'Active')
+        self.assertEqual(self.stock(), (10, 6))
+
+        _, error = self.place_order(5)
+        self.assertEqual(error, f'Insufficient inventory for Product Variant: {self.variant_id}. Available stock is 4')
+        self.assertEqual(self.reserve(5, self.other_customer_id)[1], error)
+        self.assertIsNone(self.place_order(4)[1])
+        self.assertEqual(self.stock(), (6, 6))
+
+    def test_checkout_takes_the_reserved_stock(self):
+        """Test checking out places the reserved items and frees the reservation"""
+        reservation, _ = self.reserve(6)
+        self.assertIsNone(self.place_order(4)[1])
+        order, error = ReservationService.checkout(reservation.reservation_id, {"order_total_amount": 600})
+        self.assertIsNone(error)
+        self.assertEqual([(item.variant_id, item.quantity) for item in order.order_items], [(self.variant_id, 6)])
+        self.assertEqual(order.customer_id, self.customer_id)
+        self.assertEqual(self.stock(), (0, 0))
+
+        reservation, _ = ReservationService.get_reservation(reservation.reservation_id)
+        self.assertEqual((reservation.status, reservation.order_id), ('Converted', order.order_id))
+        self.assertEqual(ReservationService.checkout(reservation.reservation_id, {"order_total_amount": 600}),
+                         (None, "Reservation not found, expired or no longer active."))
+
+    def test_release_and_expiry_give_stock_back(self):
+        """Test released and reaped reservations return their stock, and expired ones cannot be checked out"""
+        released, _ = self.reserve(3)
+        expired, _ = self.reserve(4)
+        kept, _ = self.reserve(2)
+        released_id, expired_id, kept_id = released.reservation_id, expired.reservation_id, kept.reservation_id
+        self.assertEqual(self.stock(), (10, 9))
+
+        self.assertEqual(ReservationService.release(released_id)[0].status, 'Released')
+        self.assertEqual(ReservationService.release(released_id),
+                         (None, "Reservation not found or no longer active."))
+        self.expire(expired_id)
+        self.assertEqual(ReservationService.checkout(expired_id, {"order_total_amount": 400}),
+                         (None, "Reservation not found, expired or no longer active."))
+        self.assertEqual(ReservationService.reap_expired(), (1, None))
+        self.assertEqual(ReservationService.reap_expired(), (0, None))
+        self.assertEqual(ReservationService.get_reservation(expired_id)[0].status, 'Expired')
+        self.assertEqual(ReservationService.get_reservation(kept_id)[0].status, 'Active')
+        self.assertEqual(self.stock(), (10, 2))
+
+    def test_stock_edits_cannot_take_reserved_stock(self):
+        """Test stock held by a reservation cannot be edited away and checking out still needs the stock"""
+        reservation, _ = self.reserve(5)
+        reservation_id = reservation.reservation_id
+        results, error = ProductService.bulk_update_variants([{"variant_id": self.variant_id, "quantity": 2,
+                                                               "price": 50}], self.staff_id)
+        self.assertIsNone(error)
+        self.assertEqual((results[0]['status'], results[0]['error']), (
+            'invalid', f"Quantity of Product Variant: {self.variant_id} cannot be set below the 5 held by reservations."
+        ))
+        db.session.commit()
+        _, error = ProductService.update_product(self.product_id, {
+            "updated_by": self.staff_id, "variants": [{"variant_id": self.variant_id, "inventory": {"quantity": 4}}]
+        })
+        self.assertEqual(error, results[0]['error'])
+        # A variant sent without inventory leaves its stock as it is
+        _, error = ProductService.update_product(self.product_id, {
+            "updated_by": self.staff_id, "variants": [{"variant_id": self.variant_id, "inventory": None}]
+        })
+        self.assertIsNone(error)
+        self.assertEqual(self.stock(), (10, 5))
+
+        # Stock taken by a change made elsewhere is not sold twice
+        db.session.execute(update(Inventory).where(Inventory.variant_id == self.variant_id).values(quantity=2))
+        db.session.commit()
+        self.assertEqual(ReservationService.checkout(reservation_id, {"order_total_amount": 500}),
+                         (None, f'Insufficient inventory for Product Variant: {self.variant_id}. Available stock is 2'))
+        self.assertEqual(self.stock(), (2, 5))
+        self.assertEqual(ReservationService.get_reservation(reservation_id)[0].status, 'Active')
+
+    def test_reservation_endpoints(self):
+        """Test customers reserve, check out and release only their own baskets"""
+        customer_token = create_access_token(identity=self.customer_id, additional_claims={'role': 'customer'})
+        other_token = create_access_token(identity=self.other_customer_id, additional_claims={'role': 'customer'})
+        response = self.client.post(url_for('order.reserve_stock'), json={
+            "customer_id": self.other_customer_id, "items": [{"variant_id": self.variant_id, "quantity": 2}]
+        }, headers={'Authorization': f'Bearer {customer_token}'})
+        self.assertEqual(response.status_code, 201)
+        reservation = response.get_json()['data']
+        self.assertEqual(reservation['customer_id'], self.customer_id)
+        self.assertEqual(reservation['items'], [{"variant_id": self.variant_id, "quantity": 2}])
+
+        reservation_id = reservation['reservation_id']
+        response = self.client.delete(url_for('order.release_reservation', reservation_id=reservation_id),
+                                      headers={'Authorization': f'Bearer {other_token}'})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(url_for('order.get_reservation', reservation_id=reservation_id + 1),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.post(url_for('order.checkout_reservation', reservation_id=reservation_id),
+                                    json={"order_total_amount": 200},
+                                    headers={'Authorization': f'Bearer {customer_token}'})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.delete(url_for('order.release_reservation', reservation_id=reservation_id),
+                                      headers={'Authorization': f'Bearer {customer_token}'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(), (8, 0))
+
+    # Performance Testing (Concurrency)
+    def test_concurrent_reservations_and_orders(self):
+        """Test 40 concurrent reservations, orders, releases and reaps never oversell 20 items in stock"""
+        ProductService.bulk_update_variants([{"variant_id": self.variant_id, "quantity": 20, "shop_stock": 20}],
+                                            self.staff_id)
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(40)
+
+        def shop(number):
+            with self.app.app_context():
+                start.wait()
+                if number % 2:
+                    self.place_order(1)
+                    return
+                reservation, error = self.reserve(1)
+                if error:
+                    return
+                # Held stock is never lost to concurrent orders
+                if number % 4 == 0:
+                    _, error = ReservationService.checkout(reservation.reservation_id, {"order_total_amount": 100})
+                elif number % 8 == 2:
+                    _, error = ReservationService.release(reservation.reservation_id)
+                else:
+                    _, error = ReservationService.reap_expired()
+                if error:
+                    with lock:
+                        errors.append(error)
+
+        threads = [threading.Thread(target=shop, args=(number,)) for number in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        sold = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)).scalar()
+        held = db.session.query(func.coalesce(func.sum(ReservationItem.quantity), 0)) \
+            .join(Reservation, Reservation.reservation_id == ReservationItem.reservation_id) \
+            .filter(Reservation.status == 'Active').scalar()
+        quantity, reserved = self.stock()
+        self.assertLessEqual(sold, 20)
+        self.assertEqual((quantity, reserved), (20 - sold, held))
+        self.assertLessEqual(reserved, quantity)
+
+        # Whatever is still held is given back once it expires
+        active = Reservation.query.filter_by(status='Active').count()
+        db.session.execute(update(Reservation).values(expires_at=text("now() - interval '1 minute'")))
+        db.session.commit()
+        self.assertEqual(ReservationService.reap_expired(), (active, None))
+        self.assertEqual(self.stock(), (20 - sold, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
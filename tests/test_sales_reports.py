@@ -0,0 +1,195 @@
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert, select
+from app import create_app, db
+from app.extensions import folder
+from app.models import (Staff, Category, Customer, Product, ProductVariants, Inventory, Order, OrderItem,
+                        DailyVariantSales, DailyCategorySales, DailyStaffSales, SalesRollupDelta)
+from app.services import OrderService, SalesReportService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class SalesReportTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, two staff members and variants in two categories"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = [Staff(name=name, role='admin', email=f'{name}@example.com') for name in ('Ann', 'Ben')]
+        db.session.add_all(staff)
+        db.session.commit()
+        self.staff_ids = [member.staff_id for member in staff]
+        self.token = create_access_token(identity=self.staff_ids[0], additional_claims={'role': 'admin'})
+
+        customer = Customer(name='Jane', email='jane@example.com', created_by=self.staff_ids[0])
+        categories = [Category(category_name=name, created_by=self.staff_ids[0]) for name in ('kitchen', 'garden')]
+        db.session.add_all([customer] + categories)
+        db.session.flush()
+        self.customer_id = customer.customer_id
+        self.category_ids = [category.category_id for category in categories]
+        self.variant_ids = []
+        for category_id, price in zip(self.category_ids, (100, 40)):
+            product = Product(product_name=f'Product {category_id}', category_id=category_id,
+                              created_by=self.staff_ids[0])
+            db.session.add(product)
+            db.session.flush()
+            variant = ProductVariants(product_id=product.product_id, sku=f'SKU-{category_id}', price=price,
+                                      created_by=self.staff_ids[0])
+            db.session.add(variant)
+            db.session.flush()
+            db.session.add(Inventory(variant_id=variant.variant_id, quantity=1000, shop_stock=1000,
+                                     created_by=self.staff_ids[0]))
+            self.variant_ids.append(variant.variant_id)
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def place_orders(self):
+        """Place orders today one at a time and yesterday through a bulk submission"""
+        kitchen, garden = self.variant_ids
+        prices = {kitchen: 100, garden: 40}
+        for staff_id, lines in ((self.staff_ids[0], [(kitchen, 2), (garden, 1)]), (self.staff_ids[1], [(kitchen, 1)])):
+            _, error = OrderService.create_order({
+                "customer_id": self.customer_id, "created_by": staff_id,
+                "order_total_amount": sum(quantity * prices[variant_id] for variant_id, quantity in lines),
+                "items": [{"variant_id": variant_id, "quantity": quantity} for variant_id, quantity in lines]
+            })
+            self.assertIsNone(error)
+        yesterday = datetime.combine(date.today() - timedelta(days=1), datetime.min.time()).replace(hour=12)
+        results, error = OrderService.create_orders([{
+            "client_order_id": 'till-1', "customer_id": self.customer_id, "order_total_amount": 200,
+            "order_date": yesterday.isoformat(), "items": [{"variant_id": garden, "quantity": 5}]
+        }], self.staff_ids[1])
+        self.assertIsNone(error)
+
+    def rollups(self):
+        return [sorted(tuple(row) for row in db.session.execute(select(*model.__table__.columns)))
+                for model in (DailyVariantSales, DailyCategorySales, DailyStaffSales)]
+
+    def test_rollups_follow_orders(self):
+        """Test every placed order is reported before and after its sales are folded into the daily rollups"""
+        self.place_orders()
+        self.assertEqual(self.rollups(), [[], [], []])
+        for fold in (False, True):
+            if fold:
+                self.assertEqual(SalesReportService.fold_rollups(), (9, None))
+                self.assertEqual(db.session.query(SalesRollupDelta).count(), 0)
+            report, error = SalesReportService.get_sales('category')
+            self.assertIsNone(error)
+            self.assertEqual([(row['category_id'], row['units_sold'], float(row['gross_sales'])) for row in report],
+                             [(self.category_ids[0], 3, 300), (self.category_ids[1], 6, 240)])
+
+            report, _ = SalesReportService.get_sales('staff', daily=True)
+            self.assertEqual([(row['sales_date'], row['staff_id'], row['orders_count'], float(row['order_total']))
+                              for row in report],
+                             [(date.today() - timedelta(days=1), self.staff_ids[1], 1, 200),
+                              (date.today(), self.staff_ids[0], 1, 240),
+                              (date.today(), self.staff_ids[1], 1, 100)])
+
+        response = self.client.get(url_for('reports.get_sales', group_by='variant',
+                                           date_from=date.today().isoformat()),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['sku'], row['units_sold']) for row in response.get_json()['data']],
+                         [(f'SKU-{self.category_ids[0]}', 3), (f'SKU-{self.category_ids[1]}', 1)])
+
+    def test_rollups_are_folded_by_the_app(self):
+        """Test the folder thread folds the sales of new orders into the rollups every FOLD_INTERVAL"""
+        self.place_orders()
+        self.app.config.update(FOLD_INTERVAL=0.05)
+        folder.init_app(self.app)
+        try:
+            deadline = time.monotonic() + 10
+            while db.session.query(SalesRollupDelta).count() and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            folder.stop()
+        self.assertEqual(db.session.query(SalesRollupDelta).count(), 0)
+        self.assertEqual([len(rows) for rows in self.rollups()], [3, 3, 3])
+        self.assertEqual(SalesReportService.fold_rollups(), (0, None))
+
+    def test_sales_net_of_discounts(self):
+        """Test the discounts recorded on order items are taken off the sales"""
+        kitchen, garden = self.variant_ids
+        _, error = OrderService.create_order({
+            "customer_id": self.customer_id, "created_by": self.staff_ids[0], "order_total_amount": 200,
+            "items": [{"variant_id": kitchen, "quantity": 2, "discount_amount": 10},
+                      {"variant_id": garden, "quantity": 1, "discount_rate": 25}]
+        })
+        self.assertIsNone(error)
+        SalesReportService.fold_rollups()
+        report, _ = SalesReportService.get_sales('variant')
+        self.assertEqual([(row['variant_id'], float(row['gross_sales'])) for row in report],
+                         [(kitchen, 180), (garden, 30)])
+
+    def test_rebuild_matches_incremental(self):
+        """Test a backfill reproduces the folded rollups, and replaces the deltas not folded yet"""
+        self.place_orders()
+        SalesReportService.fold_rollups()
+        folded = self.rollups()
+        for model in (DailyVariantSales, DailyCategorySales, DailyStaffSales):
+            db.session.query(model).delete()
+        db.session.commit()
+
+        days, error = SalesReportService.rebuild_rollups()
+        self.assertIsNone(error)
+        self.assertEqual(days, 2)
+        self.assertEqual(self.rollups(), folded)
+
+        self.place_orders()  # The bulk order is a replay and is not placed again
+        self.assertEqual(SalesReportService.rebuild_rollups(), (2, None))
+        self.assertEqual(db.session.query(SalesRollupDelta).count(), 0)
+        report, _ = SalesReportService.get_sales('category')
+        self.assertEqual([row['units_sold'] for row in report], [6, 7])
+
+    def test_invalid_report(self):
+        """Test unknown groupings and reversed ranges are rejected"""
+        self.assertEqual(SalesReportService.get_sales('customer')[1],
+                         "Invalid grouping, expected one of: variant, category, staff.")
+        self.assertEqual(SalesReportService.get_sales(date_from='2026-02-01', date_to='2026-01-01')[1],
+                         "date_from cannot be after date_to.")
+
+    # Performance Testing (Response Time)
+    def test_report_time(self):
+        """Benchmark a year of category sales from the rollups against aggregating the order items"""
+        start = datetime(2025, 1, 1, 10)
+        order_ids = db.session.execute(
+            insert(Order).returning(Order.order_id, sort_by_parameter_order=True),
+            [{"customer_id": self.customer_id, "total_items_count": 2, "total_order_amount": 140,
+              "order_status": 'Delivered', "order_date": start + timedelta(hours=index),
+              "created_by": self.staff_ids[index % 2]} for index in range(20000)]
+        ).scalars().all()
+        db.session.execute(insert(OrderItem), [
+            {"order_id": order_id, "variant_id": variant_id, "quantity": 1,
+             "price_at_purchase": 100 if variant_id == self.variant_ids[0] else 40, "created_by": self.staff_ids[0]}
+            for order_id in order_ids for variant_id in self.variant_ids
+        ])
+        db.session.commit()
+        SalesReportService.rebuild_rollups()
+
+        start_time = time.perf_counter()
+        report, error = SalesReportService.get_sales('category', date_from='2025-01-01', date_to='2025-12-31')
+        elapsed = time.perf_counter() - start_time
+        self.assertIsNone(error)
+
+        category_scan = SalesReportService._rollups(Order.order_date < datetime(2026, 1, 1))[1]
+        scan_start = time.perf_counter()
+        db.session.execute(category_scan).all()
+        scan_elapsed = time.perf_counter() - scan_start
+
+        self.assertEqual([row['units_sold'] for row in report], [8750, 8750])
+        self.assertLess(elapsed, 0.05)
+        self.assertLess(elapsed, scan_elapsed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from app import create_app, db
+from app.models import Staff, Category, Customer, Discount, Product, ProductVariants, ProductAttributes, Inventory
+from app.schemas import category_serializer, customer_serializer, discount_serializer
+from app.services import CategoryService, CustomerService, DiscountService, ProductService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class SerializerTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the database with one record of each serialized model"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='admin', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'admin'})
+
+        parent = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add(parent)
+        db.session.flush()
+        category = Category(category_name='crockery', parent_category_id=parent.category_id, created_by=self.staff_id)
+        customer = Customer(name='Jane', email='jane@example.com', outstanding_balance=Decimal('120.50'),
+                            created_by=self.staff_id, updated_by=self.staff_id,
+                            updated_date=datetime(2024, 9, 17, 10, 30))
+        db.session.add_all([category, customer])
+        db.session.flush()
+        product = Product(product_name='Dinner Set', category_id=category.category_id, created_by=self.staff_id)
+        db.session.add(product)
+        db.session.flush()
+        variant = ProductVariants(product_id=product.product_id, sku='DS-1', price=Decimal('1499.99'),
+                                  created_by=self.staff_id)
+        db.session.add(variant)
+        db.session.flush()
+        db.session.add_all([
+            ProductAttributes(variant_id=variant.variant_id, name='colour', value='red', created_by=self.staff_id),
+            Inventory(variant_id=variant.variant_id, quantity=4, shop_stock=4, created_by=self.staff_id),
+            Discount(discount_name='Promo', product_id=product.product_id, variant_id=variant.variant_id,
+                     discount_rate=Decimal('12.5'), start_date=date.today(),
+                     expiry_date=date.today() + timedelta(days=7), created_by=self.staff_id)
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def encode(self, value):
+        """Round trip a value through the application's JSON provider"""
+        return self.app.json.loads(self.app.json.dumps(value))
+
+    def test_serializers_match_to_dict(self):
+        """Test the compiled serializers produce the same JSON as the models' to_dict methods"""
+        self.assertEqual(
+            self.encode([customer_serializer(row) for row in CustomerService.get_all_customers()]),
+            self.encode([customer.to_dict() for customer in Customer.query.order_by(Customer.customer_id)])
+        )
+        discounts, _ = DiscountService.get_discounts()
+        self.assertEqual(self.encode([discount_serializer(row) for row in discounts]),
+                         self.encode([Discount.query.one().to_dict()]))
+        categories, _ = CategoryService.get_all_categories()
+        self.assertEqual(
+            self.encode([category_serializer(row) for row in categories]),
+            self.encode([category.to_dict() for category in Category.query.order_by(Category.category_id)])
+        )
+        page, _ = ProductService.get_products()
+        self.assertEqual(self.encode(page['data']), self.encode([Product.query.one().to_dict()]))
+
+    def test_json_encoding(self):
+        """Test decimals are encoded as numbers and datetimes in ISO 8601 format"""
+        response = self.client.get(url_for('customer.get_customers'),
+                                   headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        customer = response.get_json()['data'][0]
+        self.assertEqual(customer['outstanding_balance'], 120.5)
+        self.assertEqual(customer['updated_date'], '2024-09-17T10:30:00')
+
+
+class SerializerPerformanceTestCase(unittest.TestCase):
+    ROWS = 20000
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        created_date = datetime(2024, 9, 17, 10, 30)
+        self.customers = [
+            Customer(customer_id=index, name=f'Customer {index}', mobile_number='0700000000',
+                     email=f'customer{index}@example.com', outstanding_balance=Decimal('10.50'), created_by=1,
+                     created_date=created_date)
+            for index in range(self.ROWS)
+        ]
+        self.rows = [
+            (index, f'Customer {index}', '0700000000', f'customer{index}@example.com', Decimal('10.50'), 1,
+             created_date, None, None)
+            for index in range(self.ROWS)
+        ]
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def timed(self, serialize):
+        start_time = time.perf_counter()
+        self.app.json.dumps(serialize())
+        return time.perf_counter() - start_time
+
+    # Performance Testing (Serialization)
+    def test_serializer_faster_than_to_dict(self):
+        """Benchmark serializing and encoding customers with to_dict against the row serializer"""
+        to_dict_time = self.timed(lambda: [customer.to_dict() for customer in self.customers])
+        serializer_time = self.timed(lambda: [customer_serializer(row) for row in self.rows])
+        self.assertLess(serializer_time, to_dict_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
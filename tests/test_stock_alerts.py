@@ -0,0 +1,138 @@
+import time
+import unittest
+from sqlalchemy import insert, text
+from app import create_app, db
+from app.models import Staff, Category, Customer, Product, StockAlert
+from app.services import OrderService, ProductService, StockAlertService
+from flask import url_for
+from flask_jwt_extended import create_access_token
+
+
+class StockAlertTestCase(unittest.TestCase):
+    def setUp(self):
+        """Set up the test client, a customer and a product with a variant above its reorder level"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        staff = Staff(name='Test Person', role='staff', email='test.person@example.com')
+        db.session.add(staff)
+        db.session.commit()
+        self.staff_id = staff.staff_id
+        self.token = create_access_token(identity=self.staff_id, additional_claims={'role': 'staff'})
+
+        customer = Customer(name='Jane', email='jane@example.com', created_by=self.staff_id)
+        category = Category(category_name='kitchen', created_by=self.staff_id)
+        db.session.add_all([customer, category])
+        db.session.flush()
+        self.customer_id = customer.customer_id
+        self.category_id = category.category_id
+        db.session.commit()
+
+        product, error = self.add_product('DS-1', quantity=12, reorder_level=10)
+        self.assertIsNone(error)
+        self.variant_id = product.variants[0].variant_id
+
+    def tearDown(self):
+        """Tear down the database after each test"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_product(self, sku, quantity, reorder_level):
+        return ProductService.add_product({
+            "product_name": f'Product {sku}', "category_id": self.category_id, "created_by": self.staff_id,
+            "variants": [{"sku": sku, "price": 100,
+                          "inventory": {"quantity": quantity, "shop_stock": quantity, "reorder_level": reorder_level}}]
+        })
+
+    def place_order(self, quantity):
+        _, error = OrderService.create_order({
+            "customer_id": self.customer_id, "created_by": self.staff_id, "order_total_amount": quantity * 100,
+            "items": [{"variant_id": self.variant_id, "quantity": quantity}]
+        })
+        self.assertIsNone(error)
+
+    def get(self, endpoint, **params):
+        response = self.client.get(url_for(endpoint, **params), headers={'Authorization': f'Bearer {self.token}'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_alerts_follow_stock_changes(self):
+        """Test sales, stock edits and new products raise and clear low-stock alerts"""
+        self.place_order(2)
+        self.assertEqual(self.get('product.get_low_stock')['data'], [])
+        self.place_order(1)
+        low_stock = self.get('product.get_low_stock')['data']
+        self.assertEqual([(row['sku'], row['quantity'], row['shortfall']) for row in low_stock], [('DS-1', 9, 1)])
+
+        ProductService.bulk_update_variants([{"variant_id": self.variant_id, "quantity": 30}], self.staff_id)
+        product, _ = self.add_product('DS-2', quantity=2, reorder_level=5)
+        self.assertEqual([row['sku'] for row in self.get('product.get_low_stock')['data']], ['DS-2'])
+
+        feed = self.get('product.get_stock_alerts')
+        self.assertEqual([(alert['variant_id'], alert['alert_type'], alert['quantity']) for alert in feed['data']],
+                         [(self.variant_id, 'low_stock', 9), (self.variant_id, 'restocked', 30),
+                          (product.variants[0].variant_id, 'low_stock', 2)])
+
+        # Polling with the returned cursor only returns new alerts
+        self.assertEqual(self.get('product.get_stock_alerts', cursor=feed['next_cursor'])['data'], [])
+        ProductService.bulk_update_variants([{"variant_id": self.variant_id, "reorder_level": 40}], self.staff_id)
+        feed = self.get('product.get_stock_alerts', cursor=feed['next_cursor'])
+        self.assertEqual([(alert['alert_type'], alert['reorder_level']) for alert in feed['data']],
+                         [('low_stock', 40)])
+
+    def test_feed_waits_for_open_transactions(self):
+        """Test an alert committed after a later one is not skipped by a poller"""
+        with db.engine.connect() as connection:
+            # An alert written by a transaction still in progress
+            connection.execute(insert(StockAlert), {
+                "variant_id": self.variant_id, "alert_type": 'low_stock', "quantity": 1, "reorder_level": 10,
+                "created_by": self.staff_id
+            })
+            self.place_order(3)
+            self.assertEqual(StockAlertService.get_feed()[0]['data'], [])
+            connection.commit()
+
+        feed, error = StockAlertService.get_feed()
+        self.assertIsNone(error)
+        self.assertEqual([alert['quantity'] for alert in feed['data']], [1, 9])
+
+    def test_invalid_feed_cursor(self):
+        """Test malformed cursors are rejected"""
+        self.assertEqual(StockAlertService.get_feed(cursor='not-a-cursor'), (None, "Invalid cursor."))
+
+    # Performance Testing (Response Time)
+    def test_low_stock_time(self):
+        """Benchmark listing 50 low-stock variants in a catalog of 200,000"""
+        product_id = db.session.execute(text('SELECT product_id FROM dev.products')).scalar()
+        db.session.execute(text(
+            "INSERT INTO dev.product_variants (product_id, sku, price, created_by, created_date) "
+            "SELECT :product_id, 'SKU-' || n, 10, :staff_id, now() FROM generate_series(1, 200000) AS n"
+        ), {"product_id": product_id, "staff_id": self.staff_id})
+        db.session.execute(text(
+            "INSERT INTO dev.inventory (variant_id, quantity, warehouse_stock, shop_stock, reorder_level, created_by, "
+            "created_date) "
+            "SELECT variant_id, CASE WHEN variant_id % 4000 = 0 THEN 5 ELSE 100 END, 0, 0, 10, :staff_id, now() "
+            "FROM dev.product_variants WHERE sku LIKE 'SKU-%'"
+        ), {"staff_id": self.staff_id})
+        db.session.commit()
+        db.session.execute(text('ANALYZE dev.inventory'))
+
+        start_time = time.perf_counter()
+        low_stock, error = StockAlertService.get_low_stock()
+        elapsed = time.perf_counter() - start_time
+
+        self.assertIsNone(error)
+        self.assertEqual(len(low_stock), 50)
+        plan = '\n'.join(db.session.execute(text(
+            'EXPLAIN SELECT variant_id FROM dev.inventory WHERE quantity < reorder_level'
+        )).scalars())
+        self.assertIn('ix_dev_inventory_below_reorder_level', plan)
+        self.assertLess(elapsed, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()